@@ -0,0 +1,35 @@
+"""add content hashes and harvest checkpoints
+
+Revision ID: 3b1f6c2d9a47
+Revises: 9f3d24de1d33
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b1f6c2d9a47'
+down_revision = '9f3d24de1d33'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('set_menu', sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+    op.create_table(
+        'harvest_checkpoint',
+        sa.Column('source_url', sa.String(), nullable=False),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('last_modified', sa.String(), nullable=True),
+        sa.Column('last_page_url', sa.String(), nullable=True),
+        sa.Column('max_created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source_url')
+    )
+
+
+def downgrade():
+    op.drop_table('harvest_checkpoint')
+    op.drop_column('set_menu', 'content_hash')
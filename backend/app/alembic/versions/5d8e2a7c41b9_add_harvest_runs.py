@@ -0,0 +1,42 @@
+"""add harvest runs
+
+Revision ID: 5d8e2a7c41b9
+Revises: 3b1f6c2d9a47
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2a7c41b9'
+down_revision = '3b1f6c2d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'harvest_run',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('source_url', sa.String(), nullable=False),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('pages', sa.Integer(), nullable=False),
+        sa.Column('next_url', sa.String(), nullable=True),
+        sa.Column('last_page', sa.Integer(), nullable=True),
+        sa.Column('committed_through', sa.Integer(), nullable=False),
+        sa.Column('committed_pages', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True)
+    )
+    op.create_index('ix_harvest_run_source_url', 'harvest_run', ['source_url'])
+    op.create_index('ix_harvest_run_status', 'harvest_run', ['status'])
+
+
+def downgrade():
+    op.drop_index('ix_harvest_run_status', table_name='harvest_run')
+    op.drop_index('ix_harvest_run_source_url', table_name='harvest_run')
+    op.drop_table('harvest_run')
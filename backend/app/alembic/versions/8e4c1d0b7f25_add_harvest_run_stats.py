@@ -0,0 +1,52 @@
+"""add harvest run stats
+
+Revision ID: 8e4c1d0b7f25
+Revises: 5d8e2a7c41b9
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8e4c1d0b7f25'
+down_revision = '5d8e2a7c41b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'harvest_run_stats',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            'run_id',
+            sa.Integer(),
+            sa.ForeignKey('harvest_run.id', ondelete='CASCADE'),
+            nullable=False,
+        ),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('seconds', sa.Float(), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False),
+        sa.Column('pages', sa.Integer(), nullable=False),
+        sa.Column('items', sa.Integer(), nullable=False),
+        sa.Column('bytes', sa.BigInteger(), nullable=False),
+        sa.Column('retries', sa.Integer(), nullable=False),
+        sa.Column('throttled', sa.Integer(), nullable=False),
+        sa.Column('throttle_wait_seconds', sa.Float(), nullable=False),
+        sa.Column('fetch_p50_seconds', sa.Float(), nullable=False),
+        sa.Column('fetch_p95_seconds', sa.Float(), nullable=False),
+        sa.Column('normalize_seconds', sa.Float(), nullable=False),
+        sa.Column('write_seconds', sa.Float(), nullable=False),
+        sa.Column('db_seconds', sa.Float(), nullable=False),
+        sa.Column('statements', sa.Integer(), nullable=False)
+    )
+    op.create_index('ix_harvest_run_stats_run_id', 'harvest_run_stats', ['run_id'])
+
+
+def downgrade():
+    op.drop_index('ix_harvest_run_stats_run_id', table_name='harvest_run_stats')
+    op.drop_table('harvest_run_stats')
@@ -0,0 +1,79 @@
+"""add catalog version
+
+Revision ID: a7c3e5d92f14
+Revises: f2b7d4e9a135
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5d92f14'
+down_revision = 'f2b7d4e9a135'
+branch_labels = None
+depends_on = None
+
+# A statement bumps the version only if it changed a row: harvests upsert
+# every page they fetch, and rewriting identical rows mustn't throw the
+# response cache away. Comparing the transition tables costs the size of
+# the statement, not of the catalog.
+#
+# The row is locked until the writer commits, which only serializes
+# concurrent writers of the catalog, and harvests already take a lock.
+TRIGGER_FUNCTION = """
+CREATE FUNCTION bump_catalog_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT EXISTS (SELECT FROM new_rows) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT FROM old_rows) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF NOT EXISTS (
+        SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows
+    ) THEN
+        RETURN NULL;
+    END IF;
+    UPDATE catalog_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$
+"""
+# Transition tables can't be declared on a trigger for several events.
+EVENTS = {
+    'INSERT': 'REFERENCING NEW TABLE AS new_rows',
+    'UPDATE': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'DELETE': 'REFERENCING OLD TABLE AS old_rows',
+}
+TABLES = ('set_menu', 'cuisine', 'set_menu_cuisine_link')
+
+
+def upgrade():
+    op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.CheckConstraint('id = 1', name='catalog_version_single_row'),
+    )
+    op.execute('INSERT INTO catalog_version (id, version) VALUES (1, 1)')
+    op.execute(TRIGGER_FUNCTION)
+    for table in TABLES:
+        for event, referencing in EVENTS.items():
+            op.execute(
+                f'CREATE TRIGGER catalog_version_{table}_{event.lower()}'
+                f' AFTER {event} ON {table} {referencing}'
+                f' FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()'
+            )
+
+
+def downgrade():
+    for table in TABLES:
+        for event in EVENTS:
+            op.execute(
+                f'DROP TRIGGER IF EXISTS catalog_version_{table}_{event.lower()} ON {table}'
+            )
+    op.execute('DROP FUNCTION IF EXISTS bump_catalog_version()')
+    op.drop_table('catalog_version')
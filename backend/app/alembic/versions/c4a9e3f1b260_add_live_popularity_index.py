@@ -0,0 +1,29 @@
+"""add live set menu popularity index
+
+Revision ID: c4a9e3f1b260
+Revises: 8e4c1d0b7f25
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e3f1b260'
+down_revision = '8e4c1d0b7f25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Matches the listing's ORDER BY, so cursor pages are index range scans
+    op.create_index(
+        'idx_live_popularity',
+        'set_menu',
+        [sa.text('number_of_orders DESC'), sa.text('id DESC')],
+        postgresql_where=sa.text('status = 1'),
+    )
+
+
+def downgrade():
+    op.drop_index('idx_live_popularity', table_name='set_menu')
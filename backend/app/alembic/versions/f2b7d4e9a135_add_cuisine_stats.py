@@ -0,0 +1,128 @@
+"""add cuisine stats
+
+Revision ID: f2b7d4e9a135
+Revises: c4a9e3f1b260
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7d4e9a135'
+down_revision = 'c4a9e3f1b260'
+branch_labels = None
+depends_on = None
+
+# Each statement that writes set_menu or set_menu_cuisine_link adds the
+# difference it made, per cuisine, to cuisine_stats. The changed rows come
+# from the trigger's transition tables and the other side of each link from
+# the table as it is now, so a page written as "upsert menus, drop stale
+# links, insert new links" is counted exactly once.
+#
+# Transition tables have no statistics, so the other side is looked up by
+# primary key for each changed row (OFFSET 0 keeps the planner from turning
+# the lookup back into a join that reads the whole table): the cost follows
+# the size of the statement, not of the catalog. status is filtered outside
+# the lookup, or idx_live_popularity (where id isn't the leading column)
+# would qualify for it and get scanned end to end on every row.
+MENU_CHANGES = """
+    SELECT link.cuisine_id, {sign}1 AS menus, {sign}menu.number_of_orders AS orders
+    FROM {rows} AS menu
+    CROSS JOIN LATERAL (
+        SELECT cuisine_id FROM set_menu_cuisine_link
+        WHERE set_menu_id = menu.id OFFSET 0
+    ) AS link
+    WHERE menu.status = 1
+"""
+LINK_CHANGES = """
+    SELECT link.cuisine_id, {sign}1 AS menus, {sign}menu.number_of_orders AS orders
+    FROM {rows} AS link
+    CROSS JOIN LATERAL (
+        SELECT status, number_of_orders FROM set_menu
+        WHERE id = link.set_menu_id OFFSET 0
+    ) AS menu
+    WHERE menu.status = 1
+"""
+# Rows are upserted in cuisine order so concurrent writers lock them in the
+# same order.
+APPLY_CHANGES = """
+    INSERT INTO cuisine_stats AS stats (cuisine_id, set_menu_count, total_orders)
+    SELECT cuisine_id, sum(menus), sum(orders)
+    FROM ({changes}) AS changes
+    GROUP BY cuisine_id
+    HAVING sum(menus) <> 0 OR sum(orders) <> 0
+    ORDER BY cuisine_id
+    ON CONFLICT (cuisine_id) DO UPDATE
+    SET set_menu_count = stats.set_menu_count + excluded.set_menu_count,
+        total_orders = stats.total_orders + excluded.total_orders;
+"""
+TRIGGER_FUNCTION = """
+CREATE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {insert}
+    ELSIF TG_OP = 'DELETE' THEN
+        {delete}
+    ELSE
+        {update}
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+# Transition tables can't be declared on a trigger for several events.
+EVENTS = {
+    'INSERT': 'REFERENCING NEW TABLE AS new_rows',
+    'UPDATE': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'DELETE': 'REFERENCING OLD TABLE AS old_rows',
+}
+TABLES = {'set_menu': MENU_CHANGES, 'set_menu_cuisine_link': LINK_CHANGES}
+
+
+def trigger_function(table, changes):
+    added = changes.format(sign='', rows='new_rows')
+    removed = changes.format(sign='-', rows='old_rows')
+    return TRIGGER_FUNCTION.format(
+        name=f'cuisine_stats_{table}',
+        insert=APPLY_CHANGES.format(changes=added),
+        delete=APPLY_CHANGES.format(changes=removed),
+        update=APPLY_CHANGES.format(changes=f'{added} UNION ALL {removed}'),
+    )
+
+
+def upgrade():
+    op.create_table(
+        'cuisine_stats',
+        sa.Column('cuisine_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('set_menu_count', sa.Integer(), nullable=False),
+        sa.Column('total_orders', sa.BigInteger(), nullable=False),
+    )
+    op.execute(
+        """
+        INSERT INTO cuisine_stats (cuisine_id, set_menu_count, total_orders)
+        SELECT link.cuisine_id, count(*), sum(menu.number_of_orders)
+        FROM set_menu_cuisine_link AS link
+        JOIN set_menu AS menu ON menu.id = link.set_menu_id
+        WHERE menu.status = 1
+        GROUP BY link.cuisine_id
+        """
+    )
+    for table, changes in TABLES.items():
+        op.execute(trigger_function(table, changes))
+        for event, referencing in EVENTS.items():
+            op.execute(
+                f'CREATE TRIGGER cuisine_stats_{table}_{event.lower()}'
+                f' AFTER {event} ON {table} {referencing}'
+                f' FOR EACH STATEMENT EXECUTE FUNCTION cuisine_stats_{table}()'
+            )
+
+
+def downgrade():
+    for table in TABLES:
+        for event in EVENTS:
+            op.execute(
+                f'DROP TRIGGER IF EXISTS cuisine_stats_{table}_{event.lower()} ON {table}'
+            )
+        op.execute(f'DROP FUNCTION IF EXISTS cuisine_stats_{table}()')
+    op.drop_table('cuisine_stats')
@@ -0,0 +1,80 @@
+import logging
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import RowMapping, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col
+
+from app.core.cache import CUISINES_CACHE_NAMESPACE, cached, catalog_version
+from app.db.session import get_async_db
+from app.models import Cuisine, CuisineStats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def cuisine_facets() -> Select[tuple[int, str, str, int, int]]:
+    """
+    Every cuisine with live set menus, with its set menu count and total
+    orders. Read off cuisine_stats, so it costs the same however large the
+    catalog grows.
+    """
+    return (
+        select(
+            col(Cuisine.id),
+            col(Cuisine.name),
+            col(Cuisine.slug),
+            col(CuisineStats.set_menu_count),
+            col(CuisineStats.total_orders),
+        )
+        .join(CuisineStats, col(CuisineStats.cuisine_id) == Cuisine.id)
+        .where(col(CuisineStats.set_menu_count) > 0)
+    )
+
+
+def cuisine_facet(row: RowMapping) -> dict[str, Any]:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "slug": row["slug"],
+        "set_menu_count": row["set_menu_count"],
+        "total_orders": row["total_orders"],
+    }
+
+
+@router.get("/cuisines")
+# Keyed by the catalog version, so only recomputed once the catalog changes
+@cached(
+    namespace=CUISINES_CACHE_NAMESPACE,
+    soft_ttl=3600,
+    hard_ttl=24 * 3600,
+    version=catalog_version,
+    # Clients reuse it for a minute, then revalidate it with its ETag
+    max_age=60,
+    stale_while_revalidate=300,
+)
+async def get_cuisines(
+    db: AsyncSession = Depends(get_async_db),
+) -> dict[str, list[dict[str, Any]]]:
+    """Cuisine facets of the set-menus listing, most ordered first."""
+    try:
+        rows = (
+            (
+                await db.execute(
+                    cuisine_facets().order_by(
+                        col(CuisineStats.total_orders).desc(), col(Cuisine.id)
+                    )
+                )
+            )
+            .mappings()
+            .all()
+        )
+        logger.info(f"Retrieved {len(rows)} cuisines")
+        return {"cuisines": [cuisine_facet(row) for row in rows]}
+    except Exception as e:
+        logger.error(f"Error retrieving cuisines: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Internal server error while retrieving cuisines"
+        )
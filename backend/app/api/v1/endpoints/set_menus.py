@@ -1,10 +1,31 @@
+import base64
+import binascii
+import inspect
 from fastapi import APIRouter, Query, HTTPException, Depends
-from sqlalchemy import func, desc
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db.session import get_db
+from fastapi_cache import FastAPICache
+from sqlalchemy import (
+    ColumnElement,
+    ScalarSelect,
+    Select,
+    SQLColumnExpression,
+    Subquery,
+    func,
+    literal,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col
+from typing import Any, List, Literal, Optional
+from app.api.v1.endpoints.cuisines import cuisine_facet, cuisine_facets
+from app.core.cache import SET_MENUS_CACHE_NAMESPACE, cached, catalog_version
+from app.core.config import settings
+from app.core.snapshots import Snapshot
+from app.db.session import AsyncSessionLocal, get_async_db
+from app.harvest.catalog_version import catalog_version_table
 from app.models import SetMenu, Cuisine
-from fastapi_cache.decorator import cache
 import logging
 
 # Configure logging
@@ -13,83 +34,235 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Listing order. id breaks ties, so every set menu has a unique position
+# and the pair is usable as a keyset cursor (see idx_live_popularity).
+LISTING_ORDER = (col(SetMenu.number_of_orders).desc(), col(SetMenu.id).desc())
+# Set menu fields in the listing
+LISTED_COLUMNS = (
+    col(SetMenu.id),
+    col(SetMenu.name),
+    col(SetMenu.price_per_person),
+    col(SetMenu.number_of_orders),
+    col(SetMenu.is_vegan),
+    col(SetMenu.is_vegetarian),
+    col(SetMenu.is_halal),
+)
+
+
+def encode_cursor(number_of_orders: int, set_menu_id: int) -> str:
+    """Opaque cursor pointing just past a set menu in listing order."""
+    key = f"{number_of_orders}:{set_menu_id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        number_of_orders, set_menu_id = key.split(":")
+        return int(number_of_orders), int(set_menu_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+
+
+def live_set_menus(
+    *columns: SQLColumnExpression[Any], cuisine_slug: Optional[str] = None
+) -> Select[Any]:
+    query = select(*columns).where(col(SetMenu.status) == 1)
+    if cuisine_slug:
+        query = query.join(Cuisine, col(SetMenu.cuisines)).where(
+            col(Cuisine.slug) == cuisine_slug
+        )
+    return query
+
+
+def json_array(rows: Subquery, *order_by: ColumnElement[Any]) -> ScalarSelect[Any]:
+    """``rows`` as a JSON array of objects, in ``order_by`` order."""
+    return select(
+        func.coalesce(
+            func.json_agg(
+                aggregate_order_by(  # type: ignore[no-untyped-call]
+                    rows.table_valued(), *order_by
+                )
+            ),
+            text("'[]'::json"),
+        )
+    ).scalar_subquery()
+
+
+def listing_statement(
+    cuisine_slug: Optional[str],
+    page: int,
+    page_size: int,
+    after: Optional[tuple[int, int]],
+    include_cuisines: bool = False,
+) -> Select[Any]:
+    """
+    One row with the listing's ``total``, its ``set_menus`` (one more than
+    ``page_size`` when there is a next page) and, with ``include_cuisines``,
+    every cuisine's facet counts, the last two as JSON arrays.
+
+    Each part is a separate scalar subquery rather than a shared CTE, so the
+    page can still be read off idx_live_popularity and the count doesn't
+    pay for sorting.
+    """
+    # Get paginated set menus sorted by popularity. One extra row tells
+    # whether there is a next page.
+    page_query = live_set_menus(
+        *LISTED_COLUMNS, cuisine_slug=cuisine_slug
+    ).order_by(*LISTING_ORDER)
+    if after is not None:
+        # Keyset: seek past the cursor instead of skipping rows, so rows
+        # don't shift between pages when order counts change.
+        page_query = page_query.where(
+            tuple_(col(SetMenu.number_of_orders), col(SetMenu.id))
+            < tuple_(*map(literal, after))
+        )
+    else:
+        page_query = page_query.offset((page - 1) * page_size)
+    page_rows = page_query.limit(page_size + 1).subquery("page")
+
+    total = select(func.count()).select_from(
+        live_set_menus(col(SetMenu.id), cuisine_slug=cuisine_slug).subquery()
+    )
+    columns = [
+        total.scalar_subquery().label("total"),
+        json_array(
+            page_rows, page_rows.c.number_of_orders.desc(), page_rows.c.id.desc()
+        ).label("set_menus"),
+    ]
+    if include_cuisines:
+        # Get cuisines with their set menu counts
+        facets = cuisine_facets().subquery("facets")
+        columns.append(
+            json_array(facets, facets.c.total_orders.desc(), facets.c.id)
+            .label("cuisines")
+        )
+    return select(*columns)
+
+
+async def render_snapshot() -> tuple[int, dict[str, bytes]]:
+    """
+    The first SET_MENUS_SNAPSHOT_PAGES pages of the default listing, overall
+    and for each cuisine with live set menus, serialized and keyed as
+    get_set_menus caches them. Read in one snapshot of the database, so they
+    all belong to the catalog version they're stored under.
+    """
+    listing = get_set_menus.__wrapped__  # type: ignore[attr-defined]
+    build_key = FastAPICache.get_key_builder()
+    responses = {}
+    async with AsyncSessionLocal() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        version = (
+            await db.execute(select(catalog_version_table.c.version))
+        ).scalar_one()
+        slugs = (await db.scalars(
+            cuisine_facets().with_only_columns(col(Cuisine.slug)).order_by(col(Cuisine.slug))
+        )).all()
+        namespace = f"{FastAPICache.get_prefix()}:{SET_MENUS_CACHE_NAMESPACE}:v{version}"
+        for cuisine_slug in [None, *slugs]:
+            for page in range(1, settings.SET_MENUS_SNAPSHOT_PAGES + 1):
+                query = {
+                    "cuisine_slug": cuisine_slug,
+                    "page": page,
+                    "page_size": 20,
+                    "cursor": None,
+                    "include": None,
+                }
+                result = await listing(**query, db=db)
+                key = build_key(listing, namespace, args=(), kwargs=query)
+                if inspect.isawaitable(key):
+                    key = await key
+                responses[key] = FastAPICache.get_coder().encode(result)
+                if result["pagination"]["next_cursor"] is None:
+                    break
+    logger.info(f"Rendered {len(responses)} set-menus pages of catalog version {version}")
+    return version, responses
+
+
+# Memory-mapped by every worker on the host, see render_snapshot
+SNAPSHOT = Snapshot(settings.SET_MENUS_SNAPSHOT_PATH, render_snapshot)
+
+
 @router.get("/set-menus")
-@cache(expire=300)  # Cache for 5 minutes
+# Keyed by the catalog version, so only recomputed once the catalog changes.
+# The first pages are served straight from the snapshot.
+@cached(
+    namespace=SET_MENUS_CACHE_NAMESPACE,
+    soft_ttl=3600,
+    hard_ttl=24 * 3600,
+    version=catalog_version,
+    # Clients reuse it for a minute, then revalidate it with its ETag
+    max_age=60,
+    stale_while_revalidate=300,
+    snapshot=SNAPSHOT
+)
 async def get_set_menus(
     cuisine_slug: Optional[str] = Query(None),
     page: int = Query(1, gt=0),
     page_size: int = Query(20, gt=0, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(
+        None,
+        description="next_cursor of the previous page. Takes precedence over"
+        " page and costs the same however deep the page is.",
+    ),
+    include: Optional[Literal["cuisines"]] = Query(
+        None,
+        description="cuisines adds the cuisine facets, also served on their"
+        " own (and cached longer) by /cuisines.",
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    after = decode_cursor(cursor) if cursor else None
+    # Slugs are lowercase, and the cache key treats this one as such
+    if cuisine_slug:
+        cuisine_slug = cuisine_slug.lower()
+    include_cuisines = include == "cuisines"
     try:
-        logger.info(f"Starting get_set_menus request with params: cuisine_slug={cuisine_slug}, page={page}, page_size={page_size}")
-        
-        # Base query for live set menus
-        base_query = db.query(SetMenu).filter(SetMenu.status == 1)
-        logger.info("Created base query")
-        
-        # Apply cuisine filter if provided
-        if cuisine_slug:
-            base_query = base_query.join(
-                SetMenu.cuisines
-            ).filter(Cuisine.slug == cuisine_slug)
-            logger.info(f"Applied cuisine filter: {cuisine_slug}")
+        logger.info(f"Starting get_set_menus request with params: cuisine_slug={cuisine_slug}, page={page}, page_size={page_size}, cursor={cursor}, include={include}")
         
         try:
-            # Get total count for pagination
-            total_count = base_query.count()
+            # The page, the total and any cuisine facets come back together
+            # from one statement: a single round trip per uncached request.
+            row = (await db.execute(
+                listing_statement(
+                    cuisine_slug, page, page_size, after, include_cuisines
+                )
+            )).one()
+            total_count = row.total
             logger.info(f"Total count: {total_count}")
-            
-            # Get paginated set menus sorted by popularity
-            set_menus = base_query.order_by(
-                desc(SetMenu.number_of_orders)
-            ).offset((page - 1) * page_size).limit(page_size).all()
+
+            set_menus = row.set_menus
+            has_next = len(set_menus) > page_size
+            set_menus = set_menus[:page_size]
             logger.info(f"Retrieved {len(set_menus)} set menus")
-            
-            # Get cuisines with their set menu counts
-            cuisines = db.query(
-                Cuisine,
-                func.count(SetMenu.id).label('set_menu_count'),
-                func.sum(SetMenu.number_of_orders).label('total_orders')
-            ).join(
-                SetMenu.cuisines
-            ).filter(
-                SetMenu.status == 1
-            ).group_by(
-                Cuisine.id
-            ).order_by(
-                desc('total_orders')
-            ).all()
-            logger.info(f"Retrieved {len(cuisines)} cuisines")
 
             response = {
                 "set_menus": [
                     {
-                        "id": sm.id,
-                        "name": sm.name,
-                        "price_per_person": sm.price_per_person,
-                        "number_of_orders": sm.number_of_orders,
-                        "is_vegan": sm.is_vegan,
-                        "is_vegetarian": sm.is_vegetarian,
-                        "is_halal": sm.is_halal
+                        "id": sm["id"],
+                        "name": sm["name"],
+                        # JSON doesn't keep 45.0 apart from 45
+                        "price_per_person": float(sm["price_per_person"]),
+                        "number_of_orders": sm["number_of_orders"],
+                        "is_vegan": sm["is_vegan"],
+                        "is_vegetarian": sm["is_vegetarian"],
+                        "is_halal": sm["is_halal"]
                     } for sm in set_menus
                 ],
-                "cuisines": [
-                    {
-                        "id": c[0].id,
-                        "name": c[0].name,
-                        "slug": c[0].slug,
-                        "set_menu_count": c[1],
-                        "total_orders": c[2] or 0
-                    } for c in cuisines
-                ],
                 "pagination": {
                     "total": total_count,
-                    "page": page,
+                    # Cursor pages aren't numbered
+                    "page": None if after is not None else page,
                     "page_size": page_size,
-                    "total_pages": (total_count + page_size - 1) // page_size
+                    "total_pages": (total_count + page_size - 1) // page_size,
+                    "next_cursor": encode_cursor(
+                        set_menus[-1]["number_of_orders"], set_menus[-1]["id"]
+                    ) if has_next else None
                 }
             }
+            if include_cuisines:
+                logger.info(f"Retrieved {len(row.cuisines)} cuisines")
+                response["cuisines"] = [cuisine_facet(c) for c in row.cuisines]
             logger.info("Successfully prepared response")
             return response
             
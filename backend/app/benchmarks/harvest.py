@@ -0,0 +1,258 @@
+"""
+Offline throughput benchmark of the set-menu harvester.
+
+Serves a synthetic catalog from a local stub upstream and runs
+``harvest_set_menus`` against it once per variant, each in a fresh process
+so peak RSS is per run. Writes go to the database configured by the
+``POSTGRES_*`` settings; the synthetic rows use ids from ``ID_OFFSET`` up
+and are deleted before and after every run.
+
+    python -m app.benchmarks.harvest --pages 200 --page-size 100
+    python -m app.benchmarks.harvest --variants copy --latency 0.05 --throttle-rate 0.1
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from app.benchmarks.stub_upstream import (
+    CUISINE_POOL,
+    ID_OFFSET,
+    Catalog,
+    Faults,
+    StubUpstream,
+)
+
+# harvest_set_menus keyword arguments of every variant.
+VARIANTS: dict[str, dict[str, Any]] = {
+    "upsert": {"mode": "upsert"},
+    "upsert-stream": {"mode": "upsert", "stream": True},
+    # Measured against a catalog that is already loaded, so every set menu
+    # is unchanged.
+    "incremental": {"mode": "upsert", "incremental": True},
+    "copy": {"mode": "copy"},
+    "copy-stream": {"mode": "copy", "stream": True},
+    # Replaces the whole catalog: only run it against a throwaway database.
+    "swap": {"mode": "swap"},
+}
+
+
+@dataclass
+class Result:
+    variant: str
+    pages: int
+    rows: int
+    seconds: float
+    pages_per_second: float
+    rows_per_second: float
+    # SQL sent through SQLAlchemy; the rows streamed by COPY aren't statements.
+    statements: int
+    statements_per_page: float
+    db_seconds: float
+    requests: int
+    throttled: int
+    peak_rss_mb: float
+
+
+def delete_synthetic_rows(session: Any, url: str | None, catalog: Catalog) -> None:
+    from sqlalchemy import delete, or_
+
+    from app.models import (
+        Cuisine,
+        HarvestCheckpoint,
+        HarvestRun,
+        SetMenu,
+        SetMenuCuisineLink,
+    )
+
+    menu_ids = (ID_OFFSET, ID_OFFSET + catalog.rows - 1)
+    cuisine_ids = (ID_OFFSET, ID_OFFSET + CUISINE_POOL - 1)
+    session.execute(
+        delete(SetMenuCuisineLink).where(
+            or_(
+                SetMenuCuisineLink.set_menu_id.between(*menu_ids),  # type: ignore[attr-defined]
+                SetMenuCuisineLink.cuisine_id.between(*cuisine_ids),  # type: ignore[attr-defined]
+            )
+        )
+    )
+    session.execute(delete(SetMenu).where(SetMenu.id.between(*menu_ids)))  # type: ignore[attr-defined]
+    session.execute(delete(Cuisine).where(Cuisine.id.between(*cuisine_ids)))  # type: ignore[attr-defined]
+    if url is not None:
+        session.execute(
+            delete(HarvestRun).where(HarvestRun.source_url == url)  # type: ignore[arg-type]
+        )
+        session.execute(
+            delete(HarvestCheckpoint).where(HarvestCheckpoint.source_url == url)  # type: ignore[arg-type]
+        )
+    session.commit()
+
+
+def measure(
+    variant: str, url: str, catalog: Catalog, options: dict[str, Any], results: Any
+) -> None:
+    """Run one harvest in this (fresh) process and put its numbers on ``results``."""
+    from sqlalchemy import event
+
+    from app.harvest_setmenus import SessionLocal, engine, harvest_set_menus
+
+    kwargs = {**options, **VARIANTS[variant]}
+    with SessionLocal() as session:
+        delete_synthetic_rows(session, url, catalog)
+    if kwargs.get("incremental"):
+        harvest_set_menus(url, **{**kwargs, "incremental": False})
+
+    counters = {"statements": 0, "db_seconds": 0.0}
+
+    def before_execute(conn: Any, *_args: Any) -> None:
+        conn.info["started"] = time.perf_counter()
+
+    def after_execute(conn: Any, *_args: Any) -> None:
+        counters["statements"] += 1
+        counters["db_seconds"] += time.perf_counter() - conn.info.pop("started")
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    event.listen(engine, "after_cursor_execute", after_execute)
+    started = time.perf_counter()
+    try:
+        harvest_set_menus(url, **kwargs)
+    finally:
+        seconds = time.perf_counter() - started
+        event.remove(engine, "before_cursor_execute", before_execute)
+        event.remove(engine, "after_cursor_execute", after_execute)
+        with SessionLocal() as session:
+            delete_synthetic_rows(session, url, catalog)
+    # ru_maxrss is in kilobytes on Linux.
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put(
+        {
+            "seconds": seconds,
+            "peak_rss_mb": peak_rss_mb,
+            "statements": counters["statements"],
+            "db_seconds": counters["db_seconds"],
+        }
+    )
+
+
+def run_variant(
+    variant: str, catalog: Catalog, faults: Faults, options: dict[str, Any]
+) -> Result:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    with StubUpstream(catalog, faults) as upstream:
+        process = context.Process(
+            target=measure, args=(variant, upstream.url, catalog, options, results)
+        )
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(
+                f"{variant} harvest failed (exit code {process.exitcode})"
+            )
+        numbers = results.get()
+        requests, throttled = upstream.requests.value, upstream.throttled.value
+    seconds = numbers["seconds"]
+    return Result(
+        variant=variant,
+        pages=catalog.pages,
+        rows=catalog.rows,
+        seconds=seconds,
+        pages_per_second=catalog.pages / seconds,
+        rows_per_second=catalog.rows / seconds,
+        statements=numbers["statements"],
+        statements_per_page=numbers["statements"] / catalog.pages,
+        db_seconds=numbers["db_seconds"],
+        requests=requests,
+        throttled=throttled,
+        peak_rss_mb=numbers["peak_rss_mb"],
+    )
+
+
+def print_table(results: list[Result]) -> None:
+    print(
+        f"{'variant':<14} {'pages/s':>9} {'rows/s':>10} {'stmts/page':>10}"
+        f" {'db s':>7} {'wall s':>7} {'429s':>5} {'peak RSS MB':>11}"
+    )
+    for r in results:
+        print(
+            f"{r.variant:<14} {r.pages_per_second:>9.1f} {r.rows_per_second:>10.0f}"
+            f" {r.statements_per_page:>10.1f} {r.db_seconds:>7.2f} {r.seconds:>7.2f}"
+            f" {r.throttled:>5} {r.peak_rss_mb:>11.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=VARIANTS,
+        default=["upsert", "upsert-stream", "incremental", "copy"],
+    )
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with 429 Too Many Requests",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=0.05,
+        help="Retry-After sent with each 429 (seconds)",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--normalize-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-rate", type=float, default=1000.0)
+    parser.add_argument(
+        "--initial-rate",
+        type=float,
+        default=None,
+        help="Starting request rate (defaults to --max-rate, so the pacer's"
+        " ramp-up doesn't hide the ingest path)",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print one JSON object per variant"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    catalog = Catalog(pages=args.pages, page_size=args.page_size, seed=args.seed)
+    faults = Faults(
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    )
+    options = {
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "normalize_workers": args.normalize_workers,
+        "queue_size": args.queue_size,
+        "max_rate": args.max_rate,
+        "initial_rate": args.initial_rate or args.max_rate,
+    }
+    results = [
+        run_variant(variant, catalog, faults, options) for variant in args.variants
+    ]
+    if args.json:
+        for result in results:
+            print(json.dumps(asdict(result)))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
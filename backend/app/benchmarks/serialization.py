@@ -0,0 +1,198 @@
+"""
+Serialization CPU per request of a page of rows.
+
+Times, in CPU seconds of this process, what happens to a route's return
+value between the route returning it and the response body being ready,
+for a synthetic page of ``--rows`` rows:
+
+- ``items``: a page of ``Item`` rows, as ``read_items`` reads them.
+  ``fastapi`` builds an ``ItemsPublic`` from them, which validates every
+  row, then validates it again against ``response_model`` and runs it
+  through ``jsonable_encoder`` and the stdlib ``json``, as FastAPI does by
+  default; ``fastapi-orjson`` does the same with ``ORJSONResponse``, the
+  app's default response class; ``page-response`` is ``page_response()``,
+  which ``read_items`` now returns: the rows' public fields encoded by
+  orjson, without validating them.
+- ``set-menus``: the dict ``get_set_menus`` returns. ``fastapi`` and
+  ``fastapi-orjson`` as above (minus the validation: it has no
+  ``response_model``); ``coder`` is the response cache's ``ORJSONCoder``,
+  which ``cached()`` sends as is.
+
+No database or server is involved: only serialization is measured.
+
+    python -m app.benchmarks.serialization --rows 100 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.core.responses import ORJSONCoder, page_response
+from app.models import Item, ItemPublic, ItemsPublic
+
+
+@dataclass
+class Result:
+    payload: str
+    variant: str
+    requests: int
+    cpu_seconds: float
+    microseconds_per_request: float
+    speedup: float
+    body_bytes: int
+
+
+def synthetic_items(rows: int, rng: random.Random) -> list[Item]:
+    owner_id = uuid.UUID(int=rng.getrandbits(128))
+    return [
+        Item(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            title=f"Item {i}",
+            description=rng.choice([None, f"Description of item {i}"]),
+            owner_id=owner_id,
+        )
+        for i in range(rows)
+    ]
+
+
+def synthetic_set_menus(rows: int, rng: random.Random) -> dict[str, Any]:
+    return {
+        "set_menus": [
+            {
+                "id": i,
+                "name": f"Set menu {i}",
+                "price_per_person": round(rng.uniform(10, 80), 2),
+                "number_of_orders": rng.randrange(10_000),
+                "is_vegan": rng.random() < 0.2,
+                "is_vegetarian": rng.random() < 0.4,
+                "is_halal": rng.random() < 0.3,
+            }
+            for i in range(rows)
+        ],
+        "pagination": {
+            "total": rows * 10,
+            "page": 1,
+            "page_size": rows,
+            "total_pages": 10,
+            "next_cursor": "MTIzOjQ1Ng",
+        },
+    }
+
+
+Render = Callable[[], Awaitable[bytes]]
+
+
+async def fastapi_body(
+    route: APIRoute, response_class: type[JSONResponse], content: Any
+) -> bytes:
+    """What FastAPI's request handler makes of ``content`` returned by ``route``."""
+    serialized = await serialize_response(
+        field=route.response_field, response_content=content
+    )
+    return bytes(response_class(serialized).body)
+
+
+def variants(rows: int, seed: int) -> dict[str, dict[str, Render]]:
+    rng = random.Random(seed)
+    items = synthetic_items(rows, rng)
+    set_menus = synthetic_set_menus(rows, rng)
+    items_route = APIRoute("/items", endpoint=lambda: None, response_model=ItemsPublic)
+    set_menus_route = APIRoute("/set-menus", endpoint=lambda: None)
+
+    def page() -> ItemsPublic:
+        return ItemsPublic(data=items, count=rows)
+
+    async def items_page_response() -> bytes:
+        return bytes(page_response(ItemPublic, items, rows).body)
+
+    async def set_menus_coder() -> bytes:
+        return ORJSONCoder.encode(set_menus)
+
+    return {
+        "items": {
+            "fastapi": lambda: fastapi_body(items_route, JSONResponse, page()),
+            "fastapi-orjson": lambda: fastapi_body(items_route, ORJSONResponse, page()),
+            "page-response": items_page_response,
+        },
+        "set-menus": {
+            "fastapi": lambda: fastapi_body(set_menus_route, JSONResponse, set_menus),
+            "fastapi-orjson": lambda: fastapi_body(
+                set_menus_route, ORJSONResponse, set_menus
+            ),
+            "coder": set_menus_coder,
+        },
+    }
+
+
+async def measure(payload: str, name: str, render: Render, requests: int) -> Result:
+    body = await render()
+    started = time.process_time()
+    for _ in range(requests):
+        await render()
+    cpu_seconds = time.process_time() - started
+    return Result(
+        payload=payload,
+        variant=name,
+        requests=requests,
+        cpu_seconds=cpu_seconds,
+        microseconds_per_request=cpu_seconds / requests * 1e6,
+        speedup=1.0,
+        body_bytes=len(body),
+    )
+
+
+def print_table(results: list[Result]) -> None:
+    print(
+        f"{'payload':<10} {'variant':<15} {'us/req':>9} {'speedup':>8}"
+        f" {'body bytes':>10}"
+    )
+    for r in results:
+        print(
+            f"{r.payload:<10} {r.variant:<15} {r.microseconds_per_request:>9.1f}"
+            f" {r.speedup:>7.1f}x {r.body_bytes:>10}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page")
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Pages serialized per variant"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", action="store_true", help="Print one JSON object per variant"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    for payload, renders in variants(args.rows, args.seed).items():
+        measured = [
+            asyncio.run(measure(payload, name, render, args.requests))
+            for name, render in renders.items()
+        ]
+        # Relative to the first variant: FastAPI's default path.
+        for result in measured:
+            result.speedup = measured[0].cpu_seconds / result.cpu_seconds
+        results.extend(measured)
+    if args.json:
+        for result in results:
+            print(json.dumps(asdict(result)))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
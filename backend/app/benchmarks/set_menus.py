@@ -0,0 +1,349 @@
+"""
+Concurrency benchmark of ``GET /api/v1/set-menus``.
+
+Loads a synthetic catalog into the database configured by the
+``POSTGRES_*`` settings (ids from ``ID_OFFSET`` up, deleted afterwards),
+starts the API under a single uvicorn worker and sends it requests at each
+concurrency level, bypassing the response cache unless ``--cached`` is
+given. Each level reports the database pool checkouts per request, read off
+the API's ``/metrics``: 1.0 without the cache, and the miss rate with it
+(cache hits never take a connection). While queries don't block
+the event loop, throughput grows with concurrency until the database is
+the limit, instead of staying flat at the single-request rate.
+
+A local database answers in microseconds, which hides what blocking costs.
+``--db-latency`` puts a proxy between the API and the database that delays
+every reply, like a database across the network does.
+
+    python -m app.benchmarks.set_menus --levels 1 8 32 --requests 400
+    python -m app.benchmarks.set_menus --db-latency 0.005
+    python -m app.benchmarks.set_menus --cached --levels 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import httpx
+
+from app.benchmarks.stub_upstream import CUISINE_POOL, Catalog
+
+ENDPOINT = "/api/v1/set-menus"
+CHECKOUTS_METRIC = "api_db_pool_checkouts_total"
+
+
+@dataclass
+class Result:
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    requests_per_second: float
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+    checkouts_per_request: float
+
+
+def load_catalog(catalog: Catalog) -> None:
+    from sqlmodel import Session
+
+    from app.benchmarks.harvest import delete_synthetic_rows
+    from app.core.db import engine
+    from app.harvest.ingest import BulkWriter
+
+    writer = BulkWriter()
+    with Session(engine) as session:
+        delete_synthetic_rows(session, None, catalog)
+        for page in range(1, catalog.pages + 1):
+            writer.write_page(session, catalog.page("", page)["data"])
+        session.commit()
+
+
+def unload_catalog(catalog: Catalog) -> None:
+    from sqlmodel import Session
+
+    from app.benchmarks.harvest import delete_synthetic_rows
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        delete_synthetic_rows(session, None, catalog)
+
+
+class LatencyProxy:
+    """
+    TCP proxy that holds every chunk the target sends back for ``latency``
+    seconds, in order, on a background thread.
+    """
+
+    def __init__(self, host: str, port: int, latency: float) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.listen_port = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "LatencyProxy":
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+
+    def _run(self) -> None:
+        self._loop.run_until_complete(self._serve())
+        self._loop.close()
+
+    async def _serve(self) -> None:
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.listen_port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await self._stopping.wait()
+        current = asyncio.current_task()
+        connections = [task for task in asyncio.all_tasks() if task is not current]
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    async def _handle(
+        self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter
+    ) -> None:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        replies: asyncio.Queue[tuple[float, bytes]] = asyncio.Queue()
+
+        async def forward(source: asyncio.StreamReader, target: Any) -> None:
+            while data := await source.read(65536):
+                await target(data)
+
+        async def send(data: bytes) -> None:
+            writer.write(data)
+            await writer.drain()
+
+        async def delay(data: bytes) -> None:
+            await replies.put((time.monotonic() + self.latency, data))
+
+        async def deliver() -> None:
+            while True:
+                due, data = await replies.get()
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                client_writer.write(data)
+                await client_writer.drain()
+
+        delivering = asyncio.create_task(deliver())
+        try:
+            await asyncio.gather(forward(client_reader, send), forward(reader, delay))
+        except ConnectionError:
+            pass
+        finally:
+            delivering.cancel()
+            writer.close()
+            client_writer.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def start_server(
+    port: int, env: dict[str, str] | None = None, timeout: float = 30.0
+) -> subprocess.Popen[bytes]:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            "1",
+            "--log-level",
+            "warning",
+        ],
+        env={**os.environ, **(env or {})},
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/v1/utils/health-check/")
+            return server
+        except httpx.TransportError:
+            if server.poll() is not None:
+                raise RuntimeError("The API exited on startup") from None
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"The API didn't start within {timeout}s")
+
+
+def request_params(rng: random.Random) -> dict[str, Any]:
+    params: dict[str, Any] = {"page": rng.randint(1, 5)}
+    if rng.random() < 0.75:
+        params["cuisine_slug"] = f"cuisine-{rng.randrange(CUISINE_POOL)}"
+    return params
+
+
+async def pool_checkouts(client: httpx.AsyncClient) -> float:
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    for line in response.text.splitlines():
+        name, _, value = line.partition(" ")
+        if name == CHECKOUTS_METRIC:
+            return float(value)
+    raise RuntimeError(f"The API doesn't export {CHECKOUTS_METRIC}")
+
+
+async def run_level(
+    base_url: str, concurrency: int, total: int, seed: int, cached: bool = False
+) -> Result:
+    rng = random.Random(seed)
+    params = [request_params(rng) for _ in range(total)]
+    pending = iter(params)
+    latencies: list[float] = []
+    errors = 0
+    headers = {} if cached else {"Cache-Control": "no-store"}
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for query in pending:
+            started = time.perf_counter()
+            response = await client.get(ENDPOINT, params=query, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60.0
+    ) as client:
+        checkouts = await pool_checkouts(client)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+        checkouts = await pool_checkouts(client) - checkouts
+
+    latencies.sort()
+    return Result(
+        concurrency=concurrency,
+        requests=total,
+        errors=errors,
+        seconds=seconds,
+        requests_per_second=total / seconds,
+        p50_ms=statistics.median(latencies) * 1000,
+        p95_ms=latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        max_ms=latencies[-1] * 1000,
+        checkouts_per_request=checkouts / total,
+    )
+
+
+def print_table(results: list[Result]) -> None:
+    print(
+        f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}"
+        f" {'max ms':>8} {'errors':>6} {'checkouts/req':>13}"
+    )
+    for r in results:
+        print(
+            f"{r.concurrency:>11} {r.requests_per_second:>8.1f} {r.p50_ms:>8.1f}"
+            f" {r.p95_ms:>8.1f} {r.max_ms:>8.1f} {r.errors:>6}"
+            f" {r.checkouts_per_request:>13.2f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 8, 32, 64])
+    parser.add_argument(
+        "--requests", type=int, default=400, help="Requests per concurrency level"
+    )
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--db-latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every database reply the API receives",
+    )
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Let requests use the response cache (needs the API's Redis)",
+    )
+    parser.add_argument(
+        "--url",
+        help="Benchmark an API that is already running (and already has the"
+        " synthetic catalog loaded) instead of starting one",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print one JSON object per level"
+    )
+    return parser.parse_args()
+
+
+def run_levels(base_url: str, args: argparse.Namespace) -> list[Result]:
+    # One untimed pass warms the connection pools.
+    asyncio.run(run_level(base_url, max(args.levels), max(args.levels), args.seed))
+    return [
+        asyncio.run(
+            run_level(base_url, level, args.requests, args.seed, cached=args.cached)
+        )
+        for level in args.levels
+    ]
+
+
+def main() -> None:
+    from app.core.config import settings
+
+    args = parse_args()
+    catalog = Catalog(pages=args.pages, page_size=args.page_size, seed=args.seed)
+    if args.url is not None:
+        results = run_levels(args.url, args)
+    else:
+        load_catalog(catalog)
+        proxy = LatencyProxy(
+            settings.POSTGRES_SERVER, settings.POSTGRES_PORT, args.db_latency
+        )
+        try:
+            with proxy:
+                env = {}
+                if args.db_latency:
+                    env = {
+                        "POSTGRES_SERVER": "127.0.0.1",
+                        "POSTGRES_PORT": str(proxy.listen_port),
+                    }
+                port = free_port()
+                server = start_server(port, env)
+                try:
+                    results = run_levels(f"http://127.0.0.1:{port}", args)
+                finally:
+                    server.terminate()
+                    server.wait()
+        finally:
+            unload_catalog(catalog)
+    if args.json:
+        for result in results:
+            print(json.dumps(asdict(result)))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.sharedctypes import Synchronized
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+# Synthetic ids start here so they never collide with harvested data.
+ID_OFFSET = 900_000_000
+CUISINE_POOL = 40
+GROUP_NAMES = ("Starters", "Mains", "Sides", "Desserts", "Canape", "Sharing_Plates")
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """A synthetic upstream catalog of ``pages`` pages of ``page_size`` set menus."""
+
+    pages: int = 50
+    page_size: int = 100
+    seed: int = 0
+
+    @property
+    def rows(self) -> int:
+        return self.pages * self.page_size
+
+    def set_menu(self, rng: random.Random, menu_id: int) -> dict[str, Any]:
+        # Shaped like the real API: nested cuisines and groups, and the
+        # fields upstream is known to send as null now and then.
+        cuisines = rng.sample(range(CUISINE_POOL), k=rng.randint(0, 3))
+        groups: dict[str, int | None] = {"ungrouped": rng.randint(0, 2)}
+        for name in rng.sample(GROUP_NAMES, k=rng.randint(1, 4)):
+            groups[name] = rng.choice([None, rng.randint(1, 6)])
+        return {
+            "id": menu_id,
+            "created_at": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            f"T{rng.randint(0, 23):02d}:00:00.000000Z",
+            "description": rng.choice([None, "Seasonal sharing menu " * 8]),
+            "display_text": rng.choice([None, 0, 1]),
+            "image": f"https://images.test/{menu_id}.jpg",
+            "thumbnail": rng.choice([None, f"https://images.test/{menu_id}_t.jpg"]),
+            "is_vegan": rng.choice([None, True, False]),
+            "is_vegetarian": rng.choice([None, True, False]),
+            "name": f"Synthetic set menu {menu_id}",
+            "status": rng.choice([0, 1, 1, 1]),
+            "price_per_person": round(rng.uniform(15, 120), 2),
+            "min_spend": rng.choice([None, 0, 150, 300]),
+            "is_seated": rng.choice([True, False]),
+            "is_standing": rng.choice([None, True, False]),
+            "is_canape": rng.choice([True, False]),
+            "is_mixed_dietary": rng.choice([True, False]),
+            "is_meal_prep": False,
+            "is_halal": rng.choice([None, True, False]),
+            "is_kosher": rng.choice([None, False]),
+            "available": rng.choice([True, True, False]),
+            "number_of_orders": rng.randint(0, 2000),
+            "groups": {
+                "dishes_count": rng.randint(3, 12),
+                "selectable_dishes_count": rng.randint(1, 6),
+                "groups": groups,
+            },
+            "cuisines": [
+                {
+                    "id": ID_OFFSET + cuisine,
+                    "name": f"Cuisine {cuisine}",
+                    "slug": f"cuisine-{cuisine}",
+                }
+                for cuisine in cuisines
+            ],
+        }
+
+    def page(self, base_url: str, page: int) -> dict[str, Any]:
+        rng = random.Random(self.seed * 1_000_003 + page)
+        first_id = ID_OFFSET + (page - 1) * self.page_size
+        return {
+            "data": [
+                self.set_menu(rng, first_id + offset)
+                for offset in range(self.page_size)
+            ],
+            "links": {
+                "next": f"{base_url}?page={page + 1}" if page < self.pages else None
+            },
+            "meta": {
+                "current_page": page,
+                "last_page": self.pages,
+                "per_page": self.page_size,
+                "total": self.rows,
+            },
+        }
+
+
+@dataclass(frozen=True)
+class Faults:
+    """Latency and throttling injected into every response."""
+
+    latency: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 0.05
+
+
+def serve(
+    catalog: Catalog,
+    faults: Faults,
+    ready: Any,
+    requests: Synchronized,  # type: ignore[type-arg]
+    throttled: Synchronized,  # type: ignore[type-arg]
+) -> None:
+    rng = random.Random(catalog.seed)
+
+    @lru_cache(maxsize=64)
+    def body(base_url: str, page: int) -> bytes:
+        return json.dumps(catalog.page(base_url, page)).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            with requests.get_lock():
+                requests.value += 1
+            if faults.latency:
+                time.sleep(faults.latency)
+            if faults.throttle_rate and rng.random() < faults.throttle_rate:
+                with throttled.get_lock():
+                    throttled.value += 1
+                self.send_response(429)
+                self.send_header("Retry-After", str(faults.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            url = urlparse(self.path)
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            if not 1 <= page <= catalog.pages:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            base_url = f"http://{self.headers['Host']}{url.path}"
+            payload = body(base_url, page)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+class StubUpstream:
+    """
+    Local stand-in for the upstream set-menus API, serving ``catalog`` from
+    a separate process so it neither competes with the harvester for the
+    GIL nor counts towards its memory.
+
+    Use as a context manager; ``url`` is the first page.
+    """
+
+    def __init__(self, catalog: Catalog, faults: Faults | None = None) -> None:
+        self.catalog = catalog
+        self.faults = faults or Faults()
+        self.requests = multiprocessing.Value("i", 0)
+        self.throttled = multiprocessing.Value("i", 0)
+        self.url = ""
+        self._process: multiprocessing.Process | None = None
+
+    def __enter__(self) -> "StubUpstream":
+        ready: multiprocessing.Queue[int] = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=serve,
+            args=(self.catalog, self.faults, ready, self.requests, self.throttled),
+            daemon=True,
+        )
+        self._process.start()
+        self.url = f"http://127.0.0.1:{ready.get(timeout=10)}/set-menus"
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
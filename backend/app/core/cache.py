@@ -1,8 +1,533 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import math
+import secrets
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from functools import wraps
+from typing import Annotated, Any, get_args, get_origin
+
+from fastapi import params
+from fastapi.dependencies.utils import get_typed_return_annotation, get_typed_signature
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.decorator import cache
-from redis import asyncio as aioredis
+from fastapi_cache.types import Backend
+from sqlalchemy import select
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from app.core.metrics import REGISTRY
+from app.core.snapshots import Snapshot
+from app.db.session import AsyncSessionLocal
+from app.harvest.catalog_version import catalog_version_table
+
+logger = logging.getLogger(__name__)
+
+# Query parameters the endpoints compare case-insensitively.
+CASE_INSENSITIVE_PARAMS = frozenset({"cuisine_slug"})
+
+# Namespace of the cached /api/v1/set-menus responses.
+SET_MENUS_CACHE_NAMESPACE = "set-menus"
+# Namespace of the cached /api/v1/cuisines responses.
+CUISINES_CACHE_NAMESPACE = "cuisines"
+# Cache key of the catalog version (see catalog_version()). Re-read from the
+# database once it expires: changes the API doesn't hear of, e.g. harvests
+# run from the CLI, are served within that many seconds.
+CATALOG_VERSION_KEY = "catalog-version"
+CATALOG_VERSION_TTL = 60
+
+
+def _is_plain(value: Any) -> bool:
+    if isinstance(value, list | tuple):
+        return all(_is_plain(item) for item in value)
+    return value is None or isinstance(value, str | int | float | bool)
+
+
+def query_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Request | None = None,  # noqa: ARG001
+    response: Response | None = None,  # noqa: ARG001
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> str:
+    """
+    Cache key of an endpoint call, built from its query parameters only.
+
+    FastAPI passes every parameter, defaults included, so ``?page=1`` and no
+    ``page`` share a key. Parameters are sorted by name and those in
+    ``CASE_INSENSITIVE_PARAMS`` lowercased. Parameters declared with
+    ``Depends`` (database sessions, the current user, ...) are left out:
+    fastapi-cache's default builder hashed their repr, which differs on every
+    request, so no two requests ever shared a key.
+    """
+    signature = get_typed_signature(func)
+    arguments = signature.bind_partial(*args, **kwargs).arguments
+    query = {}
+    for name, value in sorted(arguments.items()):
+        if _depends(signature.parameters[name]) is not None:
+            continue
+        if not _is_plain(value):
+            raise TypeError(
+                f"Can't build a cache key from {func.__name__}({name}={value!r})."
+                " Declare it with Depends() if it's injected."
+            )
+        if name in CASE_INSENSITIVE_PARAMS and isinstance(value, str):
+            value = value.lower()
+        query[name] = value
+    payload = json.dumps([func.__module__, func.__name__, query], separators=(",", ":"))
+    digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def _depends(parameter: inspect.Parameter) -> params.Depends | None:
+    """
+    The ``Depends`` ``parameter`` is declared with, as its default or, like
+    ``SessionDep``, in its ``Annotated`` type (the last one, as FastAPI reads
+    it).
+    """
+    if isinstance(parameter.default, params.Depends):
+        return parameter.default
+    if get_origin(parameter.annotation) is Annotated:
+        for metadata in reversed(get_args(parameter.annotation)[1:]):
+            if isinstance(metadata, params.Depends):
+                return metadata
+    return None
+
+
+async def catalog_version() -> int:
+    """The catalog version cached responses are keyed by."""
+    backend = FastAPICache.get_backend()
+    key = f"{FastAPICache.get_prefix()}:{CATALOG_VERSION_KEY}"
+    try:
+        version = await backend.get(key)
+    except Exception:
+        logger.warning(
+            f"Error retrieving cache key '{key}' from backend:", exc_info=True
+        )
+        version = None
+    if version is not None:
+        return int(version)
+    return await _publish_catalog_version()
+
+
+async def sync_catalog_version() -> None:
+    """
+    Share the catalog version in the database with every worker, e.g. after
+    a harvest. Responses cached under older versions are no longer served,
+    and left to expire; if the harvest changed nothing, none are dropped.
+    """
+    version = await _publish_catalog_version()
+    logger.info(f"Catalog version is {version}")
+
+
+async def _publish_catalog_version() -> int:
+    async with AsyncSessionLocal() as db:
+        version: int = (
+            await db.execute(select(catalog_version_table.c.version))
+        ).scalar_one()
+    key = f"{FastAPICache.get_prefix()}:{CATALOG_VERSION_KEY}"
+    try:
+        await FastAPICache.get_backend().set(
+            key, str(version).encode(), CATALOG_VERSION_TTL
+        )
+    except Exception:
+        logger.warning(f"Error setting cache key '{key}' in backend:", exc_info=True)
+    return version
+
+
+# Served at /metrics. Computations against requests tell how many of them
+# reached the database; with single-flight refreshes, expiry no longer
+# shows up there as a burst.
+CACHE_HITS = REGISTRY.counter(
+    "api_cache_hits_total", "Responses served fresh from the response cache"
+)
+CACHE_STALE_HITS = REGISTRY.counter(
+    "api_cache_stale_hits_total",
+    "Responses served from the cache past their soft TTL while being refreshed",
+)
+CACHE_MISSES = REGISTRY.counter(
+    "api_cache_misses_total", "Requests that found nothing cached for their key"
+)
+CACHE_SNAPSHOT_HITS = REGISTRY.counter(
+    "api_cache_snapshot_hits_total",
+    "Responses served from the memory-mapped snapshot rather than the cache",
+)
+CACHE_NOT_MODIFIED = REGISTRY.counter(
+    "api_cache_not_modified_total",
+    "Requests answered 304 Not Modified off their If-None-Match",
+)
+CACHE_COMPUTES = REGISTRY.counter(
+    "api_cache_computes_total", "Responses computed to be cached, refreshes included"
+)
+
+# How often a request polls for a response another worker is computing.
+LOCK_POLL_INTERVAL = 0.05
+
+# Deletes the lock only while it's still ours: past its TTL another worker
+# may have taken it.
+RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_REQUEST = inspect.Parameter(
+    "__cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request
+)
+_RESPONSE = inspect.Parameter(
+    "__cache_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response
+)
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _pack(fresh_until: float, payload: bytes) -> bytes:
+    # Rounded down: rounding up would keep it fresh past its soft TTL.
+    return b"%.3f\n" % (math.floor(fresh_until * 1000) / 1000) + payload
+
+
+def _unpack(value: bytes | str) -> tuple[float, bytes]:
+    # The app's Redis client decodes responses.
+    if isinstance(value, str):
+        value = value.encode()
+    fresh_until, _, payload = value.partition(b"\n")
+    return float(fresh_until), payload
+
+
+async def _read(backend: Backend, key: str) -> tuple[float, bytes] | None:
+    try:
+        value = await backend.get(key)
+    except Exception:
+        logger.warning(
+            f"Error retrieving cache key '{key}' from backend:", exc_info=True
+        )
+        return None
+    if value is None:
+        return None
+    try:
+        return _unpack(value)
+    except ValueError:
+        # Cached by @cache, without a soft TTL.
+        return None
+
+
+async def _acquire_lock(backend: Backend, key: str, ttl: float) -> str | None:
+    """
+    Token of the refresh lock on ``key``, or None while another worker holds
+    it. Backends other than Redis live in one process, which the in-process
+    single flight already covers, so they always get it.
+    """
+    token = secrets.token_hex(8)
+    redis = getattr(backend, "redis", None)
+    if redis is None:
+        return token
+    try:
+        acquired = await redis.set(f"{key}:lock", token, nx=True, px=int(ttl * 1000))
+    except Exception:
+        logger.warning(f"Error locking cache key '{key}':", exc_info=True)
+        return token
+    return token if acquired else None
+
+
+async def _release_lock(backend: Backend, key: str, token: str) -> None:
+    redis = getattr(backend, "redis", None)
+    if redis is None:
+        return
+    try:
+        await redis.eval(RELEASE_LOCK, 1, f"{key}:lock", token)
+    except Exception:
+        # It expires on its own.
+        logger.warning(f"Error unlocking cache key '{key}':", exc_info=True)
+
+
+async def _wait_for(backend: Backend, key: str, timeout: float) -> bytes | None:
+    """``key``'s payload once another worker has cached it, if within ``timeout``."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await _read(backend, key)
+        if entry is not None:
+            return entry[1]
+    return None
+
+
+def _refresh_dependencies(
+    func: Callable[..., Any], signature: inspect.Signature
+) -> dict[str, Callable[..., Any]]:
+    dependencies = {}
+    for name, parameter in signature.parameters.items():
+        depends = _depends(parameter)
+        if depends is None:
+            continue
+        dependency = depends.dependency
+        if dependency is None:
+            # Depends() with no argument depends on the declared type itself.
+            annotation = parameter.annotation
+            if get_origin(annotation) is Annotated:
+                annotation = get_args(annotation)[0]
+            dependency = annotation if callable(annotation) else None
+        if dependency is None or inspect.signature(dependency).parameters:
+            raise TypeError(
+                f"Can't cache {func.__name__}: its {name} dependency takes"
+                " arguments, so it can't be resolved outside a request."
+            )
+        dependencies[name] = dependency
+    return dependencies
+
+
+def _is_json(annotation: Any) -> bool:
+    """Whether ``annotation`` is JSON objects and arrays, e.g. ``dict[str, Any]``."""
+    if annotation in (dict, list):
+        return True
+    if get_origin(annotation) not in (dict, list):
+        return False
+    return all(
+        arg is Any or arg in (str, int, float, bool) or _is_json(arg)
+        for arg in get_args(annotation)
+    )
+
+
+async def _resolve(stack: AsyncExitStack, dependency: Callable[..., Any]) -> Any:
+    if inspect.isasyncgenfunction(dependency):
+        return await stack.enter_async_context(asynccontextmanager(dependency)())
+    if inspect.isgeneratorfunction(dependency):
+        return stack.enter_context(contextmanager(dependency)())
+    value = dependency()
+    return await value if inspect.isawaitable(value) else value
+
+
+def _etag(key: str) -> str:
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """``If-None-Match``'s weak comparison: ``W/`` prefixes don't count."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _log_failure(task: "asyncio.Task[bytes | None]") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(
+            "Refreshing a stale cached response failed", exc_info=task.exception()
+        )
+
+
+def cached(
+    *,
+    namespace: str,
+    soft_ttl: int,
+    hard_ttl: int,
+    lock_ttl: float = 5.0,
+    version: Callable[[], Awaitable[int]] | None = None,
+    max_age: int = 0,
+    stale_while_revalidate: int = 0,
+    snapshot: Snapshot | None = None,
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Coroutine[Any, Any, Any]]]:
+    """
+    Cache an async endpoint's responses and refresh them without stampedes.
+
+    A response is fresh for ``soft_ttl`` seconds and kept for ``hard_ttl``.
+    In between it's still served, as ``X-FastAPI-Cache: STALE``, while one
+    worker recomputes it in the background. When nothing is cached,
+    concurrent requests for a key share one computation: within a process
+    they await the same task; across processes whoever holds the key's
+    Redis lock computes and the others poll for the result for up to
+    ``lock_ttl`` seconds before computing it themselves. Expiry costs one
+    query per key, not one per waiting request.
+
+    With ``version``, what it returns is part of every key: once it changes
+    every response is computed afresh, so TTLs only need to bound what
+    changes it doesn't count and how long unused entries take up memory.
+    The key is also the response's strong ETag, so a request whose
+    ``If-None-Match`` names it gets a 304 before the cache, let alone the
+    database, is read.
+
+    Clients are told to reuse a response for ``max_age`` seconds, then for
+    another ``stale_while_revalidate`` while they revalidate it.
+
+    Responses found in ``snapshot``, which needs ``version``, are served
+    from it (``X-FastAPI-Cache: SNAPSHOT``) ahead of the cache; once it's
+    behind the current version it's rebuilt in the background.
+
+    Computations run apart from the request, so a client hanging up doesn't
+    cancel them for the others, and resolve the endpoint's ``Depends``
+    parameters themselves: those must take no arguments (e.g.
+    ``get_async_db``). Otherwise it behaves like fastapi-cache's ``@cache``:
+    the app's prefix, key builder and coder, ``Cache-Control: no-store`` to
+    bypass the cache and ``no-cache`` to skip reading it.
+    """
+
+    if snapshot is not None and version is None:
+        raise TypeError("A snapshot is only valid for one version: pass version too")
+
+    def decorator(
+        func: Callable[..., Awaitable[Any]],
+    ) -> Callable[..., Coroutine[Any, Any, Any]]:
+        signature = get_typed_signature(func)
+        dependencies = _refresh_dependencies(func, signature)
+        return_type = get_typed_return_annotation(func)
+        if _is_json(return_type):
+            # Decoding would only build what FastAPI encodes right back.
+            return_type = None
+        flights: dict[str, asyncio.Task[bytes | None]] = {}
+        cache_control = f"max-age={max_age}"
+        if stale_while_revalidate:
+            cache_control += f", stale-while-revalidate={stale_while_revalidate}"
+
+        async def compute(backend: Backend, key: str, query: dict[str, Any]) -> bytes:
+            CACHE_COMPUTES.inc()
+            async with AsyncExitStack() as stack:
+                resolved = {
+                    name: await _resolve(stack, dependency)
+                    for name, dependency in dependencies.items()
+                }
+                result = await func(**query, **resolved)
+            payload = FastAPICache.get_coder().encode(result)
+            try:
+                await backend.set(key, _pack(_now() + soft_ttl, payload), hard_ttl)
+            except Exception:
+                logger.warning(
+                    f"Error setting cache key '{key}' in backend:", exc_info=True
+                )
+            return payload
+
+        async def refresh(
+            key: str, query: dict[str, Any], *, wait: bool
+        ) -> bytes | None:
+            backend = FastAPICache.get_backend()
+            token = await _acquire_lock(backend, key, lock_ttl)
+            if token is None:
+                if not wait:
+                    # Another worker is refreshing it.
+                    return None
+                payload = await _wait_for(backend, key, lock_ttl)
+                if payload is not None:
+                    return payload
+            try:
+                return await compute(backend, key, query)
+            finally:
+                if token is not None:
+                    await _release_lock(backend, key, token)
+
+        def single_flight(
+            key: str, query: dict[str, Any], *, wait: bool
+        ) -> "asyncio.Task[bytes | None]":
+            task = flights.get(key)
+            if task is None:
+                task = flights[key] = asyncio.create_task(
+                    refresh(key, query, wait=wait)
+                )
+                task.add_done_callback(lambda _: flights.pop(key, None))
+            return task
+
+        @wraps(func)
+        async def inner(**kwargs: Any) -> Any:
+            request: Request | None = kwargs.pop(_REQUEST.name, None)
+            response: Response | None = kwargs.pop(_RESPONSE.name, None)
+            requested = request.headers.get("Cache-Control") if request else None
+            if (
+                not FastAPICache.get_enable()
+                or (request is not None and request.method != "GET")
+                or requested == "no-store"
+            ):
+                result = await func(**kwargs)
+                if return_type is None and not isinstance(result, Response):
+                    # Encoded as it would be cached, skipping jsonable_encoder.
+                    return Response(
+                        FastAPICache.get_coder().encode(result),
+                        media_type="application/json",
+                    )
+                return result
+
+            key_namespace = f"{FastAPICache.get_prefix()}:{namespace}"
+            if version is not None:
+                current_version = await version()
+                key_namespace = f"{key_namespace}:v{current_version}"
+                if snapshot is not None:
+                    snapshot.refresh(current_version)
+            key = FastAPICache.get_key_builder()(
+                func,
+                key_namespace,
+                request=request,
+                response=response,
+                args=(),
+                kwargs=kwargs,
+            )
+            if inspect.isawaitable(key):
+                key = await key
+            headers = {"Cache-Control": cache_control}
+            if version is not None:
+                headers["ETag"] = _etag(key)
+                if request is not None and _etag_matches(
+                    request.headers.get("If-None-Match"), headers["ETag"]
+                ):
+                    CACHE_NOT_MODIFIED.inc()
+                    return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+            query = {
+                name: value
+                for name, value in kwargs.items()
+                if name not in dependencies
+            }
+
+            entry = None
+            snapshotted = None
+            payload: bytes | None
+            if requested != "no-cache":
+                if snapshot is not None:
+                    snapshotted = snapshot.get(key)
+                if snapshotted is None:
+                    entry = await _read(FastAPICache.get_backend(), key)
+            if snapshotted is not None:
+                CACHE_SNAPSHOT_HITS.inc()
+                status = "SNAPSHOT"
+                payload = snapshotted
+            elif entry is None:
+                CACHE_MISSES.inc()
+                status = "MISS"
+                # Shielded: the computation is shared with other requests.
+                payload = await asyncio.shield(single_flight(key, query, wait=True))
+                if payload is None:
+                    # Joined a background refresh that left the key to
+                    # another worker, and the key has since been dropped.
+                    payload = await compute(FastAPICache.get_backend(), key, query)
+            else:
+                fresh_until, payload = entry
+                if fresh_until > _now():
+                    CACHE_HITS.inc()
+                    status = "HIT"
+                else:
+                    CACHE_STALE_HITS.inc()
+                    status = "STALE"
+                    single_flight(key, query, wait=False).add_done_callback(
+                        _log_failure
+                    )
+
+            headers[FastAPICache.get_cache_status_header()] = status
+            if return_type is None:
+                # Nothing to validate against: the cached JSON goes out as
+                # is rather than being decoded here and encoded by FastAPI.
+                return Response(payload, media_type="application/json", headers=headers)
+            if response is not None:
+                response.headers.update(headers)
+            return FastAPICache.get_coder().decode_as_type(payload, type_=return_type)
+
+        inner.__signature__ = signature.replace(  # type: ignore[attr-defined]
+            parameters=[*signature.parameters.values(), _REQUEST, _RESPONSE]
+        )
+        return inner
 
-async def setup_cache():
-    redis = aioredis.from_url("redis://redis:6379", encoding="utf8")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache") 
\ No newline at end of file
+    return decorator
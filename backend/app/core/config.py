@@ -91,6 +91,21 @@ class Settings(BaseSettings):
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # Optional set-menu harvester running inside the API workers
+    HARVEST_SCHEDULER_ENABLED: bool = False
+    HARVEST_URL: str = "https://staging.yhangry.com/booking/test/set-menus"
+    HARVEST_MODE: Literal["upsert", "copy", "swap"] = "upsert"
+    HARVEST_INTERVAL_SECONDS: int = 60 * 60
+    HARVEST_POLL_SECONDS: int = 60
+
+    # Each worker's in-memory copy of the Redis response cache
+    RESPONSE_CACHE_LOCAL_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_LOCAL_MAX_BYTES: int = 64 * 1024 * 1024
+    # File the first pages of /set-menus are rendered into after each
+    # harvest, shared by the workers on a host. Unset, there's no snapshot.
+    SET_MENUS_SNAPSHOT_PATH: str | None = None
+    SET_MENUS_SNAPSHOT_PAGES: int = 3
+
     EMAIL_TEST_USER: EmailStr = "test@example.com"
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
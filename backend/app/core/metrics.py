@@ -0,0 +1,107 @@
+import bisect
+import math
+import threading
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> Iterator[tuple[str, float]]:
+        yield self.name, self.value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes them."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # The last slot counts observations above every bucket (+Inf).
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the ``q`` quantile by interpolating within its bucket, the
+        way PromQL's ``histogram_quantile`` does.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, self.counts, strict=False):
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        # Beyond the last bucket there's nothing to interpolate against.
+        return self.buckets[-1]
+
+    def samples(self) -> Iterator[tuple[str, float]]:
+        cumulative = 0
+        for upper, count in zip(self.buckets, self.counts, strict=False):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{upper:g}"}}', cumulative
+        yield f'{self.name}_bucket{{le="+Inf"}}', self.count
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = self.metrics[name] = Counter(name, documentation)
+        return metric
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float]
+    ) -> Histogram:
+        metric = self.metrics[name] = Histogram(name, documentation, buckets)
+        return metric
+
+    def __getitem__(self, name: str) -> Any:
+        return self.metrics[name]
+
+    def render(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            kind = "counter" if isinstance(metric, Counter) else "histogram"
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+# Process-wide totals, scraped through /metrics: the API's counters and those
+# of the harvests it runs register here.
+REGISTRY = Registry()
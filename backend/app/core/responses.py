@@ -0,0 +1,52 @@
+from collections.abc import Sequence
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache.coder import Coder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def dumps(value: Any) -> bytes:
+    """
+    ``value`` as JSON, encoded by orjson. Only what it can't encode itself
+    (``Decimal``, pydantic models, ...) goes through ``jsonable_encoder``.
+    """
+    return orjson.dumps(value, default=jsonable_encoder)
+
+
+class ORJSONCoder(Coder):
+    """Cached responses encoded with ``dumps``, rather than the stdlib ``json``."""
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, Response):
+            return bytes(value.body)
+        return dumps(value)
+
+    @classmethod
+    def decode(cls, value: bytes | str) -> Any:
+        return orjson.loads(value)
+
+
+def page_response(public: type[BaseModel], rows: Sequence[Any], count: int) -> Response:
+    """
+    A ``{"data": [...], "count": ...}`` page of ``rows``, read straight off
+    the ORM, with the fields ``public`` declares, for a route whose
+    ``response_model`` is the page of ``public`` to return as is.
+
+    Building that page model would validate every row from its attributes,
+    and FastAPI would then validate it all over again against
+    ``response_model`` and run it through ``jsonable_encoder``: for 100 rows,
+    most of the request's CPU. The rows come from the database, so they're
+    taken as they are; only the fields ``public`` declares are read, so
+    whatever it leaves out (e.g. ``hashed_password``) never is.
+    """
+    fields = [
+        (name, field.alias or name) for name, field in public.model_fields.items()
+    ]
+    data = [{key: getattr(row, name) for name, key in fields} for row in rows]
+    return Response(
+        dumps({"data": data, "count": count}), media_type="application/json"
+    )
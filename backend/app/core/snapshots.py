@@ -0,0 +1,178 @@
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Magic, catalog version and index length, then the index (JSON mapping each
+# cache key to the offset and length of its response after the index), then
+# the responses back to back.
+HEADER = struct.Struct("<8sQI")
+MAGIC = b"SNAPSHT1"
+
+Render = Callable[[], Awaitable[tuple[int, dict[str, bytes]]]]
+
+
+def write_snapshot(path: str, version: int, responses: dict[str, bytes]) -> None:
+    """
+    Write ``responses`` as the snapshot of ``version`` at ``path``. The file
+    is replaced in one rename, so readers map either the old one or the new
+    one, complete; those still mapping the old one keep it until they reload.
+    """
+    index = {}
+    offset = 0
+    for key, payload in responses.items():
+        index[key] = (offset, len(payload))
+        offset += len(payload)
+    encoded_index = json.dumps(index, separators=(",", ":")).encode()
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as file:
+        file.write(HEADER.pack(MAGIC, version, len(encoded_index)))
+        file.write(encoded_index)
+        for payload in responses.values():
+            file.write(payload)
+    os.replace(partial, path)
+
+
+def read_index(mapped: mmap.mmap) -> tuple[int, dict[str, tuple[int, int]]]:
+    magic, version, index_length = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError("Not a response snapshot")
+    start = HEADER.size + index_length
+    index = json.loads(mapped[HEADER.size : start])
+    return version, {
+        key: (start + offset, length) for key, (offset, length) in index.items()
+    }
+
+
+class Snapshot:
+    """
+    Responses rendered ahead of time into a file that every worker on the
+    host maps read-only, so they share one copy in the page cache and serve
+    it without touching Redis, the database or a JSON encoder.
+
+    ``render`` returns the catalog version and the serialized responses by
+    cache key. ``build`` runs it and writes the file; one worker per host
+    does, the others skip while it holds the file's lock, and all of them
+    pick the new file up within ``check_interval`` seconds. Without a
+    ``path`` the snapshot is disabled and every lookup misses.
+    """
+
+    def __init__(
+        self,
+        path: str | None,
+        render: Render,
+        *,
+        check_interval: float = 1.0,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self.path = path
+        self.render = render
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.version: int | None = None
+        self._map: mmap.mmap | None = None
+        self._index: dict[str, tuple[int, int]] = {}
+        self._identity: tuple[int, int] | None = None
+        self._checked_at = float("-inf")
+        self._next_build = float("-inf")
+        self._build: asyncio.Task[bool] | None = None
+
+    def get(self, key: str) -> bytes | None:
+        if not self.path:
+            return None
+        self._reload()
+        span = self._index.get(key)
+        if span is None or self._map is None:
+            return None
+        offset, length = span
+        return self._map[offset : offset + length]
+
+    def refresh(self, version: int) -> None:
+        """Build the snapshot in the background if it's behind ``version``."""
+        if not self.path or self._build is not None:
+            return
+        if self.version is not None and self.version >= version:
+            return
+        now = time.monotonic()
+        if now < self._next_build:
+            return
+        self._next_build = now + self.retry_interval
+        self._build = asyncio.create_task(self.build(version))
+        self._build.add_done_callback(self._built)
+
+    async def build(self, version: int | None = None) -> bool:
+        """
+        Render and write the snapshot, unless it's already at ``version`` or
+        another worker on this host is writing it. Reports whether it wrote.
+        """
+        if not self.path:
+            return False
+        with open(f"{self.path}.lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            self._reload(force=True)
+            if (
+                version is not None
+                and self.version is not None
+                and self.version >= version
+            ):
+                return False
+            started = time.perf_counter()
+            built, responses = await self.render()
+            await asyncio.to_thread(write_snapshot, self.path, built, responses)
+        self._reload(force=True)
+        logger.info(
+            f"Wrote {len(responses)} responses of catalog version {built} to"
+            f" {self.path} in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    def _built(self, task: "asyncio.Task[bool]") -> None:
+        self._build = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                f"Building the snapshot at {self.path} failed",
+                exc_info=task.exception(),
+            )
+
+    def _reload(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if not self.path:
+            return
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity == self._identity:
+            return
+        # Not tried again until it's replaced.
+        self._identity = identity
+        try:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            logger.warning(f"Can't map the snapshot at {self.path}", exc_info=True)
+            return
+        try:
+            version, index = read_index(mapped)
+        except (ValueError, struct.error):
+            logger.warning(f"Can't read the snapshot at {self.path}", exc_info=True)
+            mapped.close()
+            return
+        # Lookups copy what they read out, so nothing refers to the old map.
+        if self._map is not None:
+            self._map.close()
+        self._map, self._index, self.version = mapped, index, version
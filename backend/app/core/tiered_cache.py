@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any
+
+from fastapi_cache.types import Backend
+
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Redis pub/sub channel the workers announce cache writes and clears on.
+INVALIDATION_CHANNEL = "fastapi-cache:invalidate"
+# Seconds before resubscribing after losing the channel, doubling up to
+# the maximum while Redis stays unreachable.
+RESUBSCRIBE_DELAY = 1.0
+MAX_RESUBSCRIBE_DELAY = 30.0
+
+LOCAL_HITS = REGISTRY.counter(
+    "api_cache_local_hits_total",
+    "Cache reads served from the worker's own memory rather than Redis",
+)
+
+
+class LocalCache:
+    """LRU of values that expire on their own TTL, bounded by their total size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, bytes | str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_with_ttl(self, key: str) -> tuple[float, bytes | str | None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0, None
+        expires_at, value = entry
+        ttl = expires_at - time.monotonic()
+        if ttl <= 0:
+            self.pop(key)
+            return 0, None
+        self._entries.move_to_end(key)
+        return ttl, value
+
+    def set(self, key: str, value: bytes | str, ttl: float) -> None:
+        self.pop(key)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            evicted, (_, old) = self._entries.popitem(last=False)
+            self.size -= len(evicted) + len(old)
+
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[1])
+
+    def clear(self, prefix: str = "") -> int:
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self.pop(key)
+        return len(keys)
+
+
+class TieredBackend(Backend):
+    """
+    A per-worker ``LocalCache`` in front of a shared backend (Redis).
+
+    Reads are served from local memory while the entry is there, for at most
+    ``ttl`` seconds and never past the shared backend's own TTL. Every write
+    and clear goes to the shared backend and is announced on ``channel``, so
+    the other workers and replicas drop their copies. Until this worker is
+    subscribed to it (see ``start``), and whenever the subscription drops, it
+    would miss those announcements, so reads go straight to ``backend``.
+
+    ``redis`` is exposed for ``cached()``'s refresh locks.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        redis: Any,
+        *,
+        ttl: float,
+        max_bytes: int,
+        channel: str = INVALIDATION_CHANNEL,
+    ) -> None:
+        self.backend = backend
+        self.redis = redis
+        self.ttl = ttl
+        self.channel = channel
+        self.local = LocalCache(max_bytes)
+        self.subscribed = False
+        # Tells this worker's announcements apart when they come back.
+        self._origin = secrets.token_hex(8)
+        # Bumped by every invalidation, so a read racing one doesn't store
+        # the value it just invalidated.
+        self._generation = 0
+        self._listener: asyncio.Task[None] | None = None
+
+    async def get_with_ttl(self, key: str) -> tuple[int, Any]:
+        if self.subscribed:
+            ttl, value = self.local.get_with_ttl(key)
+            if value is not None:
+                LOCAL_HITS.inc()
+                return int(ttl), value
+        generation = self._generation
+        ttl, value = await self.backend.get_with_ttl(key)
+        if value is not None and self.subscribed and generation == self._generation:
+            # Redis answers -1 for keys without an expiry.
+            self.local.set(key, value, min(self.ttl, ttl) if ttl > 0 else self.ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> Any:
+        _, value = await self.get_with_ttl(key)
+        return value
+
+    async def set(self, key: str, value: bytes, expire: int | None = None) -> None:
+        self._invalidate("key", key)
+        await self.backend.set(key, value, expire)
+        if self.subscribed:
+            self.local.set(key, value, min(self.ttl, expire) if expire else self.ttl)
+        await self._announce("key", key)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        if namespace:
+            self._invalidate("namespace", namespace)
+        elif key:
+            self._invalidate("key", key)
+        cleared = await self.backend.clear(namespace, key)
+        if namespace:
+            await self._announce("namespace", namespace)
+        elif key:
+            await self._announce("key", key)
+        return cleared
+
+    def start(self) -> None:
+        """Start following the other workers' invalidations."""
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._unsubscribed()
+
+    def _invalidate(self, kind: str, name: str) -> None:
+        self._generation += 1
+        if kind == "key":
+            self.local.pop(name)
+        else:
+            self.local.clear(f"{name}:")
+
+    async def _announce(self, kind: str, name: str) -> None:
+        await self.redis.publish(self.channel, f"{self._origin} {kind} {name}")
+
+    def _receive(self, message: bytes | str) -> None:
+        if isinstance(message, bytes):
+            message = message.decode()
+        origin, kind, name = message.split(" ", 2)
+        if origin != self._origin:
+            self._invalidate(kind, name)
+
+    def _unsubscribed(self) -> None:
+        # Whatever changed meanwhile went unannounced.
+        self.subscribed = False
+        self._generation += 1
+        self.local.clear()
+
+    async def _listen(self) -> None:
+        delay = RESUBSCRIBE_DELAY
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.subscribed = True
+                    delay = RESUBSCRIBE_DELAY
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._receive(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(
+                    "Lost the cache invalidation channel, reading through to Redis",
+                    exc_info=True,
+                )
+            finally:
+                self._unsubscribed()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESUBSCRIBE_DELAY)
@@ -1,9 +1,15 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
 from sqlmodel import Session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from app.core.metrics import REGISTRY
+
 # Reuse the same database configuration from harvest_setmenus.py
 load_dotenv()
 
@@ -23,4 +29,32 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+# Async counterpart for endpoints that must not block the event loop while
+# a query is in flight (psycopg 3 in async mode).
+ASYNC_DATABASE_URL = f"postgresql+psycopg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=10, max_overflow=10)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Served at /metrics. Against the requests served, it tells how many of
+# them reached the database rather than the response cache.
+POOL_CHECKOUTS = REGISTRY.counter(
+    "api_db_pool_checkouts_total",
+    "Connections checked out of the API's async database pool",
+)
+
+
+@event.listens_for(async_engine.sync_engine, "checkout")
+def count_checkout(*_args: Any) -> None:
+    POOL_CHECKOUTS.inc()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    # Sessions are lazy: a connection is only checked out of the pool by the
+    # first query, so a response served from the cache never takes one even
+    # though FastAPI resolves this dependency before the cache is consulted.
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,23 @@
+from sqlalchemy import Table, select, update
+from sqlalchemy.orm import Session
+
+from app.models import CatalogVersion
+
+catalog_version_table: Table = CatalogVersion.__table__  # type: ignore[attr-defined]
+
+
+def catalog_version(session: Session) -> int:
+    version: int = session.execute(select(catalog_version_table.c.version)).scalar_one()
+    return version
+
+
+def bump_catalog_version(session: Session) -> None:
+    """
+    Count a change to the catalog the triggers don't see, e.g. a swap, whose
+    tables are loaded before their triggers exist.
+    """
+    session.execute(
+        update(catalog_version_table).values(
+            version=catalog_version_table.c.version + 1
+        )
+    )
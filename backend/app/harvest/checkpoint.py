@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.models import HarvestCheckpoint
+
+
+def load_checkpoint(session: Session, source_url: str) -> HarvestCheckpoint | None:
+    return session.get(HarvestCheckpoint, source_url)
+
+
+def conditional_headers(checkpoint: HarvestCheckpoint | None) -> dict[str, str]:
+    """Validators from the previous run for a conditional GET of the first page."""
+    headers: dict[str, str] = {}
+    if checkpoint is None:
+        return headers
+    if checkpoint.etag:
+        headers["If-None-Match"] = checkpoint.etag
+    if checkpoint.last_modified:
+        headers["If-Modified-Since"] = checkpoint.last_modified
+    return headers
+
+
+def save_checkpoint(
+    session: Session,
+    source_url: str,
+    *,
+    response: httpx.Response | None,
+    last_page_url: str | None,
+    max_created_at: datetime | None,
+) -> HarvestCheckpoint:
+    checkpoint = load_checkpoint(session, source_url) or HarvestCheckpoint(
+        source_url=source_url
+    )
+    # A resumed run never saw the first page, so its validators are unknown.
+    headers = response.headers if response is not None else {}
+    checkpoint.etag = headers.get("ETag")
+    checkpoint.last_modified = headers.get("Last-Modified")
+    checkpoint.last_page_url = last_page_url
+    if max_created_at is not None and max_created_at.tzinfo is not None:
+        # Stored as naive UTC, like the rest of the timestamps.
+        max_created_at = max_created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if max_created_at is not None and (
+        checkpoint.max_created_at is None or max_created_at > checkpoint.max_created_at
+    ):
+        checkpoint.max_created_at = max_created_at
+    checkpoint.updated_at = datetime.utcnow()
+    session.add(checkpoint)
+    return checkpoint
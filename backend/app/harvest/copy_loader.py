@@ -0,0 +1,160 @@
+import time
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from sqlalchemy import Column, MetaData, Table, delete, exists, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.harvest.ingest import cuisine_table, link_table, set_menu_table
+from app.harvest.normalize import (
+    CUISINE_COLUMNS,
+    SET_MENU_COLUMNS,
+    BatchNormalizer,
+    NormalizedBatch,
+)
+
+# Kept out of SQLModel.metadata so Alembic never sees the staging tables.
+staging_metadata = MetaData()
+
+
+def staging_table(name: str, source: Table) -> Table:
+    return Table(
+        name,
+        staging_metadata,
+        *(Column(column.name, column.type) for column in source.columns),
+        prefixes=["UNLOGGED"],
+    )
+
+
+staging_set_menu = staging_table("harvest_staging_set_menu", set_menu_table)
+staging_cuisine = staging_table("harvest_staging_cuisine", cuisine_table)
+staging_link = staging_table("harvest_staging_set_menu_cuisine_link", link_table)
+
+
+def truncate_staging(session: Session) -> None:
+    names = ", ".join(table.name for table in staging_metadata.sorted_tables)
+    session.execute(text(f"TRUNCATE {names}"))
+
+
+def distinct_rows(target: Table, staging: Table) -> Any:
+    """``SELECT DISTINCT ON (pk) ... FROM staging ORDER BY pk`` in ``target``'s columns."""
+    key = [column.name for column in target.primary_key.columns]
+    return (
+        select(*(staging.c[column.name] for column in target.columns))
+        .distinct(*(staging.c[name] for name in key))
+        .order_by(*(staging.c[name] for name in key))
+    )
+
+
+def merge_statement(target: Table, staging: Table) -> Any:
+    """``INSERT INTO target SELECT DISTINCT ON (pk) ... FROM staging ON CONFLICT DO UPDATE``."""
+    key = [column.name for column in target.primary_key.columns]
+    columns = [column.name for column in target.columns]
+    stmt = insert(target).from_select(columns, distinct_rows(target, staging))
+    updates = {name: stmt.excluded[name] for name in columns if name not in key}
+    if not updates:
+        return stmt.on_conflict_do_nothing()
+    return stmt.on_conflict_do_update(index_elements=key, set_=updates)
+
+
+class CopyLoader:
+    """
+    Full re-sync loader that streams rows into unlogged staging tables with
+    ``COPY FROM STDIN`` and merges them into the live tables at the end.
+
+    ``write_page`` only appends to the staging tables, ``finish`` runs one
+    set-based ``INSERT ... SELECT ... ON CONFLICT`` per table (plus the
+    removal of links that disappeared upstream) inside the caller's
+    transaction.
+
+    With ``keep_staging`` the staging tables are left as they are, so a
+    resumed run merges the rows copied before it was interrupted too.
+    """
+
+    def __init__(self, *, keep_staging: bool = False) -> None:
+        self.keep_staging = keep_staging
+        self.cuisine_ids: set[int] = set()
+        self.rows = 0
+        self.copy_seconds = 0.0
+        self.merge_seconds = 0.0
+        self.normalizer = BatchNormalizer()
+        self._prepared = False
+
+    def _prepare(self, session: Session) -> None:
+        # Recreated every run so they always match the current live schema.
+        connection = session.connection()
+        if not self.keep_staging:
+            staging_metadata.drop_all(connection, checkfirst=True)
+        staging_metadata.create_all(connection, checkfirst=True)
+        self._prepared = True
+
+    def _copy(
+        self,
+        session: Session,
+        table: Table,
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+    ) -> None:
+        raw = session.connection().connection.driver_connection
+        with raw.cursor() as cursor:  # type: ignore[union-attr]
+            with cursor.copy(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+            ) as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    self.rows += 1
+
+    def write_page(self, session: Session, items: Sequence[dict[str, Any]]) -> int:
+        self.write_batch(session, self.normalizer.normalize(items))
+        return len(items)
+
+    def write_batch(self, session: Session, batch: NormalizedBatch) -> None:
+        """Copy a page normalized ahead of time, e.g. by another pipeline stage."""
+        if not self._prepared:
+            self._prepare(session)
+        started = time.perf_counter()
+        cuisines = {
+            cuisine_id: cuisine
+            for cuisine_id, cuisine in batch.cuisines.items()
+            if cuisine_id not in self.cuisine_ids
+        }
+        self._copy(session, staging_set_menu, SET_MENU_COLUMNS, batch.menus)
+        self._copy(session, staging_cuisine, CUISINE_COLUMNS, cuisines.values())
+        self._copy(session, staging_link, ("set_menu_id", "cuisine_id"), batch.links)
+        self.cuisine_ids.update(cuisines)
+        self.copy_seconds += time.perf_counter() - started
+
+    def finish(self, session: Session) -> None:
+        if not self._prepared:
+            if not self.keep_staging:
+                return
+            self._prepare(session)
+        started = time.perf_counter()
+        for table in staging_metadata.sorted_tables:
+            session.execute(text(f"ANALYZE {table.name}"))
+        self._apply(session)
+        truncate_staging(session)
+        self.merge_seconds += time.perf_counter() - started
+
+    def _apply(self, session: Session) -> None:
+        """Bring the live tables in line with the staging tables."""
+        session.execute(merge_statement(cuisine_table, staging_cuisine))
+        session.execute(merge_statement(set_menu_table, staging_set_menu))
+        session.execute(
+            delete(link_table)
+            .where(
+                link_table.c.set_menu_id.in_(select(staging_set_menu.c.id)),
+                ~exists().where(
+                    staging_link.c.set_menu_id == link_table.c.set_menu_id,
+                    staging_link.c.cuisine_id == link_table.c.cuisine_id,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(merge_statement(link_table, staging_link))
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.copy_seconds + self.merge_seconds
+        return self.rows / elapsed if elapsed else 0.0
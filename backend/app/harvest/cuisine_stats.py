@@ -0,0 +1,44 @@
+from typing import Any
+
+from sqlalchemy import Table, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.harvest.ingest import link_table, set_menu_table
+from app.models import CuisineStats
+
+cuisine_stats_table: Table = CuisineStats.__table__  # type: ignore[attr-defined]
+
+
+def cuisine_stats_select(set_menu: Any = set_menu_table, link: Any = link_table) -> Any:
+    """``cuisine_stats`` rows computed from scratch out of ``set_menu`` and ``link``."""
+    return (
+        select(
+            link.c.cuisine_id,
+            func.count().label("set_menu_count"),
+            func.sum(set_menu.c.number_of_orders).label("total_orders"),
+        )
+        .join(set_menu, set_menu.c.id == link.c.set_menu_id)
+        .where(set_menu.c.status == 1)
+        .group_by(link.c.cuisine_id)
+    )
+
+
+def refresh_cuisine_stats(
+    session: Session, *, set_menu: Any = set_menu_table, link: Any = link_table
+) -> None:
+    """
+    Recompute ``cuisine_stats`` in full.
+
+    The triggers on the catalog tables keep it current statement by
+    statement; this is for rows that reach the catalog without firing them,
+    e.g. the shadow tables of a swap, which are passed as ``set_menu`` and
+    ``link``. Readers keep seeing the previous stats until the caller
+    commits.
+    """
+    session.execute(delete(cuisine_stats_table))
+    session.execute(
+        insert(cuisine_stats_table).from_select(
+            ["cuisine_id", "set_menu_count", "total_orders"],
+            cuisine_stats_select(set_menu, link),
+        )
+    )
@@ -0,0 +1,496 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, TypeVar
+
+import httpx
+
+from app.harvest.metrics import RunMetrics
+from app.harvest.stream import PageParser
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+_PAGE_DONE = object()
+
+
+class AdaptivePacer:
+    """
+    Token bucket whose refill rate follows upstream health.
+
+    The rate grows additively while responses come back under
+    ``target_latency`` and shrinks multiplicatively on slow responses,
+    errors and 429s. A ``Retry-After`` from upstream blocks every caller
+    until it has elapsed.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = 2.0,
+        burst: int = 4,
+        min_rate: float = 0.2,
+        max_rate: float = 20.0,
+        target_latency: float = 1.0,
+        increase_step: float = 0.5,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.throttle_wait = 0.0
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) / self.rate
+                self.throttle_wait += delay
+                await asyncio.sleep(delay)
+
+    def on_success(self, latency: float) -> None:
+        self._refill(time.monotonic())
+        if latency <= self.target_latency:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+        else:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def on_error(self) -> None:
+        self._refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def on_throttle(self, retry_after: float | None) -> None:
+        self.on_error()
+        if retry_after:
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + retry_after
+            )
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a ``Retry-After`` header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass
+class PageBatch:
+    """
+    Items of one page. ``envelope`` (the page's ``links``/``meta``) is only
+    set on the last batch of the page, which marks the page as complete.
+    """
+
+    items: list[dict[str, Any]]
+    envelope: dict[str, Any] | None = None
+
+
+@dataclass
+class CrawlPosition:
+    """Where an interrupted crawl left off."""
+
+    # Crawls following links.next resume from the next uncommitted page.
+    next_url: str | None = None
+    # Crawls over numbered pages refetch every page not committed yet.
+    last_page: int | None = None
+    committed_pages: set[int] = field(default_factory=set)
+
+
+@dataclass
+class FetchStats:
+    pages: int = 0
+    bytes: int = 0
+    retries: int = 0
+    throttled: int = 0
+
+
+class PageFetcher:
+    """
+    Fetches set-menu pages over one pooled keep-alive ``httpx.AsyncClient``.
+
+    When the first page's ``meta`` exposes ``last_page`` the remaining pages
+    are fetched with up to ``concurrency`` requests in flight, otherwise the
+    fetcher follows ``links.next`` one page at a time. Every request goes
+    through the pacer and is retried with jittered exponential backoff.
+
+    Request latency, page sizes, retries and time spent waiting on the
+    pacer are recorded in ``metrics``.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 4,
+        pacer: AdaptivePacer | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        timeout: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+        metrics: RunMetrics | None = None,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.pacer = pacer or AdaptivePacer(burst=self.concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = FetchStats()
+        self.metrics = metrics or RunMetrics(parent=None)
+        self.first_response: httpx.Response | None = None
+        self.last_page_url: str | None = None
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            headers={"Accept": "application/json"},
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "PageFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps concurrent retries from lining up on upstream.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    async def get_page(self, url: str) -> dict[str, Any]:
+        response = await self.get_response(url)
+        page: dict[str, Any] = response.json()
+        return page
+
+    async def get_response(
+        self, url: str, headers: dict[str, str] | None = None, *, stream: bool = False
+    ) -> httpx.Response:
+        """
+        GET ``url`` with pacing and retries.
+
+        Error statuses that aren't retried (or ran out of retries) raise,
+        anything else, including ``304 Not Modified``, is returned. With
+        ``stream`` the body is left unread and the caller must close the
+        response.
+        """
+        attempt = 0
+        while True:
+            waiting = time.monotonic()
+            await self.pacer.acquire()
+            started = time.monotonic()
+            self.metrics.inc("harvest_throttle_wait_seconds_total", started - waiting)
+            request = self._client.build_request("GET", url, headers=headers)
+            throttled = False
+            try:
+                response = await self._client.send(request, stream=stream)
+            except httpx.TransportError as e:
+                self.metrics.request(time.monotonic() - started)
+                if attempt >= self.max_retries:
+                    raise
+                self.pacer.on_error()
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"Fetching {url} failed ({e!r}), retrying in {delay:.2f}s"
+                )
+            else:
+                latency = time.monotonic() - started
+                self.metrics.request(latency)
+                retryable = response.status_code in RETRY_STATUS_CODES
+                if not retryable and not response.is_error:
+                    self.pacer.on_success(latency)
+                    self.stats.pages += 1
+                    if not stream:
+                        self.stats.bytes += len(response.content)
+                        self.metrics.page(len(response.content))
+                    return response
+                await response.aclose()
+                if not retryable or attempt >= self.max_retries:
+                    response.raise_for_status()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is None:
+                    delay = self._backoff(attempt)
+                if response.status_code == 429:
+                    # The pacer holds back every request until Retry-After.
+                    throttled = True
+                    self.stats.throttled += 1
+                    self.pacer.on_throttle(retry_after)
+                    if retry_after is not None:
+                        delay = 0.0
+                else:
+                    self.pacer.on_error()
+                    if retry_after is not None:
+                        delay = retry_after
+                logger.warning(
+                    f"Fetching {url} returned {response.status_code}, retrying"
+                )
+            self.stats.retries += 1
+            self.metrics.retry(throttled=throttled)
+            attempt += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def stream_page(
+        self,
+        url: str,
+        batch_size: int,
+        emit: Callable[[PageBatch], Awaitable[None]],
+        headers: dict[str, str] | None = None,
+    ) -> tuple[httpx.Response, dict[str, Any] | None]:
+        """
+        Stream the page at ``url``, passing its ``data[]`` items to ``emit``
+        in batches of at most ``batch_size`` while the body is still arriving.
+
+        Returns the response and the page's other top-level keys, or
+        ``None`` for those on ``304 Not Modified``.
+        """
+        response = await self.get_response(url, headers, stream=True)
+        size = 0
+        try:
+            if response.status_code == 304:
+                return response, None
+            parser = PageParser()
+            items: list[dict[str, Any]] = []
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                self.stats.bytes += len(chunk)
+                items.extend(parser.feed(chunk))
+                # The tail is held back so the page's last batch, which
+                # carries the envelope, is never empty-handed mid-page.
+                while len(items) > batch_size:
+                    await emit(PageBatch(items[:batch_size]))
+                    items = items[batch_size:]
+            items.extend(parser.close())
+            while len(items) > batch_size:
+                await emit(PageBatch(items[:batch_size]))
+                items = items[batch_size:]
+            await emit(PageBatch(items, envelope=parser.envelope))
+            return response, parser.envelope
+        finally:
+            self.metrics.page(size)
+            await response.aclose()
+
+    async def iter_pages(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        resume: CrawlPosition | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Yield every page starting at ``url``.
+
+        ``headers`` are sent with the first request only, so a conditional
+        request that comes back ``304 Not Modified`` yields nothing; check
+        ``first_response`` afterwards. Pages after the first are yielded in
+        completion order when fetched concurrently. With ``resume`` only the
+        pages an interrupted crawl didn't commit are fetched.
+        """
+
+        async def fetch(
+            page_url: str, emit: Callable[[dict[str, Any]], Awaitable[None]]
+        ) -> dict[str, Any] | None:
+            first = page_url == url
+            response = await self.get_response(page_url, headers if first else None)
+            if first:
+                self.first_response = response
+            if response.status_code == 304:
+                return None
+            page: dict[str, Any] = response.json()
+            await emit(page)
+            return page
+
+        async for page in self._crawl(url, fetch, resume):
+            yield page
+
+    async def iter_item_batches(
+        self,
+        url: str,
+        batch_size: int,
+        headers: dict[str, str] | None = None,
+        resume: CrawlPosition | None = None,
+    ) -> AsyncIterator[PageBatch]:
+        """
+        Like ``iter_pages`` but yields batches of at most ``batch_size`` items
+        parsed incrementally from each response body, so no page is ever
+        held in memory as a whole.
+        """
+
+        async def fetch(
+            page_url: str, emit: Callable[[PageBatch], Awaitable[None]]
+        ) -> dict[str, Any] | None:
+            first = page_url == url
+            response, envelope = await self.stream_page(
+                page_url, batch_size, emit, headers if first else None
+            )
+            if first:
+                self.first_response = response
+            return envelope
+
+        async for batch in self._crawl(url, fetch, resume):
+            yield batch
+
+    async def _crawl(
+        self,
+        url: str,
+        fetch: Callable[[str, Callable[[T], Awaitable[None]]], Awaitable[Any]],
+        resume: CrawlPosition | None = None,
+    ) -> AsyncIterator[T]:
+        """
+        Run ``fetch(page_url, emit)`` for every page starting at ``url`` and
+        yield whatever it emits.
+
+        ``fetch`` returns the page's envelope (``links``/``meta``), which
+        decides whether the remaining pages are fetched concurrently or by
+        following ``links.next``. ``last_page_url`` holds the URL of the
+        final page once exhausted.
+        """
+        envelopes: dict[str, dict[str, Any] | None] = {}
+
+        async def fetch_envelope(
+            page_url: str, emit: Callable[[T], Awaitable[None]]
+        ) -> None:
+            envelopes[page_url] = await fetch(page_url, emit)
+
+        async def fetch_only(
+            page_url: str, emit: Callable[[T], Awaitable[None]]
+        ) -> None:
+            await fetch(page_url, emit)
+
+        if resume is not None and resume.last_page is not None:
+            uncommitted = [
+                numbered_page_url(url, page)
+                for page in range(1, resume.last_page + 1)
+                if page not in resume.committed_pages
+            ]
+            self.last_page_url = numbered_page_url(url, resume.last_page)
+            async for value in self._fan_out(uncommitted, fetch_only):
+                yield value
+            return
+        if resume is not None:
+            if resume.next_url is None:
+                return
+            url = resume.next_url
+
+        async for value in self._fan_out([url], fetch_envelope):
+            yield value
+        first = envelopes.pop(url)
+        if first is None:
+            return
+        self.last_page_url = url
+
+        page_urls = remaining_page_urls(url, first)
+        if page_urls is None:
+            next_url = next_link(first)
+            while next_url:
+                async for value in self._fan_out([next_url], fetch_envelope):
+                    yield value
+                self.last_page_url = next_url
+                next_url = next_link(envelopes.pop(next_url) or {})
+            return
+
+        if page_urls:
+            self.last_page_url = page_urls[-1]
+        async for value in self._fan_out(page_urls, fetch_only):
+            yield value
+
+    async def _fan_out(
+        self,
+        page_urls: list[str],
+        fetch: Callable[[str, Callable[[T], Awaitable[None]]], Awaitable[None]],
+    ) -> AsyncIterator[T]:
+        """Run ``fetch`` for ``page_urls`` with up to ``concurrency`` workers."""
+        pending = iter(page_urls)
+        # Bounded so fetching can't run arbitrarily far ahead of the consumer.
+        results: asyncio.Queue[Any] = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker() -> None:
+            for page_url in pending:
+                try:
+                    await fetch(page_url, results.put)
+                except Exception as e:
+                    await results.put(e)
+                    return
+                await results.put(_PAGE_DONE)
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.concurrency, len(page_urls)))
+        ]
+        try:
+            remaining = len(page_urls)
+            while remaining:
+                result = await results.get()
+                if result is _PAGE_DONE:
+                    remaining -= 1
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+def numbered_page_url(url: str, page: int) -> str:
+    return str(httpx.URL(url).copy_merge_params({"page": page}))
+
+
+def next_link(page: dict[str, Any]) -> str | None:
+    next_url: str | None = (page.get("links") or {}).get("next")
+    return next_url
+
+
+def remaining_page_urls(url: str, first: dict[str, Any]) -> list[str] | None:
+    """
+    Build the URLs of every page after ``first`` from its pagination ``meta``.
+
+    Returns ``None`` when ``meta`` doesn't expose the page count, in which
+    case the caller has to follow ``links.next``.
+    """
+    meta = first.get("meta") or {}
+    try:
+        current_page = int(meta["current_page"])
+        last_page = int(meta["last_page"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return [
+        numbered_page_url(url, page) for page in range(current_page + 1, last_page + 1)
+    ]
@@ -0,0 +1,156 @@
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, TypeVar
+
+from sqlalchemy import Table, delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.harvest.normalize import (
+    CUISINE_COLUMNS,
+    MENU_HASH,
+    MENU_ID,
+    SET_MENU_COLUMNS,
+    BatchNormalizer,
+    NormalizedBatch,
+)
+from app.models import Cuisine, SetMenu, SetMenuCuisineLink
+
+set_menu_table: Table = SetMenu.__table__  # type: ignore[attr-defined]
+cuisine_table: Table = Cuisine.__table__  # type: ignore[attr-defined]
+link_table: Table = SetMenuCuisineLink.__table__  # type: ignore[attr-defined]
+
+T = TypeVar("T")
+
+
+def chunked(rows: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def upsert_statement(table: Table, rows: Sequence[dict[str, Any]]) -> Any:
+    """Multi-row ``INSERT ... ON CONFLICT (pk) DO UPDATE`` of every non-key column."""
+    stmt = insert(table).values(list(rows))
+    key = [column.name for column in table.primary_key.columns]
+    return stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            column.name: stmt.excluded[column.name]
+            for column in table.columns
+            if column.name not in key
+        },
+    )
+
+
+class BulkWriter:
+    """
+    Writes whole pages of upstream set menus with set-based statements.
+
+    A page costs one upsert for ``set_menu``, at most one for ``cuisine``
+    and two for ``set_menu_cuisine_link`` (dropping links that disappeared
+    upstream, then inserting the current ones), so re-running a harvest is
+    idempotent. Cuisines already written in this run are remembered and
+    not sent again.
+
+    With ``skip_unchanged`` the stored content hashes of the page's menus
+    are read first and menus whose upstream payload hasn't changed aren't
+    written at all.
+
+    Items are normalized a page at a time by ``normalizer``, whose counters
+    report the fields that were defaulted or invalid.
+
+    The caller owns the transaction.
+    """
+
+    def __init__(self, *, chunk_size: int = 1000, skip_unchanged: bool = False) -> None:
+        # Bounds the parameters of a single statement (22 per set menu).
+        self.chunk_size = chunk_size
+        self.skip_unchanged = skip_unchanged
+        self.cuisine_ids: set[int] = set()
+        self.statements = 0
+        self.unchanged = 0
+        self.normalizer = BatchNormalizer()
+
+    def _execute(self, session: Session, statement: Any) -> None:
+        session.execute(statement)
+        self.statements += 1
+
+    def stored_hashes(self, session: Session, ids: Iterable[int]) -> dict[int, str]:
+        rows = session.execute(
+            select(set_menu_table.c.id, set_menu_table.c.content_hash).where(
+                set_menu_table.c.id.in_(list(ids))
+            )
+        )
+        self.statements += 1
+        return {row.id: row.content_hash for row in rows}
+
+    def write_page(self, session: Session, items: Sequence[dict[str, Any]]) -> int:
+        self.write_batch(session, self.normalizer.normalize(items))
+        return len(items)
+
+    def write_batch(self, session: Session, batch: NormalizedBatch) -> None:
+        """Write a page normalized ahead of time, e.g. by another pipeline stage."""
+        if self.skip_unchanged and batch.menus:
+            stored = self.stored_hashes(
+                session, (menu[MENU_ID] for menu in batch.menus)
+            )
+            changed = {
+                menu[MENU_ID]
+                for menu in batch.menus
+                if stored.get(menu[MENU_ID]) != menu[MENU_HASH]
+            }
+            self.unchanged += len(batch.menus) - len(changed)
+            batch = batch.select(changed)
+
+        # A set menu listed twice in a page can't be upserted twice by one
+        # statement; the last copy wins.
+        menus = {menu[MENU_ID]: menu for menu in batch.menus}
+        self.write_rows(
+            session,
+            [dict(zip(SET_MENU_COLUMNS, menu, strict=True)) for menu in menus.values()],
+            [
+                dict(zip(CUISINE_COLUMNS, cuisine, strict=True))
+                for cuisine_id, cuisine in batch.cuisines.items()
+                if cuisine_id not in self.cuisine_ids
+            ],
+            sorted(set(batch.links)),
+        )
+
+    def finish(self, session: Session) -> None:
+        """Nothing to do, every page was written to the live tables already."""
+
+    def write_rows(
+        self,
+        session: Session,
+        menus: Sequence[dict[str, Any]],
+        cuisines: Sequence[dict[str, Any]],
+        links: Sequence[tuple[int, int]],
+    ) -> None:
+        if not menus:
+            return
+        for rows in chunked(cuisines, self.chunk_size):
+            self._execute(session, upsert_statement(cuisine_table, rows))
+        self.cuisine_ids.update(cuisine["id"] for cuisine in cuisines)
+
+        for rows in chunked(menus, self.chunk_size):
+            self._execute(session, upsert_statement(set_menu_table, rows))
+
+        menu_ids = [menu["id"] for menu in menus]
+        stale_links = delete(link_table).where(link_table.c.set_menu_id.in_(menu_ids))
+        if links:
+            stale_links = stale_links.where(
+                tuple_(link_table.c.set_menu_id, link_table.c.cuisine_id).not_in(links)
+            )
+        self._execute(session, stale_links)
+
+        for pairs in chunked(links, self.chunk_size):
+            self._execute(
+                session,
+                insert(link_table)
+                .values(
+                    [
+                        {"set_menu_id": set_menu_id, "cuisine_id": cuisine_id}
+                        for set_menu_id, cuisine_id in pairs
+                    ]
+                )
+                .on_conflict_do_nothing(),
+            )
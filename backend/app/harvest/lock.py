@@ -0,0 +1,35 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, text
+
+# Key of the session-level advisory lock held for the whole of a set-menu
+# harvest, by the in-process scheduler and the CLI alike.
+HARVEST_LOCK_KEY = 7_241_905_113
+
+
+@contextmanager
+def advisory_lock(engine: Engine, key: int = HARVEST_LOCK_KEY) -> Iterator[bool]:
+    """
+    Try to take a PostgreSQL advisory lock without waiting, yielding whether
+    it was acquired.
+
+    The lock lives on a dedicated connection, so it is released when the
+    block exits or, if the process dies, as soon as that connection drops.
+    """
+    with engine.connect() as connection:
+        acquired = bool(
+            connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": key}
+            ).scalar()
+        )
+        # Don't leave the connection idle in a transaction while we hold it.
+        connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": key}
+                )
+                connection.commit()
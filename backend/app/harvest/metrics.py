@@ -0,0 +1,153 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import Engine, event
+
+from app.core.metrics import REGISTRY, Histogram, Registry
+
+# Upper bounds (seconds) for upstream requests and per-batch work.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(float(2**power) for power in range(10, 26, 2))
+
+
+def define_harvest_metrics(registry: Registry) -> Registry:
+    registry.counter("harvest_runs_total", "Harvest runs started")
+    registry.counter("harvest_failed_runs_total", "Harvest runs that failed")
+    registry.counter(
+        "harvest_requests_total", "Requests sent upstream, retries included"
+    )
+    registry.counter("harvest_retries_total", "Upstream requests retried")
+    registry.counter("harvest_throttled_total", "Upstream requests answered with 429")
+    registry.counter(
+        "harvest_throttle_wait_seconds_total",
+        "Time requests spent waiting on the pacer before being sent",
+    )
+    registry.counter("harvest_pages_total", "Pages fetched")
+    registry.counter("harvest_items_total", "Set menus received from upstream")
+    registry.counter("harvest_bytes_total", "Response body bytes received")
+    registry.counter(
+        "harvest_statements_total", "SQL statements issued by the harvester"
+    )
+    registry.counter("harvest_db_seconds_total", "Time spent waiting on the database")
+    registry.histogram(
+        "harvest_fetch_seconds",
+        "Time to the response headers of each upstream request",
+        LATENCY_BUCKETS,
+    )
+    registry.histogram(
+        "harvest_page_bytes", "Response body size of each page", BYTES_BUCKETS
+    )
+    registry.histogram(
+        "harvest_normalize_seconds",
+        "Time normalizing each batch of set menus",
+        LATENCY_BUCKETS,
+    )
+    registry.histogram(
+        "harvest_write_seconds",
+        "Time writing and committing each batch of set menus",
+        LATENCY_BUCKETS,
+    )
+    return registry
+
+
+# Totals over every harvest, next to the API's own.
+define_harvest_metrics(REGISTRY)
+
+
+class RunMetrics:
+    """
+    Telemetry of one harvest run.
+
+    Everything observed is kept per run in ``registry`` (for the run's
+    summary and its ``harvest_run_stats`` row) and added to the
+    process-wide ``REGISTRY`` as it happens. Methods are safe to call from
+    the pipeline's worker threads.
+    """
+
+    def __init__(self, parent: Registry | None = REGISTRY) -> None:
+        self.registry = define_harvest_metrics(Registry())
+        self.parent = parent
+        self.started = time.perf_counter()
+
+    def inc(self, name: str, amount: float = 1.0) -> None:
+        self.registry[name].inc(amount)
+        if self.parent is not None:
+            self.parent[name].inc(amount)
+
+    def observe(self, name: str, value: float) -> None:
+        self.registry[name].observe(value)
+        if self.parent is not None:
+            self.parent[name].observe(value)
+
+    def value(self, name: str) -> float:
+        value: float = self.registry[name].value
+        return value
+
+    def histogram(self, name: str) -> Histogram:
+        histogram: Histogram = self.registry[name]
+        return histogram
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def request(self, seconds: float) -> None:
+        self.inc("harvest_requests_total")
+        self.observe("harvest_fetch_seconds", seconds)
+
+    def retry(self, *, throttled: bool) -> None:
+        self.inc("harvest_retries_total")
+        if throttled:
+            self.inc("harvest_throttled_total")
+
+    def page(self, size: int) -> None:
+        self.inc("harvest_pages_total")
+        self.inc("harvest_bytes_total", size)
+        self.observe("harvest_page_bytes", size)
+
+    def database(self, seconds: float, statements: int = 1) -> None:
+        self.inc("harvest_statements_total", statements)
+        self.inc("harvest_db_seconds_total", seconds)
+
+    @contextmanager
+    def instrument(self, engine: Engine) -> Iterator[None]:
+        """Time every statement sent through ``engine`` while in the block."""
+
+        def before(conn: Any, *_args: Any) -> None:
+            conn.info["harvest_statement_started"] = time.perf_counter()
+
+        def after(conn: Any, *_args: Any) -> None:
+            started = conn.info.pop("harvest_statement_started", None)
+            if started is not None:
+                self.database(time.perf_counter() - started)
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+        try:
+            yield
+        finally:
+            event.remove(engine, "before_cursor_execute", before)
+            event.remove(engine, "after_cursor_execute", after)
+
+    def summary(self) -> list[str]:
+        fetch = self.histogram("harvest_fetch_seconds")
+        normalize = self.histogram("harvest_normalize_seconds")
+        write = self.histogram("harvest_write_seconds")
+        return [
+            f"upstream: {self.value('harvest_requests_total'):.0f} requests,"
+            f" {self.value('harvest_bytes_total') / 2**20:.1f} MiB,"
+            f" latency p50 {fetch.quantile(0.5) * 1000:.0f}ms"
+            f" / p95 {fetch.quantile(0.95) * 1000:.0f}ms,"
+            f" {self.value('harvest_retries_total'):.0f} retries"
+            f" ({self.value('harvest_throttled_total'):.0f} throttled),"
+            f" {self.value('harvest_throttle_wait_seconds_total'):.1f}s"
+            " waiting on the pacer",
+            f"normalize: {normalize.sum:.2f}s over {normalize.count} batches"
+            f" (p95 {normalize.quantile(0.95) * 1000:.0f}ms)",
+            f"database: {self.value('harvest_db_seconds_total'):.2f}s in"
+            f" {self.value('harvest_statements_total'):.0f} statements,"
+            f" {write.sum:.2f}s writing {write.count} batches"
+            f" (p95 {write.quantile(0.95) * 1000:.0f}ms)",
+        ]
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import Counter
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from app.models import Cuisine, SetMenu
+
+SET_MENU_COLUMNS = tuple(column.name for column in SetMenu.__table__.columns)  # type: ignore[attr-defined]
+CUISINE_COLUMNS = tuple(column.name for column in Cuisine.__table__.columns)  # type: ignore[attr-defined]
+
+BOOLEAN_FIELDS = (
+    "is_vegan",
+    "is_vegetarian",
+    "is_seated",
+    "is_standing",
+    "is_canape",
+    "is_mixed_dietary",
+    "is_meal_prep",
+    "is_halal",
+    "is_kosher",
+    "available",
+)
+NUMERIC_DEFAULTS: dict[str, int | float] = {
+    "display_text": 0,
+    "status": 0,
+    "price_per_person": 0.0,
+    "min_spend": 0.0,
+    "number_of_orders": 0,
+}
+STRING_FIELDS = ("description", "image", "thumbnail", "name")
+
+DEFAULTS: dict[str, Any] = {
+    **dict.fromkeys(BOOLEAN_FIELDS, False),
+    **NUMERIC_DEFAULTS,
+    **dict.fromkeys(STRING_FIELDS, ""),
+}
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """How one ``set_menu`` column is filled from a raw upstream item."""
+
+    name: str
+    # Used when upstream sends null or leaves the key out.
+    default: Any = None
+
+
+SET_MENU_FIELDS = tuple(
+    FieldSpec(column, DEFAULTS.get(column)) for column in SET_MENU_COLUMNS
+)
+MENU_ID = SET_MENU_COLUMNS.index("id")
+MENU_HASH = SET_MENU_COLUMNS.index("content_hash")
+MENU_CREATED_AT = SET_MENU_COLUMNS.index("created_at")
+
+if sys.version_info >= (3, 11):
+    _fromisoformat = datetime.fromisoformat
+else:
+
+    def _fromisoformat(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def content_hash(item: dict[str, Any]) -> str:
+    """Stable hash of a raw upstream item, cuisines and unknown keys included."""
+    payload = json.dumps(item, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class NormalizedBatch:
+    """
+    A page of set menus as rows ready for a multi-row INSERT or ``COPY``:
+    ``menus`` in ``SET_MENU_COLUMNS`` order, ``cuisines`` (by id) in
+    ``CUISINE_COLUMNS`` order and ``(set_menu_id, cuisine_id)`` links.
+    """
+
+    menus: list[tuple[Any, ...]] = field(default_factory=list)
+    cuisines: dict[int, tuple[Any, ...]] = field(default_factory=dict)
+    links: list[tuple[int, int]] = field(default_factory=list)
+
+    def select(self, menu_ids: Collection[int]) -> "NormalizedBatch":
+        """The part of the batch belonging to ``menu_ids``."""
+        links = [link for link in self.links if link[0] in menu_ids]
+        linked = {cuisine_id for _, cuisine_id in links}
+        return NormalizedBatch(
+            menus=[menu for menu in self.menus if menu[MENU_ID] in menu_ids],
+            cuisines={
+                cuisine_id: cuisine
+                for cuisine_id, cuisine in self.cuisines.items()
+                if cuisine_id in linked
+            },
+            links=links,
+        )
+
+    def max_created_at(self) -> datetime | None:
+        """
+        The latest ``created_at`` in the batch, as naive UTC: upstream's
+        timestamps don't all carry the same offset, or any.
+        """
+        return max(
+            (_as_utc(menu[MENU_CREATED_AT]) for menu in self.menus), default=None
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class BatchNormalizer:
+    """
+    Turns whole pages of raw upstream items into ``NormalizedBatch`` rows.
+
+    Work is done a column at a time over the page with the precomputed
+    ``SET_MENU_FIELDS``, so filling the defaults of a column is a single
+    ``count`` plus, only when something is missing, one comprehension.
+
+    Items without a usable ``id`` or ``created_at`` are dropped. What was
+    defaulted or rejected is counted per field in ``defaulted`` and
+    ``invalid``. Pages may be normalized from several threads at once: each
+    call counts on its own and adds its counts under a lock.
+    """
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.defaulted: Counter[str] = Counter()
+        self.invalid: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def normalize(self, items: Sequence[dict[str, Any]]) -> NormalizedBatch:
+        defaulted: Counter[str] = Counter()
+        invalid: Counter[str] = Counter()
+        batch = self._normalize(items, defaulted, invalid)
+        with self._lock:
+            self.rows += len(batch.menus)
+            self.defaulted.update(defaulted)
+            self.invalid.update(invalid)
+        return batch
+
+    def _valid_items(
+        self, items: Sequence[dict[str, Any]], invalid: Counter[str]
+    ) -> tuple[list[dict[str, Any]], list[datetime]]:
+        valid: list[dict[str, Any]] = []
+        created: list[datetime] = []
+        for item in items:
+            if not isinstance(item.get("id"), int):
+                invalid["id"] += 1
+                continue
+            try:
+                created_at = _fromisoformat(item["created_at"])
+            except (KeyError, TypeError, ValueError):
+                invalid["created_at"] += 1
+                continue
+            valid.append(item)
+            created.append(created_at)
+        return valid, created
+
+    def _normalize(
+        self,
+        items: Sequence[dict[str, Any]],
+        defaulted: Counter[str],
+        invalid: Counter[str],
+    ) -> NormalizedBatch:
+        valid, created = self._valid_items(items, invalid)
+        if not valid:
+            return NormalizedBatch()
+
+        columns: list[list[Any]] = []
+        for spec in SET_MENU_FIELDS:
+            if spec.name == "created_at":
+                columns.append(created)
+                continue
+            if spec.name == "content_hash":
+                columns.append([content_hash(item) for item in valid])
+                continue
+            values = [item.get(spec.name) for item in valid]
+            if spec.default is not None:
+                missing = values.count(None)
+                if missing:
+                    defaulted[spec.name] += missing
+                    default = spec.default
+                    values = [default if value is None else value for value in values]
+            columns.append(values)
+
+        batch = NormalizedBatch(menus=list(zip(*columns, strict=True)))
+        for item in valid:
+            for cuisine in item.get("cuisines") or ():
+                cuisine_id = cuisine.get("id")
+                if not isinstance(cuisine_id, int):
+                    invalid["cuisines.id"] += 1
+                    continue
+                batch.links.append((item["id"], cuisine_id))
+                batch.cuisines[cuisine_id] = tuple(
+                    cuisine.get(column) for column in CUISINE_COLUMNS
+                )
+        return batch
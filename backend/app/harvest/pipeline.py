@@ -0,0 +1,206 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a ``Pipeline``: ``func`` is blocking and runs on a pool of
+    ``workers`` threads, fed from a queue holding at most ``queue_size``
+    items. A stage with more than one worker may reorder its items, unless
+    it's ``ordered``: then each result waits for the ones before it to be
+    passed on first.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = 8
+    ordered: bool = False
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    queue_size: int
+    items: int = 0
+    # Time spent doing the stage's work (for the source: waiting on it).
+    busy_seconds: float = 0.0
+    # Time spent waiting for room in the next stage's queue.
+    blocked_seconds: float = 0.0
+    depth_total: int = 0
+    depth_samples: int = 0
+    max_depth: int = 0
+
+    def sample_depth(self, depth: int) -> None:
+        self.depth_total += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+    @property
+    def mean_depth(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"{self.name}: {self.items} items, {self.busy_seconds:.1f}s busy,"
+            f" {self.blocked_seconds:.1f}s blocked downstream"
+        )
+        if self.queue_size:
+            text += (
+                f", queue depth {self.mean_depth:.1f} mean / {self.max_depth} max"
+                f" of {self.queue_size}"
+            )
+        return text
+
+
+class _Sequence:
+    """Turns of a stage's items at being passed on, in arrival order."""
+
+    def __init__(self) -> None:
+        self.taken = 0
+        self.next = 0
+        self.turn = asyncio.Condition()
+
+    def take(self) -> int:
+        self.taken += 1
+        return self.taken - 1
+
+    async def wait_for(self, position: int) -> None:
+        async with self.turn:
+            await self.turn.wait_for(lambda: self.next == position)
+
+    async def passed(self, position: int) -> None:
+        async with self.turn:
+            self.next = position + 1
+            self.turn.notify_all()
+
+
+class Pipeline:
+    """
+    Runs ``stages`` one after another over everything ``source`` yields,
+    with every stage working concurrently on different items.
+
+    Stages are joined by bounded queues, so a slow stage holds back the
+    ones before it instead of letting work pile up in memory. A stage
+    whose input queue is usually full is the bottleneck, and one whose
+    queue is usually empty is starved; see ``stats`` once ``run`` returns.
+
+    If any stage fails, the others are cancelled and ``run`` re-raises,
+    but only after every thread has finished the call it was in.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[Any],
+        stages: Sequence[Stage],
+        *,
+        source_name: str = "source",
+    ) -> None:
+        self.source = source
+        self.stages = list(stages)
+        self.stats = [StageStats(source_name, workers=1, queue_size=0)] + [
+            StageStats(stage.name, stage.workers, stage.queue_size)
+            for stage in self.stages
+        ]
+
+    async def run(self) -> None:
+        queues: list[asyncio.Queue[Any]] = [
+            asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages
+        ]
+        executors = [
+            ThreadPoolExecutor(
+                stage.workers, thread_name_prefix=f"pipeline-{stage.name}"
+            )
+            for stage in self.stages
+        ]
+        remaining = [stage.workers for stage in self.stages]
+        sequences = [_Sequence() for _ in self.stages]
+        tasks = [asyncio.create_task(self._feed(queues[0]))]
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                tasks.append(
+                    asyncio.create_task(
+                        self._work(
+                            index, queues, executors[index], remaining, sequences
+                        )
+                    )
+                )
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+    async def _put(
+        self, stats: StageStats, queue: asyncio.Queue[Any], item: Any
+    ) -> None:
+        started = time.perf_counter()
+        await queue.put(item)
+        stats.blocked_seconds += time.perf_counter() - started
+
+    async def _feed(self, queue: asyncio.Queue[Any]) -> None:
+        stats = self.stats[0]
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await anext(self.source)
+                except StopAsyncIteration:
+                    break
+                stats.busy_seconds += time.perf_counter() - started
+                stats.items += 1
+                await self._put(stats, queue, item)
+        finally:
+            aclose = getattr(self.source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        for _ in range(self.stages[0].workers):
+            await queue.put(_DONE)
+
+    async def _work(
+        self,
+        index: int,
+        queues: list[asyncio.Queue[Any]],
+        executor: ThreadPoolExecutor,
+        remaining: list[int],
+        sequences: list["_Sequence"],
+    ) -> None:
+        stage, stats = self.stages[index], self.stats[index + 1]
+        queue = queues[index]
+        downstream = queues[index + 1] if index + 1 < len(queues) else None
+        sequence = sequences[index]
+        loop = asyncio.get_running_loop()
+        while True:
+            stats.sample_depth(queue.qsize())
+            item = await queue.get()
+            if item is _DONE:
+                break
+            # Items leave the queue in the order they arrived.
+            position = sequence.take()
+            started = time.perf_counter()
+            result = await loop.run_in_executor(executor, stage.func, item)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += 1
+            if stage.ordered:
+                await sequence.wait_for(position)
+            if downstream is not None:
+                await self._put(stats, downstream, result)
+            if stage.ordered:
+                await sequence.passed(position)
+        remaining[index] -= 1
+        if remaining[index] == 0 and downstream is not None:
+            for _ in range(self.stages[index + 1].workers):
+                await downstream.put(_DONE)
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlmodel import col
+
+from app.harvest.fetch import CrawlPosition, next_link
+from app.harvest.metrics import RunMetrics
+from app.models import HarvestRun, HarvestRunStats
+
+UNFINISHED = ("running", "failed")
+
+
+def start_run(session: Session, source_url: str, mode: str) -> HarvestRun:
+    """Open a new run, abandoning any unfinished one for the same source."""
+    for stale in session.scalars(
+        select(HarvestRun).where(
+            col(HarvestRun.source_url) == source_url,
+            col(HarvestRun.status).in_(UNFINISHED),
+        )
+    ):
+        stale.status = "abandoned"
+        stale.finished_at = datetime.utcnow()
+        session.add(stale)
+    run = HarvestRun(source_url=source_url, mode=mode)
+    session.add(run)
+    session.flush()
+    return run
+
+
+def find_resumable_run(session: Session, source_url: str) -> HarvestRun | None:
+    """The latest run for ``source_url`` that was interrupted or failed."""
+    return session.scalars(
+        select(HarvestRun)
+        .where(
+            col(HarvestRun.source_url) == source_url,
+            col(HarvestRun.status).in_(UNFINISHED),
+        )
+        .order_by(col(HarvestRun.id).desc())
+        .limit(1)
+    ).first()
+
+
+def latest_run(session: Session, source_url: str) -> HarvestRun | None:
+    return session.scalars(
+        select(HarvestRun)
+        .where(col(HarvestRun.source_url) == source_url)
+        .order_by(col(HarvestRun.id).desc())
+        .limit(1)
+    ).first()
+
+
+def resume_position(run: HarvestRun) -> CrawlPosition | None:
+    """Crawl position after the last committed page, ``None`` to start over."""
+    if run.pages == 0:
+        return None
+    if run.last_page is not None:
+        committed = set(range(1, run.committed_through + 1))
+        committed.update(run.committed_pages or [])
+        return CrawlPosition(last_page=run.last_page, committed_pages=committed)
+    return CrawlPosition(next_url=run.next_url)
+
+
+def record_page(session: Session, run: HarvestRun, envelope: dict[str, Any]) -> None:
+    """
+    Advance the run's cursor past a fully written page. Called inside the
+    page's own transaction, so the cursor never gets ahead of the data.
+    """
+    meta = envelope.get("meta") or {}
+    try:
+        last_page = int(meta["last_page"])
+        current_page = int(meta["current_page"])
+    except (KeyError, TypeError, ValueError):
+        run.next_url = next_link(envelope)
+    else:
+        # Pages complete out of order when fetched concurrently: keep a
+        # contiguous watermark plus the pages committed beyond it.
+        run.last_page = last_page
+        pages = set(run.committed_pages or [])
+        pages.add(current_page)
+        while run.committed_through + 1 in pages:
+            run.committed_through += 1
+            pages.discard(run.committed_through)
+        run.committed_pages = sorted(pages)
+    run.pages += 1
+    run.updated_at = datetime.utcnow()
+    session.add(run)
+
+
+def finish_run(
+    session: Session, run: HarvestRun, status: str, error: str | None = None
+) -> None:
+    run.status = status
+    run.error = error
+    run.finished_at = run.updated_at = datetime.utcnow()
+    session.add(run)
+
+
+def save_run_stats(
+    session: Session, run: HarvestRun, metrics: RunMetrics, status: str
+) -> HarvestRunStats:
+    """Store the telemetry of this attempt at ``run`` as it ends."""
+    fetch = metrics.histogram("harvest_fetch_seconds")
+    seconds = metrics.elapsed
+    assert run.id is not None
+    stats = HarvestRunStats(
+        run_id=run.id,
+        mode=run.mode,
+        status=status,
+        started_at=datetime.utcnow() - timedelta(seconds=seconds),
+        seconds=seconds,
+        requests=int(metrics.value("harvest_requests_total")),
+        pages=int(metrics.value("harvest_pages_total")),
+        items=int(metrics.value("harvest_items_total")),
+        bytes=int(metrics.value("harvest_bytes_total")),
+        retries=int(metrics.value("harvest_retries_total")),
+        throttled=int(metrics.value("harvest_throttled_total")),
+        throttle_wait_seconds=metrics.value("harvest_throttle_wait_seconds_total"),
+        fetch_p50_seconds=fetch.quantile(0.5),
+        fetch_p95_seconds=fetch.quantile(0.95),
+        normalize_seconds=metrics.histogram("harvest_normalize_seconds").sum,
+        write_seconds=metrics.histogram("harvest_write_seconds").sum,
+        db_seconds=metrics.value("harvest_db_seconds_total"),
+        statements=int(metrics.value("harvest_statements_total")),
+    )
+    session.add(stats)
+    return stats
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from app.harvest.lock import advisory_lock
+from app.harvest.runs import latest_run
+
+logger = logging.getLogger(__name__)
+
+
+class HarvestScheduler:
+    """
+    Runs ``harvest`` every ``interval`` seconds from inside the API process.
+
+    Every worker of every replica runs a scheduler, and every ``poll``
+    seconds each one tries to become leader by taking the harvest advisory
+    lock without waiting. The worker that gets it harvests if the last run
+    for ``source_url`` started at least ``interval`` seconds ago, and calls
+    ``on_complete`` afterwards. Everyone else simply tries again later, so
+    there is never more than one sync at a time and a dead leader is
+    replaced within one ``poll``.
+
+    ``harvest`` is blocking and runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        source_url: str,
+        harvest: Callable[[], None],
+        *,
+        interval: float = 3600.0,
+        poll: float = 60.0,
+        on_complete: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        self.engine = engine
+        self.source_url = source_url
+        self.harvest = harvest
+        self.interval = interval
+        self.poll = poll
+        self.on_complete = on_complete
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def is_due(self) -> bool:
+        with Session(self.engine) as session:
+            run = latest_run(session, self.source_url)
+        if run is None:
+            return True
+        return datetime.utcnow() - run.started_at >= timedelta(seconds=self.interval)
+
+    def run_once(self) -> bool:
+        """Harvest if this worker is leader and a run is due; report whether it did."""
+        with advisory_lock(self.engine) as leader:
+            if not leader or not self.is_due():
+                return False
+            logger.info(f"Starting scheduled harvest of {self.source_url}")
+            try:
+                self.harvest()
+            except Exception:
+                logger.exception("Scheduled harvest failed")
+            return True
+
+    async def tick(self) -> bool:
+        ran = await asyncio.to_thread(self.run_once)
+        if ran and self.on_complete is not None:
+            # Even a failed run may have committed some pages.
+            await self.on_complete()
+        return ran
+
+    async def _run_forever(self) -> None:
+        # Spread the workers out so they don't all hit the lock at once.
+        await asyncio.sleep(random.uniform(0, self.poll))
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Harvest scheduler tick failed")
+            await asyncio.sleep(self.poll)
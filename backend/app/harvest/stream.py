@@ -0,0 +1,138 @@
+import codecs
+import json
+from typing import Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_INCOMPLETE = object()
+
+
+class PageParser:
+    """
+    Push parser for one upstream page that hands out ``data[]`` items as
+    soon as each of them has been received.
+
+    Only the item being decoded is buffered, so memory stays flat however
+    large the page is. Decoding uses the C-accelerated ``raw_decode`` of the
+    standard library, one item at a time. The other top-level keys (``links``,
+    ``meta``) are collected into ``envelope``.
+
+    Feed it raw bytes with ``feed`` and call ``close`` once the body ends.
+    """
+
+    def __init__(self, array_key: str = "data") -> None:
+        self.array_key = array_key
+        self.envelope: dict[str, Any] = {}
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: str | None = None
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        self._buffer = self._buffer[self._pos :] + self._text.decode(chunk)
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> list[Any]:
+        self._buffer = self._buffer[self._pos :] + self._text.decode(b"", final=True)
+        self._pos = 0
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Truncated page: the JSON document ended early")
+        return items
+
+    def _decode(self, final: bool) -> Any:
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE
+        # A number (or literal) running up to the end of the buffer may
+        # continue in the next chunk.
+        if end == len(self._buffer) and not final:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _expect(self, char: str) -> None:
+        found = self._buffer[self._pos]
+        if found != char:
+            raise ValueError(
+                f"Expected {char!r} at offset {self._pos}, found {found!r}"
+            )
+        self._pos += 1
+
+    def _parse(self, final: bool) -> list[Any]:
+        items: list[Any] = []
+        buffer = self._buffer
+        while True:
+            while self._pos < len(buffer) and buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos >= len(buffer):
+                return items
+            char = buffer[self._pos]
+            state = self._state
+
+            if state == "start":
+                self._expect("{")
+                self._state = "key_or_end"
+            elif state == "key_or_end":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                else:
+                    self._state = "key"
+            elif state == "key":
+                key = self._decode(final)
+                if key is _INCOMPLETE:
+                    return items
+                self._key = key
+                self._state = "colon"
+            elif state == "colon":
+                self._expect(":")
+                self._state = "array" if self._key == self.array_key else "value"
+            elif state == "value":
+                value = self._decode(final)
+                if value is _INCOMPLETE:
+                    return items
+                self.envelope[str(self._key)] = value
+                self._state = "separator"
+            elif state == "separator":
+                if char == ",":
+                    self._pos += 1
+                    self._state = "key"
+                else:
+                    self._expect("}")
+                    self._state = "done"
+            elif state == "array":
+                if char != "[":
+                    # Not a list after all (e.g. null), keep it as a plain value.
+                    self._state = "value"
+                    continue
+                self._pos += 1
+                self._state = "item_or_end"
+            elif state == "item_or_end":
+                if char == "]":
+                    self._pos += 1
+                    self._state = "separator"
+                else:
+                    self._state = "item"
+            elif state == "item":
+                item = self._decode(final)
+                if item is _INCOMPLETE:
+                    return items
+                items.append(item)
+                self._state = "item_separator"
+            elif state == "item_separator":
+                if char == ",":
+                    self._pos += 1
+                    self._state = "item"
+                else:
+                    self._expect("]")
+                    self._state = "separator"
+            else:
+                raise ValueError(
+                    f"Unexpected data after the page at offset {self._pos}"
+                )
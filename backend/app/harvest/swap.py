@@ -0,0 +1,294 @@
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+
+from psycopg import errors
+from sqlalchemy import Column, MetaData, Table, insert, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.harvest.catalog_version import bump_catalog_version
+from app.harvest.copy_loader import (
+    CopyLoader,
+    distinct_rows,
+    staging_cuisine,
+    staging_link,
+    staging_set_menu,
+)
+from app.harvest.cuisine_stats import refresh_cuisine_stats
+from app.harvest.ingest import cuisine_table, link_table, set_menu_table
+
+logger = logging.getLogger(__name__)
+
+SHADOW_SUFFIX = "__shadow"
+# Referenced tables first: that's the order they are loaded in.
+SWAPPED = (
+    (cuisine_table, staging_cuisine),
+    (set_menu_table, staging_set_menu),
+    (link_table, staging_link),
+)
+
+INDEXES = text(
+    """
+    SELECT index.relname AS name,
+           pg_get_indexdef(index.oid) AS definition,
+           con.conname AS constraint_name,
+           pg_get_constraintdef(con.oid) AS constraint_definition
+    FROM pg_index
+    JOIN pg_class AS index ON index.oid = pg_index.indexrelid
+    LEFT JOIN pg_constraint AS con
+      ON con.conindid = pg_index.indexrelid
+     AND con.conrelid = pg_index.indrelid
+     AND con.contype IN ('p', 'u', 'x')
+    WHERE pg_index.indrelid = CAST(:table AS regclass)
+    ORDER BY con.conname IS NULL, index.relname
+    """
+)
+FOREIGN_KEYS = text(
+    """
+    SELECT conname AS name,
+           conrelid::regclass::text AS table_name,
+           confrelid::regclass::text AS referenced,
+           pg_get_constraintdef(oid) AS definition
+    FROM pg_constraint
+    WHERE contype = 'f'
+      AND (conrelid = ANY(CAST(:tables AS regclass[]))
+           OR confrelid = ANY(CAST(:tables AS regclass[])))
+    """
+)
+OWNED_SEQUENCES = text(
+    """
+    SELECT attname AS column_name,
+           pg_get_serial_sequence(:table, attname) AS sequence
+    FROM pg_attribute
+    WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+    """
+)
+TRIGGERS = text(
+    """
+    SELECT tgname AS name, pg_get_triggerdef(oid) AS definition
+    FROM pg_trigger
+    WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal
+    ORDER BY tgname
+    """
+)
+INDEX_DEFINITION = re.compile(
+    r"^(CREATE (?:UNIQUE )?INDEX )\S+( ON (?:ONLY )?)\S+( .*)$"
+)
+TRIGGER_DEFINITION = re.compile(
+    r"^(CREATE (?:CONSTRAINT )?TRIGGER \S+ .*? ON )\S+( .*)$"
+)
+
+
+def shadow_name(name: str) -> str:
+    return f"{name}{SHADOW_SUFFIX}"
+
+
+@dataclass
+class ShadowPlan:
+    """DDL to give the shadow of one live table the same indexes and keys."""
+
+    table: str
+    indexes: list[str] = field(default_factory=list)
+    constraints: list[str] = field(default_factory=list)
+    # Index names to restore once the shadow has been renamed.
+    renames: list[tuple[str, str]] = field(default_factory=list)
+    # (sequence, column) pairs whose ownership moves to the shadow.
+    sequences: list[tuple[str, str]] = field(default_factory=list)
+    # Trigger names are per table, so these keep their final names.
+    triggers: list[str] = field(default_factory=list)
+
+
+class ShadowSwapLoader(CopyLoader):
+    """
+    Full re-sync loader that never writes to the live catalog tables.
+
+    Pages are copied into the staging tables like ``CopyLoader`` does.
+    ``finish`` then fills bare shadow copies of ``cuisine``, ``set_menu``
+    and ``set_menu_cuisine_link`` in primary key order, builds their
+    indexes and keys in one go on the loaded data, and swaps them in with
+    renames under a short ``ACCESS EXCLUSIVE`` lock. Readers keep seeing
+    the previous catalog, complete, until the caller commits.
+
+    Indexes, keys, triggers and sequence ownership are read from the
+    database rather than the models, so the shadows match the live schema
+    exactly. Triggers are only added once the shadows are loaded, so
+    ``cuisine_stats``, which the catalog's triggers maintain, is recomputed
+    from the shadows before the swap and the catalog version is bumped. If
+    the swap can't get its locks within ``lock_timeout`` it backs off and
+    retries, rather than queueing readers behind it.
+    """
+
+    def __init__(
+        self,
+        *,
+        keep_staging: bool = False,
+        lock_timeout: str = "2s",
+        swap_attempts: int = 5,
+    ) -> None:
+        super().__init__(keep_staging=keep_staging)
+        self.lock_timeout = lock_timeout
+        self.swap_attempts = swap_attempts
+        self.swap_seconds = 0.0
+
+    def _apply(self, session: Session) -> None:
+        plans = self._build_shadows(session)
+        started = time.perf_counter()
+        self._swap(session, plans)
+        self.swap_seconds = time.perf_counter() - started
+
+    def _build_shadows(self, session: Session) -> list[ShadowPlan]:
+        quote = session.get_bind().dialect.identifier_preparer.quote
+        session.execute(
+            text(
+                "DROP TABLE IF EXISTS "
+                + ", ".join(quote(shadow_name(t.name)) for t, _ in reversed(SWAPPED))
+            )
+        )
+        plans = []
+        targets = {}
+        for live, staging in SWAPPED:
+            shadow = shadow_name(live.name)
+            session.execute(
+                text(
+                    f"CREATE TABLE {quote(shadow)} (LIKE {quote(live.name)}"
+                    " INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+                )
+            )
+            target = targets[live.name] = Table(
+                shadow,
+                MetaData(),
+                *(Column(column.name, column.type) for column in live.columns),
+            )
+            session.execute(
+                insert(target).from_select(
+                    [column.name for column in live.columns],
+                    distinct_rows(live, staging),
+                )
+            )
+            plans.append(self._plan(session, live.name))
+
+        for plan in plans:
+            for statement in plan.constraints + plan.indexes:
+                session.execute(text(statement))
+        self._add_foreign_keys(session)
+        for plan in plans:
+            for statement in plan.triggers:
+                session.execute(text(statement))
+        refresh_cuisine_stats(
+            session,
+            set_menu=targets[set_menu_table.name],
+            link=targets[link_table.name],
+        )
+        bump_catalog_version(session)
+        for live, _ in SWAPPED:
+            session.execute(text(f"ANALYZE {quote(shadow_name(live.name))}"))
+        return plans
+
+    def _plan(self, session: Session, table: str) -> ShadowPlan:
+        quote = session.get_bind().dialect.identifier_preparer.quote
+        shadow = shadow_name(table)
+        plan = ShadowPlan(table)
+        for index in session.execute(INDEXES, {"table": table}):
+            temporary = shadow_name(index.name)
+            plan.renames.append((temporary, index.name))
+            if index.constraint_name is not None:
+                # Adding the constraint builds its index under the same name.
+                plan.constraints.append(
+                    f"ALTER TABLE {quote(shadow)} ADD CONSTRAINT {quote(temporary)}"
+                    f" {index.constraint_definition}"
+                )
+                continue
+            match = INDEX_DEFINITION.match(index.definition)
+            if match is None:
+                raise RuntimeError(
+                    f"Can't rebuild index {index.name}: {index.definition}"
+                )
+            plan.indexes.append(
+                f"{match[1]}{quote(temporary)}{match[2]}{quote(shadow)}{match[3]}"
+            )
+        for row in session.execute(OWNED_SEQUENCES, {"table": table}):
+            if row.sequence is not None:
+                plan.sequences.append((row.sequence, row.column_name))
+        for trigger in session.execute(TRIGGERS, {"table": table}):
+            match = TRIGGER_DEFINITION.match(trigger.definition)
+            if match is None:
+                raise RuntimeError(
+                    f"Can't rebuild trigger {trigger.name}: {trigger.definition}"
+                )
+            plan.triggers.append(f"{match[1]}{quote(shadow)}{match[2]}")
+        return plan
+
+    def _add_foreign_keys(self, session: Session) -> None:
+        quote = session.get_bind().dialect.identifier_preparer.quote
+        swapped = {live.name for live, _ in SWAPPED}
+        for key in session.execute(
+            FOREIGN_KEYS, {"tables": [live.name for live, _ in SWAPPED]}
+        ):
+            if key.table_name not in swapped:
+                raise RuntimeError(
+                    f"{key.table_name} references {key.referenced} through {key.name},"
+                    " which a swap would drop"
+                )
+            definition = key.definition.replace(
+                f"REFERENCES {key.referenced}(",
+                f"REFERENCES {quote(shadow_name(key.referenced))}(",
+                1,
+            )
+            # Constraint names only need to be unique per table, so the
+            # shadow's foreign keys get their final names right away.
+            session.execute(
+                text(
+                    f"ALTER TABLE {quote(shadow_name(key.table_name))}"
+                    f" ADD CONSTRAINT {quote(key.name)} {definition}"
+                )
+            )
+
+    def _swap(self, session: Session, plans: list[ShadowPlan]) -> None:
+        quote = session.get_bind().dialect.identifier_preparer.quote
+        live_tables = ", ".join(quote(plan.table) for plan in plans)
+        for attempt in range(1, self.swap_attempts + 1):
+            try:
+                with session.begin_nested():
+                    session.execute(
+                        text(f"SET LOCAL lock_timeout = '{self.lock_timeout}'")
+                    )
+                    session.execute(
+                        text(f"LOCK TABLE {live_tables} IN ACCESS EXCLUSIVE MODE")
+                    )
+                    for plan in plans:
+                        for sequence, column in plan.sequences:
+                            session.execute(
+                                text(
+                                    f"ALTER SEQUENCE {sequence} OWNED BY"
+                                    f" {quote(shadow_name(plan.table))}.{quote(column)}"
+                                )
+                            )
+                    session.execute(text(f"DROP TABLE {live_tables}"))
+                    for plan in plans:
+                        session.execute(
+                            text(
+                                f"ALTER TABLE {quote(shadow_name(plan.table))}"
+                                f" RENAME TO {quote(plan.table)}"
+                            )
+                        )
+                        # Renaming an index also renames its constraint.
+                        for temporary, name in plan.renames:
+                            session.execute(
+                                text(
+                                    f"ALTER INDEX {quote(temporary)} RENAME TO {quote(name)}"
+                                )
+                            )
+                    session.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+                return
+            except OperationalError as e:
+                if (
+                    not isinstance(e.orig, errors.LockNotAvailable)
+                    or attempt == self.swap_attempts
+                ):
+                    raise
+                logger.warning(
+                    f"Catalog tables are busy, retrying the swap ({attempt}/{self.swap_attempts})"
+                )
+                time.sleep(min(0.5 * 2**attempt, 10.0))
@@ -1,10 +1,24 @@
 #!/usr/bin/env python3
-import requests
+import argparse
+import asyncio
 import time
+from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from models import Base, SetMenu, Cuisine, SetMenuCuisineLink
-from datetime import datetime
+from app.harvest.checkpoint import conditional_headers, load_checkpoint, save_checkpoint
+from app.harvest.copy_loader import CopyLoader
+from app.harvest.fetch import AdaptivePacer, PageBatch, PageFetcher
+from app.harvest.ingest import BulkWriter
+from app.harvest.lock import advisory_lock
+from app.harvest.metrics import RunMetrics
+from app.harvest.normalize import NormalizedBatch
+from app.harvest.pipeline import Pipeline, Stage
+from app.harvest.runs import (
+    find_resumable_run, finish_run, record_page, resume_position, save_run_stats,
+    start_run,
+)
+from app.harvest.swap import ShadowSwapLoader
+from app.models import Base
 import os
 from dotenv import load_dotenv
 import logging
@@ -20,96 +34,309 @@ POSTGRES_SERVER = os.environ.get("POSTGRES_SERVER")
 POSTGRES_PORT = os.environ.get("POSTGRES_PORT")
 POSTGRES_DB = os.environ.get("POSTGRES_DB")
 
-DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+DATABASE_URL = f"postgresql+psycopg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The harvest run row is kept across the per-page commits.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, expire_on_commit=False
+)
 Base.metadata.create_all(bind=engine)
 
-def harvest_set_menus(url, batch_size=100):
+INITIAL_URL = "https://staging.yhangry.com/booking/test/set-menus"
+MODES = ("upsert", "copy", "swap")
+
+
+def harvest_set_menus(
+    url: str,
+    batch_size: int = 1000,
+    concurrency: int = 4,
+    max_rate: float = 20.0,
+    mode: str = "upsert",
+    incremental: bool = False,
+    stream: bool = False,
+    resume: bool = False,
+    initial_rate: float = 2.0,
+    normalize_workers: int = 1,
+    queue_size: int = 8,
+) -> None:
+    metrics = RunMetrics()
+    # Every statement of the run is timed, whichever thread sends it.
+    with metrics.instrument(engine):
+        asyncio.run(
+            _harvest_set_menus(
+                url, batch_size, concurrency, max_rate, mode, incremental, stream,
+                resume, initial_rate, normalize_workers, queue_size, metrics,
+            )
+        )
+
+
+async def _harvest_set_menus(
+    url: str,
+    batch_size: int,
+    concurrency: int,
+    max_rate: float,
+    mode: str,
+    incremental: bool,
+    stream: bool,
+    resume: bool,
+    initial_rate: float,
+    normalize_workers: int,
+    queue_size: int,
+    metrics: RunMetrics,
+) -> None:
+    metrics.inc("harvest_runs_total")
     db = SessionLocal()
+    run = find_resumable_run(db, url) if resume else None
+    position = resume_position(run) if run else None
+    if run is not None:
+        # A resumed run has to finish the way it started.
+        mode = run.mode
+        run.status = "running"
+        run.error = None
+        db.add(run)
+        logging.info(f"Resuming harvest run {run.id} after {run.pages} committed pages")
+    else:
+        run = start_run(db, url, mode)
+    db.commit()
+    # "copy" streams rows into staging tables and merges them once at the
+    # end, which is much faster for full re-syncs of large catalogs.
+    writer: BulkWriter | CopyLoader | ShadowSwapLoader
+    if mode == "copy":
+        writer = CopyLoader(keep_staging=position is not None)
+    elif mode == "swap":
+        # Like "copy", but builds a complete new catalog next to the live one
+        # and swaps it in, so readers never see a half-written catalog.
+        writer = ShadowSwapLoader(keep_staging=position is not None)
+    else:
+        writer = BulkWriter(chunk_size=batch_size, skip_unchanged=incremental)
+    # Request pacing adapts to upstream latency and 429s instead of sleeping
+    # a fixed 2 seconds between pages.
+    pacer = AdaptivePacer(
+        rate=min(initial_rate, max_rate), burst=concurrency, max_rate=max_rate
+    )
+    started = time.perf_counter()
+    count = 0
+    max_created_at: datetime | None = None
+
+    def normalize(batch: PageBatch) -> tuple[PageBatch, NormalizedBatch]:
+        normalize_started = time.perf_counter()
+        rows = writer.normalizer.normalize(batch.items)
+        metrics.observe(
+            "harvest_normalize_seconds", time.perf_counter() - normalize_started
+        )
+        return batch, rows
+
+    def write(normalized: tuple[PageBatch, NormalizedBatch]) -> None:
+        nonlocal count, max_created_at
+        write_started = time.perf_counter()
+        batch, rows = normalized
+        items = batch.items
+        metrics.inc("harvest_items_total", len(items))
+        # Off the parsed rows: items without a valid created_at were dropped.
+        batch_max = rows.max_created_at()
+        if batch_max is not None and (
+            max_created_at is None or batch_max > max_created_at
+        ):
+            max_created_at = batch_max
+        # Each batch is written and committed as one transaction.
+        writer.write_batch(db, rows)
+        count += len(items)
+        if batch.envelope is not None:
+            # The page's last batch moves the run's cursor in the same
+            # transaction, so a crash never skips or half-applies a page
+            # on --resume.
+            record_page(db, run, batch.envelope)
+        db.commit()
+        # Nothing written through the ORM needs to outlive the batch.
+        db.expunge_all()
+        metrics.observe("harvest_write_seconds", time.perf_counter() - write_started)
+
     try:
-        count = 0
-        while url:
-            logging.info(f"Fetching data from: {url}")
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            for item in data['data']:
-                # Remove cuisines to handle separately
-                cuisines = item.pop('cuisines')
-                
-                # Handle datetime
-                created_at = datetime.fromisoformat(item['created_at'].replace('Z', '+00:00'))
-                item['created_at'] = created_at
-                
-                # Set default values for all boolean fields
-                boolean_fields = [
-                    'is_vegan', 'is_vegetarian', 'is_seated', 'is_standing',
-                    'is_canape', 'is_mixed_dietary', 'is_meal_prep',
-                    'is_halal', 'is_kosher', 'available'
-                ]
-                for field in boolean_fields:
-                    item[field] = False if item.get(field) is None else item[field]
-                
-                # Set default values for numeric fields
-                numeric_fields = {
-                    'display_text': 0,
-                    'status': 0,
-                    'price_per_person': 0.0,
-                    'min_spend': 0.0,
-                    'number_of_orders': 0
-                }
-                for field, default in numeric_fields.items():
-                    item[field] = default if item.get(field) is None else item[field]
-                
-                # Set default values for string fields
-                string_fields = ['description', 'image', 'thumbnail', 'name']
-                for field in string_fields:
-                    item[field] = '' if item.get(field) is None else item[field]
-                
-                # Create and add the SetMenu object
-                db_set_menu = SetMenu(**item)
-                db.add(db_set_menu)
-                db.flush()
-
-                # Handle cuisines relationship
-                if cuisines:
-                    for cuisine in cuisines:
-                        # Check if cuisine already exists
-                        db_cuisine = db.query(Cuisine).filter(
-                            Cuisine.id == cuisine['id']
-                        ).first()
-                        if not db_cuisine:
-                            db_cuisine = Cuisine(**cuisine)
-                            db.add(db_cuisine)
-                            db.flush()
-                        
-                        # Create the link
-                        link = SetMenuCuisineLink(
-                            set_menu_id=db_set_menu.id,
-                            cuisine_id=db_cuisine.id
-                        )
-                        db.add(link)
-                
-                count += 1
-                if count % batch_size == 0:
-                    db.commit()
-                    logging.info(f"Committed batch of {batch_size} records")
-            
-            db.commit()  # Commit any remaining records
-            
-            url = data.get('links', {}).get('next')
-            if url:
-                logging.info("Waiting 2 seconds before next request...")
-                time.sleep(2)
-            
+        async with PageFetcher(
+            concurrency=concurrency, pacer=pacer, metrics=metrics
+        ) as fetcher:
+            headers = None
+            if incremental and position is None:
+                headers = conditional_headers(load_checkpoint(db, url))
+            if stream:
+                # Items are parsed off the wire and written batch_size at a
+                # time, so no page is ever held in memory as a whole.
+                batches = fetcher.iter_item_batches(
+                    url, batch_size, headers=headers, resume=position
+                )
+            else:
+                batches = (
+                    PageBatch(page['data'], envelope=page)
+                    async for page in fetcher.iter_pages(
+                        url, headers=headers, resume=position
+                    )
+                )
+            # Fetching, normalizing and writing overlap, joined by bounded
+            # queues. There is a single writer: it owns the session, and a
+            # page's cursor must never be committed before its items.
+            # Normalized batches reach it in the order they were fetched,
+            # however many workers normalize them: a links.next cursor
+            # committed ahead of earlier pages would skip them on --resume,
+            # and with --stream a page's batches must stay together.
+            pipeline = Pipeline(
+                batches,
+                [
+                    Stage(
+                        "normalize", normalize,
+                        workers=normalize_workers,
+                        queue_size=queue_size,
+                        ordered=True,
+                    ),
+                    Stage("write", write, workers=1, queue_size=queue_size),
+                ],
+                source_name="fetch",
+            )
+            await pipeline.run()
+            first_response = fetcher.first_response
+            if first_response is not None and first_response.status_code == 304:
+                logging.info("Upstream catalog not modified since the last harvest")
+                finish_run(db, run, "completed")
+                save_run_stats(db, run, metrics, "completed")
+                db.commit()
+                return
+            stats = fetcher.stats
+        writer.finish(db)
+        save_checkpoint(
+            db,
+            url,
+            response=first_response,
+            last_page_url=fetcher.last_page_url,
+            max_created_at=max_created_at,
+        )
+        if not isinstance(writer, BulkWriter):
+            # COPY goes around SQLAlchemy, so the statement timings miss it.
+            metrics.database(writer.copy_seconds, statements=0)
+        finish_run(db, run, "completed")
+        save_run_stats(db, run, metrics, "completed")
+        db.commit()
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"Harvested {count} set menus from {stats.pages} pages"
+            f" in {elapsed:.1f}s ({count / elapsed:.0f} menus/s,"
+            f" {stats.retries} retries, {stats.throttled} throttled,"
+            f" {pacer.throttle_wait:.1f}s waiting on the pacer)"
+        )
+        for line in metrics.summary():
+            logging.info(f"Run telemetry {line}")
+        for stage in pipeline.stats:
+            logging.info(f"Pipeline {stage.summary()}")
+        if isinstance(writer, ShadowSwapLoader):
+            logging.info(
+                f"Copied {writer.rows} rows in {writer.copy_seconds:.1f}s, built the new"
+                f" catalog in {writer.merge_seconds:.1f}s and swapped it in"
+                f" {writer.swap_seconds * 1000:.0f}ms"
+            )
+        elif isinstance(writer, CopyLoader):
+            logging.info(
+                f"Copied {writer.rows} rows in {writer.copy_seconds:.1f}s and merged"
+                f" them in {writer.merge_seconds:.1f}s ({writer.rows_per_second:.0f} rows/s)"
+            )
+        else:
+            logging.info(
+                f"Issued {writer.statements} statements,"
+                f" skipped {writer.unchanged} unchanged set menus"
+            )
+        normalizer = writer.normalizer
+        if normalizer.defaulted:
+            logging.info(f"Defaulted fields: {dict(normalizer.defaulted.most_common())}")
+        if normalizer.invalid:
+            logging.warning(
+                f"Dropped set menus or cuisines with invalid fields:"
+                f" {dict(normalizer.invalid.most_common())}"
+            )
+
     except Exception as e:
-        logging.error(f"Error: {e}")
+        logging.exception("Harvest failed, rolling back the current page")
         db.rollback()
+        metrics.inc("harvest_failed_runs_total")
+        finish_run(db, run, "failed", error=repr(e))
+        save_run_stats(db, run, metrics, "failed")
+        db.commit()
+        logging.info(f"Run {run.id} can be continued with --resume")
+        raise
     finally:
         db.close()
 
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Harvest set menus from upstream")
+    parser.add_argument("--url", default=INITIAL_URL)
+    parser.add_argument(
+        "--mode", choices=MODES, default="upsert",
+        help="upsert: write each page with bulk upserts;"
+        " copy: COPY into staging tables and merge at the end (full re-syncs);"
+        " swap: COPY into a new catalog and swap it for the live one at the end"
+        " (full re-syncs, set menus missing upstream are removed)",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Send a conditional request for the first page and skip set menus"
+        " whose content hash hasn't changed",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Parse items incrementally off the response body and write them"
+        " in batches of --batch-size, keeping memory flat for any catalog size",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue the last interrupted or failed run for --url after its"
+        " last committed page (in that run's --mode) instead of starting over",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1000,
+        help="Maximum rows per multi-row INSERT statement (per write batch with --stream)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Maximum page fetches in flight when upstream reports the page count",
+    )
+    parser.add_argument(
+        "--max-rate", type=float, default=20.0,
+        help="Upper bound for the adaptive request rate (requests/second)",
+    )
+    parser.add_argument(
+        "--normalize-workers", type=int, default=1,
+        help="Threads normalizing pages while others are fetched and written",
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=8,
+        help="Batches each pipeline stage may have queued up before the stage"
+        " before it waits",
+    )
+    parser.add_argument(
+        "--initial-rate", type=float, default=2.0,
+        help="Request rate to start from before adapting (requests/second)",
+    )
+    args = parser.parse_args()
+    if args.incremental and args.mode != "upsert":
+        parser.error("--incremental only applies to --mode upsert")
+    return args
+
+
 if __name__ == "__main__":
-    initial_url = "https://staging.yhangry.com/booking/test/set-menus"
-    harvest_set_menus(initial_url)
\ No newline at end of file
+    args = parse_args()
+    # The API's harvest scheduler takes the same lock, so the two never sync
+    # at the same time.
+    with advisory_lock(engine) as acquired:
+        if not acquired:
+            raise SystemExit("Another harvest is already running")
+        harvest_set_menus(
+            args.url,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            max_rate=args.max_rate,
+            initial_rate=args.initial_rate,
+            normalize_workers=args.normalize_workers,
+            queue_size=args.queue_size,
+            mode=args.mode,
+            incremental=args.incremental,
+            stream=args.stream,
+            resume=args.resume,
+        )
@@ -1,5 +1,9 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 from fastapi_cache import FastAPICache
@@ -7,8 +11,15 @@ from fastapi_cache.backends.redis import RedisBackend
 from redis import asyncio as aioredis
 
 from app.api.main import api_router
+from app.core.cache import catalog_version, query_key_builder, sync_catalog_version
 from app.core.config import settings
-from app.api.v1.endpoints import set_menus
+from app.core.db import engine
+from app.core.metrics import REGISTRY
+from app.core.responses import ORJSONCoder
+from app.core.tiered_cache import TieredBackend
+from app.db.session import async_engine
+from app.harvest.scheduler import HarvestScheduler
+from app.api.v1.endpoints import cuisines, set_menus
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -18,10 +29,67 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+def scheduled_harvest() -> None:
+    # Imported lazily: the script sets up its own engine on import.
+    from app.harvest_setmenus import harvest_set_menus
+
+    harvest_set_menus(
+        settings.HARVEST_URL,
+        mode=settings.HARVEST_MODE,
+        incremental=settings.HARVEST_MODE == "upsert",
+        stream=True,
+        resume=True,
+    )
+
+
+async def after_harvest() -> None:
+    await sync_catalog_version()
+    # Rendered once per host; the other workers map the file it writes.
+    await set_menus.SNAPSHOT.build(await catalog_version())
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    redis = aioredis.from_url("redis://redis", encoding="utf8", decode_responses=True)
+    backend = TieredBackend(
+        RedisBackend(redis),
+        redis,
+        ttl=settings.RESPONSE_CACHE_LOCAL_TTL_SECONDS,
+        max_bytes=settings.RESPONSE_CACHE_LOCAL_MAX_BYTES,
+    )
+    backend.start()
+    FastAPICache.init(
+        backend=backend,
+        prefix="fastapi-cache",
+        key_builder=query_key_builder,
+        coder=ORJSONCoder,
+    )
+    scheduler = None
+    if settings.HARVEST_SCHEDULER_ENABLED:
+        scheduler = HarvestScheduler(
+            engine,
+            settings.HARVEST_URL,
+            scheduled_harvest,
+            interval=settings.HARVEST_INTERVAL_SECONDS,
+            poll=settings.HARVEST_POLL_SECONDS,
+            on_complete=after_harvest,
+        )
+        scheduler.start()
+    yield
+    if scheduler is not None:
+        await scheduler.stop()
+    await backend.close()
+    # Pooled async connections belong to this event loop.
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Set all CORS enabled origins
@@ -35,13 +103,16 @@ if settings.all_cors_origins:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
-app.include_router(
-    set_menus.router,
-    prefix="/api/v1",
-    tags=["set-menus"]
-)
 
-@app.on_event("startup")
-async def startup():
-    redis = aioredis.from_url("redis://redis", encoding="utf8", decode_responses=True)
-    FastAPICache.init(backend=RedisBackend(redis), prefix="fastapi-cache")
+
+@app.get("/metrics", tags=["metrics"], include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """The API's and the harvester's metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+app.include_router(set_menus.router, prefix="/api/v1", tags=["set-menus"])
+
+app.include_router(cuisines.router, prefix="/api/v1", tags=["cuisines"])
@@ -4,8 +4,7 @@ from datetime import datetime
 from pydantic import EmailStr, BaseModel
 from sqlmodel import Field, Relationship, SQLModel, Column, JSON
 from sqlalchemy.ext.declarative import declarative_base
-import requests
-from sqlalchemy import Index
+from sqlalchemy import BigInteger, Index, text
 
 Base = declarative_base()
 
@@ -142,6 +141,32 @@ class Cuisine(SQLModel, table=True):
         link_model=SetMenuCuisineLink
     )
 
+class CuisineStats(SQLModel, table=True):
+    """
+    Live set menus and their orders per cuisine, kept current by triggers on
+    set_menu and set_menu_cuisine_link (see the add_cuisine_stats migration).
+    """
+
+    __tablename__ = "cuisine_stats"
+
+    # No foreign key: the swap loader replaces the cuisine table wholesale
+    cuisine_id: int = Field(primary_key=True)
+    set_menu_count: int = 0
+    total_orders: int = Field(default=0, sa_type=BigInteger)
+
+class CatalogVersion(SQLModel, table=True):
+    """
+    Single row counting the changes to the catalog: bumped by every
+    statement that really changes set_menu, cuisine or set_menu_cuisine_link
+    (see the add_catalog_version migration) and by every swap. Cached
+    responses are keyed by it.
+    """
+
+    __tablename__ = "catalog_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=1, sa_type=BigInteger)
+
 class MenuGroupGroups(BaseModel):
     ungrouped: int
     Starters: Optional[int] = None
@@ -184,7 +209,15 @@ class SetMenu(SQLModel, table=True):
         Index('idx_name', 'name'),
         
         # Index for created_at (for sorting/filtering by date)
-        Index('idx_created_at', 'created_at')
+        Index('idx_created_at', 'created_at'),
+
+        # Live set menus in listing order, for keyset (cursor) pagination
+        Index(
+            'idx_live_popularity',
+            text('number_of_orders DESC'),
+            text('id DESC'),
+            postgresql_where=text('status = 1'),
+        ),
     )
     id: int = Field(default=None, primary_key=True)
     created_at: datetime
@@ -207,12 +240,75 @@ class SetMenu(SQLModel, table=True):
     is_kosher: bool
     available: bool
     number_of_orders: int
+    # Hash of the upstream payload, lets incremental harvests skip unchanged menus
+    content_hash: Optional[str] = Field(default=None, max_length=32)
     cuisines: List[Cuisine] = Relationship(
         back_populates="set_menus",
         link_model=SetMenuCuisineLink
     )
 
 
+class HarvestCheckpoint(SQLModel, table=True):
+    __tablename__ = "harvest_checkpoint"
+
+    source_url: str = Field(primary_key=True)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    last_page_url: Optional[str] = None
+    max_created_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class HarvestRun(SQLModel, table=True):
+    __tablename__ = "harvest_run"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_url: str = Field(index=True)
+    mode: str
+    # running, completed, failed or abandoned
+    status: str = Field(default="running", index=True)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    pages: int = 0
+    # Cursor of the last fully committed page: links.next for crawls that
+    # follow links, a watermark plus out-of-order pages for numbered crawls
+    next_url: Optional[str] = None
+    last_page: Optional[int] = None
+    committed_through: int = 0
+    committed_pages: List[int] = Field(default_factory=list, sa_column=Column(JSON))
+    error: Optional[str] = None
+
+
+class HarvestRunStats(SQLModel, table=True):
+    """Telemetry of one attempt at a harvest run (a resumed run has several)."""
+
+    __tablename__ = "harvest_run_stats"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="harvest_run.id", index=True, ondelete="CASCADE")
+    mode: str
+    # completed or failed
+    status: str
+    started_at: datetime
+    finished_at: datetime = Field(default_factory=datetime.utcnow)
+    seconds: float = 0.0
+    requests: int = 0
+    pages: int = 0
+    items: int = 0
+    bytes: int = Field(default=0, sa_type=BigInteger)
+    retries: int = 0
+    throttled: int = 0
+    throttle_wait_seconds: float = 0.0
+    # Upstream latency quantiles, estimated from the run's histogram
+    fetch_p50_seconds: float = 0.0
+    fetch_p95_seconds: float = 0.0
+    normalize_seconds: float = 0.0
+    write_seconds: float = 0.0
+    db_seconds: float = 0.0
+    statements: int = 0
+
+
 class SetMenuData(SQLModel):
     data: List[SetMenu]
     links: Dict[str, Optional[str]]
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.harvest.ingest import BulkWriter
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+NO_CACHE = {"Cache-Control": "no-store"}
+
+
+def test_get_cuisines_counts_live_set_menus(client: TestClient, db: Session) -> None:
+    cuisine, retired = random_cuisine_payload(), random_cuisine_payload()
+    BulkWriter().write_page(
+        db,
+        [
+            random_set_menu_payload(cuisines=[cuisine], number_of_orders=20),
+            random_set_menu_payload(cuisines=[cuisine], number_of_orders=2**31 - 1),
+            random_set_menu_payload(cuisines=[retired], status=0),
+        ],
+    )
+    db.commit()
+
+    response = client.get("/api/v1/cuisines", headers=NO_CACHE)
+    assert response.status_code == 200
+    cuisines = response.json()["cuisines"]
+    (listed,) = (c for c in cuisines if c["id"] == cuisine["id"])
+    assert listed == {
+        "id": cuisine["id"],
+        "name": cuisine["name"],
+        "slug": cuisine["slug"],
+        "set_menu_count": 2,
+        "total_orders": 2**31 + 19,
+    }
+    # Only cuisines with live set menus are listed, most ordered first.
+    assert all(c["id"] != retired["id"] for c in cuisines)
+    orders = [c["total_orders"] for c in cuisines]
+    assert orders == sorted(orders, reverse=True)
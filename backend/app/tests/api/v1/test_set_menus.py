@@ -0,0 +1,364 @@
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.api.v1.endpoints import set_menus
+from app.core.cache import sync_catalog_version
+from app.db.session import POOL_CHECKOUTS, async_engine, engine
+from app.harvest.ingest import BulkWriter
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+# Skips the response cache, so every request runs the queries.
+NO_CACHE = {"Cache-Control": "no-store"}
+
+
+@pytest.fixture
+def memory_cache(client: TestClient) -> Generator[None, None, None]:
+    """
+    Swaps Redis for an in-memory backend, keeping the app's key builder and
+    coder, with the catalog version cached as it is once the API has served
+    a request.
+    """
+    backend, prefix = FastAPICache.get_backend(), FastAPICache.get_prefix()
+    key_builder, coder = FastAPICache.get_key_builder(), FastAPICache.get_coder()
+    FastAPICache.reset()
+    FastAPICache.init(
+        InMemoryBackend(), prefix=prefix, key_builder=key_builder, coder=coder
+    )
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    yield
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix=prefix, key_builder=key_builder, coder=coder)
+
+
+def test_get_set_menus_filters_sorts_and_paginates(
+    client: TestClient, db: Session
+) -> None:
+    cuisine = random_cuisine_payload()
+    items = [
+        random_set_menu_payload(cuisines=[cuisine], number_of_orders=orders)
+        for orders in (5, 30, 10)
+    ]
+    items.append(
+        random_set_menu_payload(cuisines=[cuisine], number_of_orders=99, status=0)
+    )
+    BulkWriter().write_page(db, items)
+    db.commit()
+
+    params = {"cuisine_slug": cuisine["slug"], "page_size": 2}
+    response = client.get("/api/v1/set-menus", params=params, headers=NO_CACHE)
+    assert response.status_code == 200
+    content = response.json()
+    assert [menu["number_of_orders"] for menu in content["set_menus"]] == [30, 10]
+    pagination = content["pagination"]
+    assert pagination.pop("next_cursor")
+    assert pagination == {"total": 3, "page": 1, "page_size": 2, "total_pages": 2}
+    # The cuisine facets are opt-in.
+    assert "cuisines" not in content
+
+    response = client.get(
+        "/api/v1/set-menus", params={**params, "page": 2}, headers=NO_CACHE
+    )
+    content = response.json()
+    assert [menu["number_of_orders"] for menu in content["set_menus"]] == [5]
+    assert content["pagination"]["next_cursor"] is None
+
+
+def test_get_set_menus_includes_cuisines_on_request(
+    client: TestClient, db: Session
+) -> None:
+    cuisine = random_cuisine_payload()
+    BulkWriter().write_page(
+        db,
+        [
+            random_set_menu_payload(cuisines=[cuisine], number_of_orders=orders)
+            for orders in (5, 30, 10)
+        ],
+    )
+    db.commit()
+
+    params = {"cuisine_slug": cuisine["slug"], "page_size": 2, "include": "cuisines"}
+    response = client.get("/api/v1/set-menus", params=params, headers=NO_CACHE)
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["set_menus"]) == 2
+    (listed,) = (c for c in content["cuisines"] if c["slug"] == cuisine["slug"])
+    assert listed["set_menu_count"] == 3
+    assert listed["total_orders"] == 45
+    assert (
+        content["cuisines"]
+        == client.get("/api/v1/cuisines", headers=NO_CACHE).json()["cuisines"]
+    )
+
+    response = client.get(
+        "/api/v1/set-menus", params={"include": "dishes"}, headers=NO_CACHE
+    )
+    assert response.status_code == 422
+
+
+def test_get_set_menus_unknown_cuisine(client: TestClient) -> None:
+    response = client.get(
+        "/api/v1/set-menus",
+        params={"cuisine_slug": "no-such-cuisine"},
+        headers=NO_CACHE,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["set_menus"] == []
+    assert content["pagination"]["total"] == 0
+
+
+def test_get_set_menus_cursor_pagination(client: TestClient, db: Session) -> None:
+    cuisine = random_cuisine_payload()
+    # Ties on number_of_orders are ordered by id.
+    items = [
+        random_set_menu_payload(cuisines=[cuisine], number_of_orders=orders)
+        for orders in (7, 3, 7, 7, 1)
+    ]
+    BulkWriter().write_page(db, items)
+    db.commit()
+    expected = [
+        item["id"]
+        for item in sorted(
+            items, key=lambda item: (item["number_of_orders"], item["id"]), reverse=True
+        )
+    ]
+
+    params = {"cuisine_slug": cuisine["slug"], "page_size": 2}
+    seen: list[int] = []
+    cursor = None
+    for _ in range(len(items)):
+        response = client.get(
+            "/api/v1/set-menus",
+            params={**params, "cursor": cursor} if cursor else params,
+            headers=NO_CACHE,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        # Cursor pages aren't numbered.
+        assert content["pagination"]["page"] == (None if cursor else 1)
+        seen.extend(menu["id"] for menu in content["set_menus"])
+        cursor = content["pagination"]["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+    # Menus that start or stop being listed don't shift the next page.
+    offset_page_two = client.get(
+        "/api/v1/set-menus", params={**params, "page": 2}, headers=NO_CACHE
+    ).json()
+    first = client.get("/api/v1/set-menus", params=params, headers=NO_CACHE).json()
+    BulkWriter().write_page(
+        db, [random_set_menu_payload(cuisines=[cuisine], number_of_orders=100)]
+    )
+    db.commit()
+    after_cursor = client.get(
+        "/api/v1/set-menus",
+        params={**params, "cursor": first["pagination"]["next_cursor"]},
+        headers=NO_CACHE,
+    ).json()
+    assert after_cursor["set_menus"] == offset_page_two["set_menus"]
+
+
+def test_get_set_menus_rejects_invalid_cursor(client: TestClient) -> None:
+    for cursor in ("not a cursor", "bm90OmFuOmludA"):
+        response = client.get(
+            "/api/v1/set-menus", params={"cursor": cursor}, headers=NO_CACHE
+        )
+        assert response.status_code == 400
+
+
+def test_get_set_menus_is_one_round_trip(client: TestClient, db: Session) -> None:
+    cuisine = random_cuisine_payload()
+    BulkWriter().write_page(
+        db, [random_set_menu_payload(cuisines=[cuisine]) for _ in range(3)]
+    )
+    db.commit()
+    statements: list[str] = []
+
+    def record(_conn: Any, _cursor: Any, statement: str, *_args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        params = {"cuisine_slug": cuisine["slug"], "page_size": 2}
+        first = client.get("/api/v1/set-menus", params=params, headers=NO_CACHE)
+        assert len(statements) == 1
+        client.get(
+            "/api/v1/set-menus",
+            params={**params, "cursor": first.json()["pagination"]["next_cursor"]},
+            headers=NO_CACHE,
+        )
+        assert len(statements) == 2
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def test_get_set_menus_serves_repeated_requests_from_cache(
+    client: TestClient,
+    db: Session,
+    memory_cache: None,  # noqa: ARG001
+) -> None:
+    cuisine = random_cuisine_payload()
+    BulkWriter().write_page(db, [random_set_menu_payload(cuisines=[cuisine])])
+    db.commit()
+    statements: list[str] = []
+
+    def record(_conn: Any, _cursor: Any, statement: str, *_args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        params = {"cuisine_slug": cuisine["slug"]}
+        first = client.get("/api/v1/set-menus", params=params)
+        assert first.headers["X-FastAPI-Cache"] == "MISS"
+        # Each request has its own database session, but they share a key:
+        # defaults spelled out, reordered and in another case.
+        for repeat in (
+            params,
+            {"page_size": 20, "page": 1, "cuisine_slug": cuisine["slug"].upper()},
+        ):
+            response = client.get("/api/v1/set-menus", params=repeat)
+            assert response.headers["X-FastAPI-Cache"] == "HIT"
+            assert response.json() == first.json()
+        assert len(statements) == 1
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def test_cache_hits_never_check_out_a_connection(
+    client: TestClient,
+    db: Session,
+    memory_cache: None,  # noqa: ARG001
+) -> None:
+    cuisine = random_cuisine_payload()
+    BulkWriter().write_page(db, [random_set_menu_payload(cuisines=[cuisine])])
+    db.commit()
+    sync_checkouts: list[Any] = []
+
+    def record(*args: Any) -> None:
+        sync_checkouts.append(args)
+
+    params = {"cuisine_slug": cuisine["slug"], "include": "cuisines"}
+    before = POOL_CHECKOUTS.value
+    assert client.get("/api/v1/set-menus", params=params).status_code == 200
+    assert POOL_CHECKOUTS.value == before + 1
+
+    event.listen(engine, "checkout", record)
+    try:
+        for _ in range(3):
+            response = client.get("/api/v1/set-menus", params=params)
+            assert response.headers["X-FastAPI-Cache"] == "HIT"
+    finally:
+        event.remove(engine, "checkout", record)
+    assert POOL_CHECKOUTS.value == before + 1
+    assert not sync_checkouts
+
+
+def test_cached_responses_last_until_the_catalog_changes(
+    client: TestClient,
+    db: Session,
+    memory_cache: None,  # noqa: ARG001
+) -> None:
+    cuisine = random_cuisine_payload()
+    item = random_set_menu_payload(cuisines=[cuisine])
+    BulkWriter().write_page(db, [item])
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    params = {"cuisine_slug": cuisine["slug"]}
+    assert (
+        client.get("/api/v1/set-menus", params=params).headers["X-FastAPI-Cache"]
+        == "MISS"
+    )
+
+    # A harvest that changed nothing keeps every cached response.
+    BulkWriter().write_page(db, [item])
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    response = client.get("/api/v1/set-menus", params=params)
+    assert response.headers["X-FastAPI-Cache"] == "HIT"
+
+    item["number_of_orders"] += 1
+    BulkWriter().write_page(db, [item])
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    response = client.get("/api/v1/set-menus", params=params)
+    assert response.headers["X-FastAPI-Cache"] == "MISS"
+    assert (
+        response.json()["set_menus"][0]["number_of_orders"] == item["number_of_orders"]
+    )
+
+
+def test_conditional_requests_are_answered_before_any_database_work(
+    client: TestClient,
+    db: Session,
+    memory_cache: None,  # noqa: ARG001
+) -> None:
+    cuisine = random_cuisine_payload()
+    item = random_set_menu_payload(cuisines=[cuisine])
+    BulkWriter().write_page(db, [item])
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    params = {"cuisine_slug": cuisine["slug"]}
+    first = client.get("/api/v1/set-menus", params=params)
+    etag = first.headers["ETag"]
+    assert etag.startswith('"')
+    assert first.headers["Cache-Control"] == "max-age=60, stale-while-revalidate=300"
+
+    # The same query spelled differently has the same ETag.
+    repeat = {"cuisine_slug": cuisine["slug"].upper(), "page": 1}
+    before = POOL_CHECKOUTS.value
+    response = client.get(
+        "/api/v1/set-menus", params=repeat, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert POOL_CHECKOUTS.value == before
+
+    item["number_of_orders"] += 1
+    BulkWriter().write_page(db, [item])
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    response = client.get(
+        "/api/v1/set-menus", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_first_pages_are_served_from_the_snapshot(
+    client: TestClient,
+    db: Session,
+    memory_cache: None,  # noqa: ARG001
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cuisine = random_cuisine_payload()
+    BulkWriter().write_page(
+        db, [random_set_menu_payload(cuisines=[cuisine]) for _ in range(3)]
+    )
+    db.commit()
+    client.portal.call(sync_catalog_version)  # type: ignore[union-attr]
+    monkeypatch.setattr(set_menus.SNAPSHOT, "path", str(tmp_path / "set-menus"))
+    assert client.portal.call(set_menus.SNAPSHOT.build)  # type: ignore[union-attr]
+
+    params = {"cuisine_slug": cuisine["slug"].upper()}
+    before = POOL_CHECKOUTS.value
+    response = client.get("/api/v1/set-menus", params=params)
+    assert response.headers["X-FastAPI-Cache"] == "SNAPSHOT"
+    assert POOL_CHECKOUTS.value == before
+    computed = client.get("/api/v1/set-menus", params=params, headers=NO_CACHE)
+    assert response.json() == computed.json()
+    assert len(response.json()["set_menus"]) == 3
+
+    # Only the default listing is rendered.
+    response = client.get("/api/v1/set-menus", params={**params, "page_size": 2})
+    assert response.headers["X-FastAPI-Cache"] == "MISS"
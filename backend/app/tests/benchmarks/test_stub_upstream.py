@@ -0,0 +1,40 @@
+import httpx
+
+from app.benchmarks.stub_upstream import ID_OFFSET, Catalog, Faults, StubUpstream
+from app.harvest.normalize import BatchNormalizer
+
+
+def test_catalog_pages_look_like_upstream() -> None:
+    catalog = Catalog(pages=3, page_size=10, seed=1)
+    page = catalog.page("http://stub.test/set-menus", 2)
+
+    assert [item["id"] for item in page["data"]] == list(
+        range(ID_OFFSET + 10, ID_OFFSET + 20)
+    )
+    assert page["links"]["next"] == "http://stub.test/set-menus?page=3"
+    assert page["meta"] == {
+        "current_page": 2,
+        "last_page": 3,
+        "per_page": 10,
+        "total": 30,
+    }
+    assert catalog.page("http://stub.test/set-menus", 2) == page
+    normalizer = BatchNormalizer()
+    assert len(normalizer.normalize(page["data"]).menus) == 10
+    assert not normalizer.invalid
+
+
+def test_stub_upstream_serves_pages_and_injects_throttling() -> None:
+    with StubUpstream(Catalog(pages=2, page_size=5), Faults(throttle_rate=1.0)) as stub:
+        response = httpx.get(stub.url)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "0.05"
+        assert stub.throttled.value == 1
+
+    with StubUpstream(Catalog(pages=2, page_size=5)) as stub:
+        first = httpx.get(stub.url).json()
+        assert len(first["data"]) == 5
+        assert first["links"]["next"] == f"{stub.url}?page=2"
+        assert httpx.get(first["links"]["next"]).json()["links"]["next"] is None
+        assert httpx.get(f"{stub.url}?page=3").status_code == 404
+        assert stub.requests.value == 3
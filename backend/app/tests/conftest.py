@@ -7,7 +7,15 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
+from app.models import (
+    Cuisine,
+    HarvestCheckpoint,
+    HarvestRun,
+    Item,
+    SetMenu,
+    SetMenuCuisineLink,
+    User,
+)
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -21,6 +29,16 @@ def db() -> Generator[Session, None, None]:
         session.execute(statement)
         statement = delete(User)
         session.execute(statement)
+        statement = delete(SetMenuCuisineLink)
+        session.execute(statement)
+        statement = delete(SetMenu)
+        session.execute(statement)
+        statement = delete(Cuisine)
+        session.execute(statement)
+        statement = delete(HarvestCheckpoint)
+        session.execute(statement)
+        statement = delete(HarvestRun)
+        session.execute(statement)
         session.commit()
 
 
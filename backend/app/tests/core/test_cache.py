@@ -0,0 +1,295 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Callable, Coroutine, Generator
+from typing import Annotated, Any
+
+import pytest
+from fastapi import Depends, Query
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend, Value
+from fastapi_cache.coder import JsonCoder
+from starlette.responses import Response
+
+from app.api.v1.endpoints.set_menus import get_set_menus
+from app.core.cache import _etag_matches, cached, query_key_builder
+
+
+def key(**kwargs: Any) -> str:
+    query = {
+        "cuisine_slug": None,
+        "page": 1,
+        "page_size": 20,
+        "cursor": None,
+        "include": None,
+    }
+    # The decorated endpoint keeps the original function as __wrapped__.
+    return query_key_builder(
+        get_set_menus.__wrapped__,  # type: ignore[attr-defined]
+        "fastapi-cache:set-menus",
+        args=(),
+        kwargs={**query, **kwargs},
+    )
+
+
+def test_key_ignores_injected_dependencies() -> None:
+    assert key(db=object()) == key(db=object())
+    assert key().startswith("fastapi-cache:set-menus:")
+
+
+def test_key_normalizes_query_parameters() -> None:
+    assert key(cuisine_slug="Thai") == key(cuisine_slug="thai")
+    assert key(cuisine_slug="thai") != key(cuisine_slug="greek")
+    assert key(page=2) != key()
+    assert key(page_size=20, page=1) == key(page=1, page_size=20)
+
+
+def test_key_rejects_undeclared_objects() -> None:
+    async def endpoint(
+        page: int = Query(1), session: Any = None, user: Any = Depends(object)
+    ) -> None: ...
+
+    kwargs = {"page": 1, "user": object()}
+    assert query_key_builder(endpoint, args=(), kwargs=kwargs)
+    with pytest.raises(TypeError, match="session"):
+        query_key_builder(endpoint, args=(), kwargs={**kwargs, "session": object()})
+
+
+class LockingRedis:
+    """The two Redis commands cached() takes and releases its locks with."""
+
+    def __init__(self) -> None:
+        self.locks: dict[str, str] = {}
+
+    async def set(self, name: str, value: str, nx: bool, px: int) -> bool | None:  # noqa: ARG002
+        if name in self.locks:
+            return None
+        self.locks[name] = value
+        return True
+
+    async def eval(self, _script: str, _numkeys: int, name: str, token: str) -> int:
+        if self.locks.get(name) != token:
+            return 0
+        del self.locks[name]
+        return 1
+
+
+class LockingBackend(InMemoryBackend):
+    """An in-memory store of its own, locked through ``redis`` like Redis."""
+
+    def __init__(self) -> None:
+        self._store: dict[str, Value] = {}
+        self._lock = asyncio.Lock()
+        self.redis = LockingRedis()
+
+
+# What FastAPICache.init sets, restored after each test.
+FASTAPI_CACHE_STATE = (
+    "_init",
+    "_backend",
+    "_prefix",
+    "_expire",
+    "_coder",
+    "_key_builder",
+    "_cache_status_header",
+    "_enable",
+)
+
+
+@pytest.fixture
+def backend() -> Generator[LockingBackend, None, None]:
+    saved = {name: getattr(FastAPICache, name) for name in FASTAPI_CACHE_STATE}
+    backend = LockingBackend()
+    FastAPICache.reset()
+    FastAPICache.init(backend, prefix="test", key_builder=query_key_builder)
+    yield backend
+    for name, value in saved.items():
+        setattr(FastAPICache, name, value)
+
+
+def listing(
+    soft_ttl: int = 60, lock_ttl: float = 5.0, versioned: bool = False
+) -> tuple[Callable[..., Coroutine[Any, Any, Any]], dict[str, Any]]:
+    """A cached endpoint whose database is ``state``, counting what it computes."""
+    state: dict[str, Any] = {"version": 1, "computed": 0, "sessions": 0}
+
+    async def version() -> int:
+        return int(state["version"])
+
+    async def session() -> AsyncGenerator[dict[str, Any], None]:
+        state["sessions"] += 1
+        try:
+            yield state
+        finally:
+            state["sessions"] -= 1
+
+    @cached(
+        namespace="listing",
+        soft_ttl=soft_ttl,
+        hard_ttl=60,
+        lock_ttl=lock_ttl,
+        version=version if versioned else None,
+    )
+    async def endpoint(page: int = Query(1), db: Any = Depends(session)) -> Any:
+        state["computed"] += 1
+        await asyncio.sleep(0.01)
+        return {"page": page, "version": db["version"]}
+
+    return endpoint, state
+
+
+def listing_key(endpoint: Callable[..., Any], page: int = 1) -> str:
+    return query_key_builder(
+        endpoint.__wrapped__,  # type: ignore[attr-defined]
+        "test:listing",
+        args=(),
+        kwargs={"page": page},
+    )
+
+
+async def until(condition: Callable[[], bool]) -> None:
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_annotated_dependencies_are_injected_not_keyed(
+    backend: LockingBackend,  # noqa: ARG001
+) -> None:
+    sessions: list[int] = []
+
+    def session() -> dict[str, int]:
+        sessions.append(1)
+        return {"version": 1}
+
+    # Declared the way SessionDep is in app/api/deps.py.
+    Database = Annotated[dict[str, int], Depends(session)]
+
+    @cached(namespace="annotated", soft_ttl=60, hard_ttl=60)
+    async def endpoint(db: Database, page: int = Query(1)) -> Any:
+        return {"page": page, "version": db["version"]}
+
+    async def run() -> list[Any]:
+        return [await endpoint(db=object(), page=1) for _ in range(2)]
+
+    assert asyncio.run(run()) == [{"page": 1, "version": 1}] * 2
+    assert sessions == [1]
+
+
+def test_json_annotated_responses_are_sent_as_cached(
+    backend: LockingBackend,  # noqa: ARG001
+) -> None:
+    @cached(namespace="json", soft_ttl=60, hard_ttl=60)
+    async def endpoint(page: int = Query(1)) -> dict[str, list[dict[str, Any]]]:
+        return {"pages": [{"page": page}]}
+
+    async def run() -> list[Any]:
+        return [await endpoint(page=1) for _ in range(2)]
+
+    for response in asyncio.run(run()):
+        assert isinstance(response, Response)
+        assert JsonCoder.decode(response.body) == {"pages": [{"page": 1}]}
+
+
+def test_concurrent_misses_compute_once(backend: LockingBackend) -> None:  # noqa: ARG001
+    endpoint, state = listing()
+
+    async def run() -> list[Any]:
+        return await asyncio.gather(*(endpoint(page=1, db=None) for _ in range(20)))
+
+    assert asyncio.run(run()) == [{"page": 1, "version": 1}] * 20
+    assert state["computed"] == 1
+    # The computation closed the session it opened.
+    assert state["sessions"] == 0
+
+
+def test_stale_responses_are_served_while_one_refresh_runs(
+    backend: LockingBackend,  # noqa: ARG001
+) -> None:
+    endpoint, state = listing(soft_ttl=0)
+
+    async def run() -> None:
+        response = Response()
+        await endpoint(page=1, db=None, __cache_response=response)
+        assert response.headers["X-FastAPI-Cache"] == "MISS"
+        state["version"] = 2
+
+        responses = [Response() for _ in range(10)]
+        served = await asyncio.gather(
+            *(endpoint(page=1, db=None, __cache_response=r) for r in responses)
+        )
+        assert served == [{"page": 1, "version": 1}] * 10
+        assert {r.headers["X-FastAPI-Cache"] for r in responses} == {"STALE"}
+
+        await until(lambda: state["computed"] == 2)
+        await until(lambda: state["sessions"] == 0)
+        assert await endpoint(page=1, db=None) == {"page": 1, "version": 2}
+
+    asyncio.run(run())
+
+
+def test_versioned_responses_are_computed_afresh_once_it_changes(
+    backend: LockingBackend,  # noqa: ARG001
+) -> None:
+    endpoint, state = listing(versioned=True)
+
+    async def run() -> None:
+        assert await endpoint(page=1, db=None) == {"page": 1, "version": 1}
+        assert await endpoint(page=1, db=None) == {"page": 1, "version": 1}
+        state["version"] = 2
+        assert await endpoint(page=1, db=None) == {"page": 1, "version": 2}
+
+    asyncio.run(run())
+    assert state["computed"] == 2
+
+
+def test_if_none_match_uses_weak_comparison() -> None:
+    etag = '"abc"'
+    assert _etag_matches('"abc"', etag)
+    assert _etag_matches('W/"xyz", W/"abc"', etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches('"xyz"', etag)
+    assert not _etag_matches(None, etag)
+
+
+def test_a_refresh_another_worker_runs_is_left_to_it(backend: LockingBackend) -> None:
+    endpoint, state = listing(soft_ttl=0)
+    key = listing_key(endpoint)
+
+    async def run() -> None:
+        await endpoint(page=1, db=None)
+        backend.redis.locks[f"{key}:lock"] = "another worker"
+        assert await endpoint(page=1, db=None) == {"page": 1, "version": 1}
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert state["computed"] == 1
+
+
+def test_misses_wait_for_the_worker_holding_the_lock(backend: LockingBackend) -> None:
+    endpoint, state = listing()
+    key = listing_key(endpoint)
+    backend.redis.locks[f"{key}:lock"] = "another worker"
+
+    async def another_worker() -> None:
+        await asyncio.sleep(0.1)
+        payload = JsonCoder.encode({"page": 1, "version": "theirs"})
+        await backend.set(key, b"%.3f\n" % (time.time() + 60) + payload, 60)
+
+    async def run() -> Any:
+        _, served = await asyncio.gather(another_worker(), endpoint(page=1, db=None))
+        return served
+
+    assert asyncio.run(run()) == {"page": 1, "version": "theirs"}
+    assert state["computed"] == 0
+
+
+def test_misses_compute_when_the_lock_holder_never_answers(
+    backend: LockingBackend,
+) -> None:
+    endpoint, state = listing(lock_ttl=0.2)
+    backend.redis.locks[f"{listing_key(endpoint)}:lock"] = "a dead worker"
+
+    assert asyncio.run(endpoint(page=1, db=None)) == {"page": 1, "version": 1}
+    assert state["computed"] == 1
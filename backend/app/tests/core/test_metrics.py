@@ -0,0 +1,36 @@
+import pytest
+
+from app.core.metrics import Histogram, Registry
+
+
+def test_histogram_quantiles_interpolate_within_buckets() -> None:
+    histogram = Histogram("latency_seconds", "Latency", (0.1, 0.2, 0.4))
+    for value in (0.05, 0.15, 0.15, 0.3, 1.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == pytest.approx(0.175)
+    # Observations above the last bucket report its bound.
+    assert histogram.quantile(0.99) == 0.4
+    assert Histogram("empty", "Empty", (1.0,)).quantile(0.5) == 0.0
+
+
+def test_registry_renders_prometheus_text_format() -> None:
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs run").inc(3)
+    histogram = registry.histogram("job_seconds", "Job duration", (0.5, 1.0))
+    histogram.observe(0.25)
+    histogram.observe(2.0)
+
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        "jobs_total 3",
+        "# HELP job_seconds Job duration",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.5"} 1',
+        'job_seconds_bucket{le="1"} 1',
+        'job_seconds_bucket{le="+Inf"} 2',
+        "job_seconds_sum 2.25",
+        "job_seconds_count 2",
+    ]
@@ -0,0 +1,46 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.responses import ORJSONCoder, page_response
+from app.models import Item, ItemPublic, ItemsPublic, User, UserPublic, UsersPublic
+
+
+def test_pages_match_what_fastapi_would_send() -> None:
+    items = [
+        Item(id=uuid.uuid4(), title="Item", description=None, owner_id=uuid.uuid4())
+        for _ in range(3)
+    ]
+
+    response = page_response(ItemPublic, items, 7)
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == jsonable_encoder(
+        ItemsPublic(data=items, count=7)
+    )
+
+
+def test_pages_only_read_the_public_fields() -> None:
+    users = [User(id=uuid.uuid4(), email="a@example.com", hashed_password="secret")]
+
+    page = json.loads(page_response(UserPublic, users, 1).body)
+
+    assert page == jsonable_encoder(UsersPublic(data=users, count=1))
+    assert "hashed_password" not in page["data"][0]
+
+
+def test_coder_encodes_what_orjson_cannot_on_its_own() -> None:
+    value = {
+        "price": Decimal("12.5"),
+        "at": datetime(2026, 10, 18, tzinfo=timezone.utc),
+        "items": ItemsPublic(data=[], count=0),
+    }
+
+    assert ORJSONCoder.decode(ORJSONCoder.encode(value)) == {
+        "price": 12.5,
+        "at": "2026-10-18T00:00:00+00:00",
+        "items": {"data": [], "count": 0},
+    }
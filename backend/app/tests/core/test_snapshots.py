@@ -0,0 +1,98 @@
+import asyncio
+import fcntl
+import os
+from pathlib import Path
+
+from app.core.snapshots import Snapshot, write_snapshot
+
+
+def renderer(
+    path: str | None, version: int, responses: dict[str, bytes]
+) -> tuple[Snapshot, list[int]]:
+    """A snapshot at ``path`` rendering ``responses``, counting its renders."""
+    renders: list[int] = []
+
+    async def render() -> tuple[int, dict[str, bytes]]:
+        renders.append(version)
+        return version, responses
+
+    return Snapshot(path, render, check_interval=0), renders
+
+
+def test_lookups_read_the_mapped_file(tmp_path: Path) -> None:
+    path = str(tmp_path / "snapshot")
+    write_snapshot(path, 3, {"a": b'{"page":1}', "b": b"", "c": b"[2]"})
+    snapshot, _ = renderer(path, 3, {})
+
+    assert snapshot.get("a") == b'{"page":1}'
+    assert snapshot.get("b") == b""
+    assert snapshot.get("c") == b"[2]"
+    assert snapshot.get("d") is None
+    assert snapshot.version == 3
+
+
+def test_replacements_are_picked_up_and_broken_files_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot"
+    write_snapshot(str(path), 1, {"a": b"old"})
+    snapshot, _ = renderer(str(path), 1, {})
+    assert snapshot.get("a") == b"old"
+
+    write_snapshot(str(path), 2, {"a": b"new"})
+    assert snapshot.get("a") == b"new"
+    assert snapshot.version == 2
+
+    # Whatever isn't a snapshot leaves the last good one in place.
+    broken = tmp_path / "broken"
+    broken.write_bytes(b"not a snapshot")
+    os.replace(broken, path)
+    assert snapshot.get("a") == b"new"
+    assert snapshot.version == 2
+
+
+def test_without_a_path_nothing_is_built_or_served() -> None:
+    snapshot, renders = renderer(None, 1, {"a": b"1"})
+
+    assert not asyncio.run(snapshot.build())
+    assert snapshot.get("a") is None
+    assert not renders
+
+
+def test_one_worker_builds_each_version(tmp_path: Path) -> None:
+    path = str(tmp_path / "snapshot")
+    snapshot, renders = renderer(path, 5, {"a": b"1"})
+
+    # Another worker on the host is writing it.
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert not asyncio.run(snapshot.build(5))
+    assert not renders
+
+    assert asyncio.run(snapshot.build(5))
+    assert snapshot.get("a") == b"1"
+    assert renders == [5]
+
+    # Another worker sharing the file finds it built already.
+    other, other_renders = renderer(path, 5, {"a": b"1"})
+    assert not asyncio.run(other.build(5))
+    assert not other_renders
+    assert other.get("a") == b"1"
+
+
+def test_lookups_behind_the_catalog_rebuild_it_in_the_background(
+    tmp_path: Path,
+) -> None:
+    path = str(tmp_path / "snapshot")
+    write_snapshot(path, 1, {"a": b"old"})
+    snapshot, renders = renderer(path, 2, {"a": b"new"})
+
+    async def lookup() -> bytes | None:
+        snapshot.get("a")
+        snapshot.refresh(2)
+        # A second request while it's being built doesn't start another.
+        snapshot.refresh(2)
+        await asyncio.sleep(0.1)
+        snapshot.refresh(2)
+        return snapshot.get("a")
+
+    assert asyncio.run(lookup()) == b"new"
+    assert renders == [2]
@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from fastapi_cache.backends.inmemory import InMemoryBackend, Value
+
+from app.core.tiered_cache import LocalCache, TieredBackend
+
+
+class Broker:
+    """Redis pub/sub between the workers of one test."""
+
+    def __init__(self) -> None:
+        self.queues: list[asyncio.Queue[dict[str, Any]]] = []
+
+    async def publish(self, _channel: str, message: str) -> int:
+        for queue in self.queues:
+            queue.put_nowait({"type": "message", "data": message})
+        return len(self.queues)
+
+    def pubsub(self) -> "Subscription":
+        return Subscription(self)
+
+
+class Subscription:
+    def __init__(self, broker: Broker) -> None:
+        self.broker = broker
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *_exc: Any) -> None:
+        self.broker.queues.remove(self.queue)
+
+    async def subscribe(self, _channel: str) -> None:
+        self.broker.queues.append(self.queue)
+
+    async def listen(self) -> AsyncIterator[dict[str, Any]]:
+        while True:
+            message = await self.queue.get()
+            if message["type"] == "lost":
+                raise ConnectionError("connection lost")
+            yield message
+
+
+class Shared(InMemoryBackend):
+    """The Redis every worker reads through to, counting its reads."""
+
+    def __init__(self) -> None:
+        self._store: dict[str, Value] = {}
+        self._lock = asyncio.Lock()
+        self.reads = 0
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        self.reads += 1
+        return await super().get_with_ttl(key)
+
+
+def workers(count: int) -> tuple[Shared, Broker, list[TieredBackend]]:
+    shared, broker = Shared(), Broker()
+    backends = [
+        TieredBackend(shared, broker, ttl=60, max_bytes=1024) for _ in range(count)
+    ]
+    return shared, broker, backends
+
+
+async def until(condition: Callable[[], bool]) -> None:
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_local_cache_evicts_least_recently_used_past_its_size() -> None:
+    local = LocalCache(max_bytes=25)
+    local.set("a", b"x" * 9, ttl=60)
+    local.set("b", b"x" * 9, ttl=60)
+    local.get_with_ttl("a")
+    local.set("c", b"x" * 9, ttl=60)
+    assert local.get_with_ttl("b") == (0, None)
+    assert local.get_with_ttl("a")[1] == b"x" * 9
+    assert local.size == 20
+
+    # Never worth evicting everything else for.
+    local.set("d", b"x" * 25, ttl=60)
+    assert local.get_with_ttl("d") == (0, None)
+    assert len(local) == 2
+
+
+def test_local_cache_entries_expire() -> None:
+    local = LocalCache(max_bytes=1024)
+    local.set("a", b"1", ttl=0.01)
+    time.sleep(0.02)
+    assert local.get_with_ttl("a") == (0, None)
+    assert local.size == 0
+
+
+def test_subscribed_workers_read_redis_once_per_key() -> None:
+    shared, _, (worker,) = workers(1)
+
+    async def run() -> None:
+        await shared.set("ns:key", b"value", 60)
+        # Not following invalidations yet, so every read goes to Redis.
+        assert await worker.get("ns:key") == b"value"
+        assert await worker.get("ns:key") == b"value"
+        assert shared.reads == 2
+
+        worker.start()
+        await until(lambda: worker.subscribed)
+        for _ in range(5):
+            assert await worker.get("ns:key") == b"value"
+        assert shared.reads == 3
+        await worker.close()
+
+    asyncio.run(run())
+
+
+def test_writes_and_clears_reach_every_worker() -> None:
+    shared, _, (writer, reader) = workers(2)
+
+    async def run() -> None:
+        writer.start()
+        reader.start()
+        await until(lambda: writer.subscribed and reader.subscribed)
+        await writer.set("ns:key", b"old", 60)
+        assert await reader.get("ns:key") == b"old"
+
+        await writer.set("ns:key", b"new", 60)
+        await until(lambda: len(reader.local) == 0)
+        assert await reader.get("ns:key") == b"new"
+        # The writer kept its own write.
+        reads = shared.reads
+        assert await writer.get("ns:key") == b"new"
+        assert shared.reads == reads
+
+        await writer.clear(namespace="ns")
+        await until(lambda: len(reader.local) == 0)
+        assert await reader.get("ns:key") is None
+        await writer.close()
+        await reader.close()
+
+    asyncio.run(run())
+
+
+def test_losing_the_channel_drops_local_copies() -> None:
+    shared, broker, (worker,) = workers(1)
+
+    async def run() -> None:
+        worker.start()
+        await until(lambda: worker.subscribed)
+        await shared.set("ns:key", b"value", 60)
+        await worker.get("ns:key")
+        assert len(worker.local) == 1
+
+        for queue in broker.queues:
+            queue.put_nowait({"type": "lost"})
+        await until(lambda: not worker.subscribed)
+        assert len(worker.local) == 0
+        await worker.close()
+
+    asyncio.run(run())
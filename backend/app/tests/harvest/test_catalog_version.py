@@ -0,0 +1,47 @@
+from sqlmodel import Session
+
+from app.harvest.catalog_version import catalog_version
+from app.harvest.copy_loader import CopyLoader
+from app.harvest.ingest import BulkWriter
+from app.models import Cuisine
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+
+def test_only_real_changes_bump_the_catalog_version(db: Session) -> None:
+    cuisine = random_cuisine_payload()
+    items = [random_set_menu_payload(cuisines=[cuisine]) for _ in range(3)]
+    version = catalog_version(db)
+    BulkWriter().write_page(db, items)
+    db.commit()
+    assert catalog_version(db) > version
+
+    # Harvests upsert every page again, changed or not.
+    version = catalog_version(db)
+    BulkWriter().write_page(db, items)
+    db.commit()
+    assert catalog_version(db) == version
+
+    items[0]["number_of_orders"] += 1
+    BulkWriter().write_page(db, items)
+    db.commit()
+    assert catalog_version(db) > version
+
+    # Writes outside the harvester count too.
+    version = catalog_version(db)
+    stored = db.get(Cuisine, cuisine["id"])
+    assert stored
+    stored.name = "renamed"
+    db.add(stored)
+    db.commit()
+    assert catalog_version(db) == version + 1
+
+
+def test_copy_merge_of_an_unchanged_page_keeps_the_version(db: Session) -> None:
+    items = [random_set_menu_payload(cuisines=[random_cuisine_payload()])]
+    for expected_change in (True, False):
+        version = catalog_version(db)
+        loader = CopyLoader()
+        loader.write_page(db, items)
+        loader.finish(db)
+        db.commit()
+        assert (catalog_version(db) > version) is expected_change
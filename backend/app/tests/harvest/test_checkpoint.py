@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import httpx
+from sqlmodel import Session
+
+from app.harvest.checkpoint import conditional_headers, load_checkpoint, save_checkpoint
+from app.tests.utils.utils import random_lower_string
+
+
+def test_checkpoint_round_trip(db: Session) -> None:
+    source_url = f"https://upstream.test/{random_lower_string()}"
+    assert conditional_headers(load_checkpoint(db, source_url)) == {}
+
+    response = httpx.Response(
+        200,
+        headers={"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+    )
+    save_checkpoint(
+        db,
+        source_url,
+        response=response,
+        last_page_url=f"{source_url}?page=3",
+        max_created_at=datetime(2024, 1, 2),
+    )
+    db.commit()
+
+    checkpoint = load_checkpoint(db, source_url)
+    assert checkpoint
+    assert checkpoint.last_page_url == f"{source_url}?page=3"
+    assert conditional_headers(checkpoint) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+
+    # An older max_created_at never moves the checkpoint backwards.
+    save_checkpoint(
+        db,
+        source_url,
+        response=httpx.Response(200),
+        last_page_url=None,
+        max_created_at=datetime(2023, 1, 1),
+    )
+    db.commit()
+    db.refresh(checkpoint)
+    assert checkpoint.max_created_at == datetime(2024, 1, 2)
+    assert conditional_headers(checkpoint) == {}
@@ -0,0 +1,59 @@
+from sqlmodel import Session, func, select
+
+from app.harvest.copy_loader import CopyLoader, staging_set_menu
+from app.models import Cuisine, SetMenu, SetMenuCuisineLink
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+
+def test_copy_loader_merges_staging_into_live_tables(db: Session) -> None:
+    cuisines = [random_cuisine_payload() for _ in range(2)]
+    pages = [
+        [random_set_menu_payload(cuisines=cuisines) for _ in range(5)] for _ in range(3)
+    ]
+    loader = CopyLoader()
+    for page in pages:
+        assert loader.write_page(db, page) == 5
+    db.commit()
+
+    # Nothing reaches the live tables before the merge.
+    ids = [item["id"] for page in pages for item in page]
+    assert db.get(SetMenu, ids[0]) is None
+
+    loader.finish(db)
+    db.commit()
+
+    count = db.exec(
+        select(func.count()).select_from(SetMenu).where(SetMenu.id.in_(ids))  # type: ignore[attr-defined]
+    ).one()
+    assert count == 15
+    links = db.exec(
+        select(func.count())
+        .select_from(SetMenuCuisineLink)
+        .where(SetMenuCuisineLink.set_menu_id.in_(ids))  # type: ignore[attr-defined]
+    ).one()
+    assert links == 30
+    assert db.get(Cuisine, cuisines[0]["id"])
+    assert loader.rows == 15 + 2 + 30
+    assert db.exec(select(func.count()).select_from(staging_set_menu)).one() == 0
+
+
+def test_copy_loader_updates_existing_rows(db: Session) -> None:
+    item = random_set_menu_payload()
+    loader = CopyLoader()
+    loader.write_page(db, [dict(item)])
+    loader.finish(db)
+    db.commit()
+
+    item.update(number_of_orders=9999, cuisines=[])
+    loader = CopyLoader()
+    loader.write_page(db, [dict(item)])
+    loader.finish(db)
+    db.commit()
+
+    menu = db.get(SetMenu, item["id"])
+    assert menu
+    db.refresh(menu)
+    assert menu.number_of_orders == 9999
+    assert not db.exec(
+        select(SetMenuCuisineLink).where(SetMenuCuisineLink.set_menu_id == item["id"])
+    ).all()
@@ -0,0 +1,98 @@
+from typing import Any
+
+from sqlmodel import Session, select
+
+from app.harvest.copy_loader import CopyLoader
+from app.harvest.cuisine_stats import cuisine_stats_select, refresh_cuisine_stats
+from app.harvest.ingest import BulkWriter
+from app.models import CuisineStats, SetMenu
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+
+def stored_stats(
+    db: Session, cuisines: list[dict[str, Any]]
+) -> dict[int, tuple[int, int]]:
+    ids = [cuisine["id"] for cuisine in cuisines]
+    rows = db.exec(
+        select(CuisineStats).where(CuisineStats.cuisine_id.in_(ids))  # type: ignore[attr-defined]
+    ).all()
+    return {
+        row.cuisine_id: (row.set_menu_count, row.total_orders)
+        for row in rows
+        if row.set_menu_count
+    }
+
+
+def recomputed_stats(
+    db: Session, cuisines: list[dict[str, Any]]
+) -> dict[int, tuple[int, int]]:
+    query = cuisine_stats_select().subquery()
+    ids = [cuisine["id"] for cuisine in cuisines]
+    rows = db.execute(select(query).where(query.c.cuisine_id.in_(ids))).all()
+    return {row.cuisine_id: (row.set_menu_count, row.total_orders) for row in rows}
+
+
+def test_bulk_writes_keep_cuisine_stats_current(db: Session) -> None:
+    cuisines = [random_cuisine_payload() for _ in range(3)]
+    first, second, third = cuisines
+    items = [
+        random_set_menu_payload(cuisines=[first], number_of_orders=10),
+        random_set_menu_payload(cuisines=[first, second], number_of_orders=20),
+        random_set_menu_payload(cuisines=[second], number_of_orders=30, status=0),
+    ]
+    BulkWriter().write_page(db, items)
+    db.commit()
+    assert stored_stats(db, cuisines) == {first["id"]: (2, 30), second["id"]: (1, 20)}
+
+    # New orders, a menu going live, one retired and one moving cuisine.
+    items[0].update(number_of_orders=15, cuisines=[third])
+    items[1].update(status=0)
+    items[2].update(status=1)
+    BulkWriter().write_page(db, items)
+    db.commit()
+    assert stored_stats(db, cuisines) == {
+        second["id"]: (1, 30),
+        third["id"]: (1, 15),
+    }
+    assert stored_stats(db, cuisines) == recomputed_stats(db, cuisines)
+
+    # Writes outside the harvester are counted too.
+    menu = db.get(SetMenu, items[2]["id"])
+    assert menu
+    menu.number_of_orders = 31
+    db.add(menu)
+    db.commit()
+    assert stored_stats(db, cuisines)[second["id"]] == (1, 31)
+
+
+def test_copy_merge_keeps_cuisine_stats_current(db: Session) -> None:
+    cuisines = [random_cuisine_payload() for _ in range(2)]
+    items = [random_set_menu_payload(cuisines=cuisines) for _ in range(5)]
+    loader = CopyLoader()
+    loader.write_page(db, items)
+    loader.finish(db)
+    db.commit()
+
+    items[0].update(cuisines=cuisines[:1], number_of_orders=1000)
+    loader = CopyLoader()
+    loader.write_page(db, items)
+    loader.finish(db)
+    db.commit()
+
+    stats = stored_stats(db, cuisines)
+    assert stats[cuisines[0]["id"]][0] == 5
+    assert stats[cuisines[1]["id"]][0] == 4
+    assert stats == recomputed_stats(db, cuisines)
+
+
+def test_refresh_cuisine_stats_matches_the_triggers(db: Session) -> None:
+    cuisines = [random_cuisine_payload() for _ in range(2)]
+    BulkWriter().write_page(
+        db, [random_set_menu_payload(cuisines=cuisines) for _ in range(4)]
+    )
+    db.commit()
+    maintained = stored_stats(db, cuisines)
+
+    refresh_cuisine_stats(db)
+    db.commit()
+    assert stored_stats(db, cuisines) == maintained
@@ -0,0 +1,227 @@
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+
+from app.harvest.fetch import (
+    AdaptivePacer,
+    CrawlPosition,
+    PageBatch,
+    PageFetcher,
+    parse_retry_after,
+)
+from app.harvest.metrics import RunMetrics
+
+BASE_URL = "https://upstream.test/set-menus"
+
+
+def make_page(page: int, last_page: int | None) -> dict[str, Any]:
+    meta: dict[str, Any] = {"current_page": page}
+    if last_page is not None:
+        meta["last_page"] = last_page
+    next_url = f"{BASE_URL}?page={page + 1}" if page < (last_page or 3) else None
+    return {
+        "data": [{"id": page}],
+        "links": {"next": next_url},
+        "meta": meta,
+    }
+
+
+def fast_pacer() -> AdaptivePacer:
+    return AdaptivePacer(rate=1000.0, burst=10, max_rate=1000.0)
+
+
+def collect(fetcher: PageFetcher, url: str) -> list[dict[str, Any]]:
+    async def run() -> list[dict[str, Any]]:
+        async with fetcher:
+            return [page async for page in fetcher.iter_pages(url)]
+
+    return asyncio.run(run())
+
+
+def test_iter_pages_fetches_all_pages_concurrently() -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        page = int(request.url.params.get("page", 1))
+        return httpx.Response(200, json=make_page(page, last_page=8))
+
+    fetcher = PageFetcher(
+        concurrency=4, pacer=fast_pacer(), transport=httpx.MockTransport(handler)
+    )
+    pages = collect(fetcher, BASE_URL)
+
+    assert sorted(p["data"][0]["id"] for p in pages) == list(range(1, 9))
+    assert 1 < max_in_flight <= 4
+    assert fetcher.stats.pages == 8
+
+
+def test_iter_pages_follows_next_links_without_page_count() -> None:
+    requested: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        page = int(request.url.params.get("page", 1))
+        return httpx.Response(200, json=make_page(page, last_page=None))
+
+    fetcher = PageFetcher(pacer=fast_pacer(), transport=httpx.MockTransport(handler))
+    pages = collect(fetcher, BASE_URL)
+
+    assert [p["data"][0]["id"] for p in pages] == [1, 2, 3]
+    assert requested == [BASE_URL, f"{BASE_URL}?page=2", f"{BASE_URL}?page=3"]
+
+
+def test_get_page_retries_throttled_requests() -> None:
+    calls = 0
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=make_page(1, last_page=1))
+
+    pacer = fast_pacer()
+    metrics = RunMetrics(parent=None)
+    fetcher = PageFetcher(
+        pacer=pacer, transport=httpx.MockTransport(handler), metrics=metrics
+    )
+    pages = collect(fetcher, BASE_URL)
+
+    assert len(pages) == 1
+    assert fetcher.stats.retries == 2
+    assert fetcher.stats.throttled == 2
+    assert pacer.rate < 1000.0
+    assert metrics.value("harvest_requests_total") == 3
+    assert metrics.value("harvest_retries_total") == 2
+    assert metrics.value("harvest_throttled_total") == 2
+    assert metrics.value("harvest_pages_total") == 1
+    assert metrics.value("harvest_bytes_total") == fetcher.stats.bytes
+    assert metrics.histogram("harvest_fetch_seconds").count == 3
+
+
+def test_get_page_gives_up_after_max_retries() -> None:
+    def handler(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    fetcher = PageFetcher(
+        pacer=fast_pacer(),
+        max_retries=2,
+        backoff_base=0.0,
+        transport=httpx.MockTransport(handler),
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        collect(fetcher, BASE_URL)
+    assert fetcher.stats.retries == 2
+
+
+def test_pacer_adapts_to_latency() -> None:
+    pacer = AdaptivePacer(rate=2.0, target_latency=1.0, increase_step=0.5)
+    pacer.on_success(0.1)
+    assert pacer.rate == 2.5
+    pacer.on_success(5.0)
+    assert pacer.rate == 1.25
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_iter_item_batches_streams_items_in_batches() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", 1))
+        payload = make_page(page, last_page=3)
+        payload["data"] = [{"id": page * 10 + i} for i in range(5)]
+        return httpx.Response(200, json=payload)
+
+    async def run() -> list[PageBatch]:
+        async with PageFetcher(
+            pacer=fast_pacer(), transport=httpx.MockTransport(handler)
+        ) as fetcher:
+            return [batch async for batch in fetcher.iter_item_batches(BASE_URL, 2)]
+
+    batches = asyncio.run(run())
+
+    assert max(len(batch.items) for batch in batches) == 2
+    ids = sorted(item["id"] for batch in batches for item in batch.items)
+    assert ids == [page * 10 + i for page in (1, 2, 3) for i in range(5)]
+    # Only the last batch of each page carries its envelope.
+    envelopes = [batch.envelope for batch in batches if batch.envelope is not None]
+    assert sorted(envelope["meta"]["current_page"] for envelope in envelopes) == [
+        1,
+        2,
+        3,
+    ]
+    assert all(batch.items for batch in batches if batch.envelope is not None)
+
+
+def test_conditional_first_request_stops_on_not_modified() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["If-None-Match"] == '"v1"'
+        return httpx.Response(304)
+
+    fetcher = PageFetcher(pacer=fast_pacer(), transport=httpx.MockTransport(handler))
+
+    async def run() -> list[dict[str, Any]]:
+        async with fetcher:
+            return [
+                page
+                async for page in fetcher.iter_pages(
+                    BASE_URL, headers={"If-None-Match": '"v1"'}
+                )
+            ]
+
+    assert asyncio.run(run()) == []
+    assert fetcher.first_response is not None
+    assert fetcher.first_response.status_code == 304
+
+
+def test_resume_refetches_only_uncommitted_pages() -> None:
+    requested: list[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", 1))
+        requested.append(page)
+        return httpx.Response(200, json=make_page(page, last_page=5))
+
+    fetcher = PageFetcher(pacer=fast_pacer(), transport=httpx.MockTransport(handler))
+
+    async def run(resume: CrawlPosition) -> list[dict[str, Any]]:
+        async with fetcher:
+            return [page async for page in fetcher.iter_pages(BASE_URL, resume=resume)]
+
+    pages = asyncio.run(run(CrawlPosition(last_page=5, committed_pages={1, 2, 4})))
+
+    assert sorted(requested) == [3, 5]
+    assert sorted(page["data"][0]["id"] for page in pages) == [3, 5]
+
+
+def test_resume_follows_next_links_from_the_saved_cursor() -> None:
+    requested: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        page = int(request.url.params.get("page", 1))
+        return httpx.Response(200, json=make_page(page, last_page=None))
+
+    fetcher = PageFetcher(pacer=fast_pacer(), transport=httpx.MockTransport(handler))
+
+    async def run(resume: CrawlPosition) -> list[dict[str, Any]]:
+        async with fetcher:
+            return [page async for page in fetcher.iter_pages(BASE_URL, resume=resume)]
+
+    pages = asyncio.run(run(CrawlPosition(next_url=f"{BASE_URL}?page=2")))
+
+    assert requested == [f"{BASE_URL}?page=2", f"{BASE_URL}?page=3"]
+    assert [page["data"][0]["id"] for page in pages] == [2, 3]
+    assert asyncio.run(run(CrawlPosition(next_url=None))) == []
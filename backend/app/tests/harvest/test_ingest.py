@@ -0,0 +1,98 @@
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.harvest.ingest import BulkWriter
+from app.models import Cuisine, SetMenu, SetMenuCuisineLink
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+
+def test_write_page_upserts_menus_cuisines_and_links(db: Session) -> None:
+    shared = random_cuisine_payload()
+    items = [random_set_menu_payload(cuisines=[shared]) for _ in range(3)]
+    writer = BulkWriter()
+
+    assert writer.write_page(db, items) == 3
+    db.commit()
+
+    ids = [item["id"] for item in items]
+    menus = db.exec(select(SetMenu).where(SetMenu.id.in_(ids))).all()  # type: ignore[attr-defined]
+    assert len(menus) == 3
+    assert all(menu.thumbnail == "" and menu.is_vegetarian is False for menu in menus)
+    links = db.exec(
+        select(SetMenuCuisineLink).where(SetMenuCuisineLink.set_menu_id.in_(ids))  # type: ignore[attr-defined]
+    ).all()
+    assert {link.cuisine_id for link in links} == {shared["id"]}
+    assert db.get(Cuisine, shared["id"])
+
+
+def test_write_page_is_idempotent_and_replaces_links(db: Session) -> None:
+    old_cuisine = random_cuisine_payload()
+    new_cuisine = random_cuisine_payload()
+    item = random_set_menu_payload(cuisines=[old_cuisine])
+    writer = BulkWriter()
+    writer.write_page(db, [dict(item)])
+    db.commit()
+
+    item.update(name="renamed", cuisines=[new_cuisine])
+    writer.write_page(db, [dict(item)])
+    db.commit()
+
+    menu = db.get(SetMenu, item["id"])
+    assert menu
+    db.refresh(menu)
+    assert menu.name == "renamed"
+    links = db.exec(
+        select(SetMenuCuisineLink).where(SetMenuCuisineLink.set_menu_id == item["id"])
+    ).all()
+    assert [link.cuisine_id for link in links] == [new_cuisine["id"]]
+
+
+def test_write_page_uses_a_handful_of_statements(db: Session) -> None:
+    cuisines = [random_cuisine_payload() for _ in range(5)]
+    items = [
+        random_set_menu_payload(cuisines=cuisines[i % 5 : i % 5 + 2])
+        for i in range(100)
+    ]
+    statements: list[str] = []
+
+    def count(*args: object) -> None:
+        statements.append(str(args[2]))
+
+    writer = BulkWriter()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        writer.write_page(db, items)
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert writer.statements == 4
+    assert len([s for s in statements if not s.startswith("SELECT")]) == 4
+
+    # Cuisines seen earlier in the run aren't written again.
+    writer.write_page(db, [random_set_menu_payload(cuisines=cuisines[:1])])
+    db.commit()
+    assert writer.statements == 7
+
+
+def test_write_page_skips_unchanged_menus(db: Session) -> None:
+    items = [random_set_menu_payload() for _ in range(4)]
+    BulkWriter().write_page(db, items)
+    db.commit()
+
+    items[0]["number_of_orders"] += 1
+    writer = BulkWriter(skip_unchanged=True)
+    assert writer.write_page(db, items) == 4
+    db.commit()
+
+    assert writer.unchanged == 3
+    menu = db.get(SetMenu, items[0]["id"])
+    assert menu
+    db.refresh(menu)
+    assert menu.number_of_orders == items[0]["number_of_orders"]
+
+    writer.write_page(db, items)
+    assert writer.unchanged == 7
+    # Only the hash lookup was issued for the fully unchanged page.
+    assert writer.statements == 5 + 1
@@ -0,0 +1,71 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import literal, select
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.metrics import Registry
+from app.harvest.metrics import RunMetrics, define_harvest_metrics
+from app.harvest.runs import finish_run, save_run_stats, start_run
+from app.models import HarvestRunStats
+from app.tests.utils.utils import random_lower_string
+
+
+def test_run_metrics_feed_the_parent_registry() -> None:
+    parent = define_harvest_metrics(Registry())
+    first = RunMetrics(parent=parent)
+    second = RunMetrics(parent=parent)
+
+    first.page(100)
+    second.page(300)
+    second.request(0.02)
+
+    assert first.value("harvest_bytes_total") == 100
+    assert second.value("harvest_bytes_total") == 300
+    assert parent["harvest_bytes_total"].value == 400
+    assert parent["harvest_pages_total"].value == 2
+    assert parent["harvest_fetch_seconds"].count == 1
+
+
+def test_run_metrics_time_statements(db: Session) -> None:
+    metrics = RunMetrics(parent=None)
+    with metrics.instrument(engine):
+        db.execute(select(literal(1)))
+        db.execute(select(literal(2)))
+    db.execute(select(literal(3)))
+
+    assert metrics.value("harvest_statements_total") == 2
+    assert metrics.value("harvest_db_seconds_total") > 0
+
+
+def test_save_run_stats(db: Session) -> None:
+    run = start_run(db, f"https://upstream.test/{random_lower_string()}", "copy")
+    metrics = RunMetrics(parent=None)
+    metrics.request(0.05)
+    metrics.page(2048)
+    metrics.inc("harvest_items_total", 20)
+    metrics.retry(throttled=True)
+    metrics.database(0.5, statements=4)
+    metrics.observe("harvest_write_seconds", 0.75)
+    finish_run(db, run, "completed")
+    save_run_stats(db, run, metrics, "completed")
+    db.commit()
+
+    stats = db.scalars(
+        select(HarvestRunStats).where(HarvestRunStats.run_id == run.id)  # type: ignore[arg-type]
+    ).one()
+    assert stats.mode == "copy"
+    assert stats.status == "completed"
+    assert (stats.requests, stats.pages, stats.items, stats.bytes) == (1, 1, 20, 2048)
+    assert (stats.retries, stats.throttled, stats.statements) == (1, 1, 4)
+    assert stats.db_seconds == 0.5
+    assert stats.write_seconds == 0.75
+    assert 0.025 < stats.fetch_p50_seconds <= 0.05
+    assert stats.started_at <= stats.finished_at
+
+
+def test_metrics_endpoint(client: TestClient) -> None:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE harvest_fetch_seconds histogram" in response.text
+    assert "harvest_runs_total " in response.text
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.harvest.normalize import (
+    MENU_HASH,
+    MENU_ID,
+    SET_MENU_COLUMNS,
+    BatchNormalizer,
+    content_hash,
+)
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+
+def test_batch_normalizer_fills_defaults_column_by_column() -> None:
+    cuisine = random_cuisine_payload()
+    items = [
+        random_set_menu_payload(cuisines=[cuisine], min_spend=None, thumbnail=None),
+        random_set_menu_payload(cuisines=[], thumbnail="https://images.test/t.jpg"),
+    ]
+    normalizer = BatchNormalizer()
+    batch = normalizer.normalize(items)
+
+    first = dict(zip(SET_MENU_COLUMNS, batch.menus[0], strict=True))
+    assert first["created_at"] == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    assert first["min_spend"] == 0.0
+    assert first["thumbnail"] == ""
+    assert first["is_vegetarian"] is False
+    assert "groups" not in first
+    assert batch.menus[0][MENU_HASH] == content_hash(items[0])
+    assert batch.links == [(items[0]["id"], cuisine["id"])]
+    assert batch.cuisines == {
+        cuisine["id"]: (cuisine["id"], cuisine["name"], cuisine["slug"])
+    }
+
+    assert normalizer.rows == 2
+    assert normalizer.defaulted["min_spend"] == 1
+    assert normalizer.defaulted["thumbnail"] == 1
+    assert normalizer.defaulted["is_vegetarian"] == 2
+    assert not normalizer.invalid
+
+
+def test_batch_normalizer_drops_and_counts_invalid_items() -> None:
+    good = random_set_menu_payload()
+    items = [
+        good,
+        random_set_menu_payload(id=None),
+        random_set_menu_payload(created_at="yesterday"),
+        random_set_menu_payload(cuisines=[{"name": "No id", "slug": "no-id"}]),
+    ]
+    normalizer = BatchNormalizer()
+    batch = normalizer.normalize(items)
+
+    assert [menu[MENU_ID] for menu in batch.menus] == [good["id"], items[3]["id"]]
+    assert normalizer.invalid == {"id": 1, "created_at": 1, "cuisines.id": 1}
+    assert batch.select({good["id"]}).menus == batch.menus[:1]
+
+
+def test_batch_normalizer_counts_across_worker_threads() -> None:
+    items = [
+        random_set_menu_payload(thumbnail=None),
+        random_set_menu_payload(id=None),
+    ]
+    normalizer = BatchNormalizer()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: normalizer.normalize(items), range(400)))
+
+    assert normalizer.rows == 400
+    assert normalizer.defaulted["thumbnail"] == 400
+    assert normalizer.invalid == {"id": 400}
+
+
+def test_max_created_at_is_chronological_across_offsets() -> None:
+    items = [
+        random_set_menu_payload(created_at="2024-01-01T12:00:00+00:00"),
+        # Later, though it sorts first as a string.
+        random_set_menu_payload(created_at="2024-01-01T09:00:00-05:00"),
+        random_set_menu_payload(created_at=None),
+        {
+            key: value
+            for key, value in random_set_menu_payload().items()
+            if key != "created_at"
+        },
+    ]
+    batch = BatchNormalizer().normalize(items)
+
+    assert batch.max_created_at() == datetime(2024, 1, 1, 14)
+    assert BatchNormalizer().normalize([]).max_created_at() is None
@@ -0,0 +1,85 @@
+import asyncio
+import random
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import pytest
+
+from app.harvest.pipeline import Pipeline, Stage
+
+
+async def numbers(count: int) -> AsyncIterator[int]:
+    for number in range(count):
+        yield number
+
+
+def test_pipeline_runs_stages_in_order() -> None:
+    written: list[int] = []
+    pipeline = Pipeline(
+        numbers(20),
+        [
+            Stage("double", lambda n: n * 2, queue_size=2),
+            Stage("write", written.append, queue_size=2),
+        ],
+        source_name="fetch",
+    )
+    asyncio.run(pipeline.run())
+
+    assert written == [n * 2 for n in range(20)]
+    assert [stats.name for stats in pipeline.stats] == ["fetch", "double", "write"]
+    assert all(stats.items == 20 for stats in pipeline.stats)
+
+
+def test_ordered_stages_pass_results_on_in_arrival_order() -> None:
+    written: list[int] = []
+
+    def jittery(n: int) -> int:
+        time.sleep(random.uniform(0, 0.005))
+        return n
+
+    pipeline = Pipeline(
+        numbers(40),
+        [
+            Stage("normalize", jittery, workers=4, ordered=True),
+            Stage("write", written.append),
+        ],
+    )
+    asyncio.run(pipeline.run())
+
+    assert written == list(range(40))
+
+
+def test_pipeline_applies_backpressure_to_the_source() -> None:
+    def slow_write(_: int) -> None:
+        time.sleep(0.01)
+
+    pipeline = Pipeline(numbers(10), [Stage("write", slow_write, queue_size=1)])
+    asyncio.run(pipeline.run())
+
+    fetch, write = pipeline.stats
+    # The source kept waiting for the slow stage, whose queue stayed full.
+    assert fetch.blocked_seconds > 0.05
+    assert write.max_depth == 1
+    assert write.mean_depth > 0.5
+
+
+def test_pipeline_failure_waits_for_running_threads() -> None:
+    finished = threading.Event()
+
+    def slow(n: int) -> int:
+        time.sleep(0.05)
+        finished.set()
+        return n
+
+    def fail(_: int) -> None:
+        raise ValueError("boom")
+
+    pipeline = Pipeline(
+        numbers(10),
+        [Stage("slow", slow, workers=2), Stage("fail", fail)],
+    )
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(pipeline.run())
+    assert finished.is_set()
+    assert pipeline.stats[2].items == 0
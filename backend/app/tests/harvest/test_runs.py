@@ -0,0 +1,58 @@
+from sqlmodel import Session
+
+from app.harvest.fetch import CrawlPosition
+from app.harvest.runs import (
+    find_resumable_run,
+    finish_run,
+    record_page,
+    resume_position,
+    start_run,
+)
+from app.tests.utils.utils import random_lower_string
+
+
+def numbered_envelope(page: int, last_page: int) -> dict[str, object]:
+    return {"links": {}, "meta": {"current_page": page, "last_page": last_page}}
+
+
+def test_numbered_run_resumes_after_committed_pages(db: Session) -> None:
+    source_url = f"https://upstream.test/{random_lower_string()}"
+    run = start_run(db, source_url, "upsert")
+    db.commit()
+    assert resume_position(run) is None
+
+    # Pages complete out of order when fetched concurrently.
+    for page in (1, 3, 2, 5):
+        record_page(db, run, numbered_envelope(page, last_page=6))
+        db.commit()
+    finish_run(db, run, "failed", error="boom")
+    db.commit()
+
+    assert run.committed_through == 3
+    assert run.committed_pages == [5]
+    resumable = find_resumable_run(db, source_url)
+    assert resumable is not None
+    assert resumable.id == run.id
+    assert resume_position(resumable) == CrawlPosition(
+        last_page=6, committed_pages={1, 2, 3, 5}
+    )
+
+    finish_run(db, run, "completed")
+    db.commit()
+    assert find_resumable_run(db, source_url) is None
+
+
+def test_linked_run_resumes_from_next_url(db: Session) -> None:
+    source_url = f"https://upstream.test/{random_lower_string()}"
+    run = start_run(db, source_url, "copy")
+    record_page(db, run, {"links": {"next": f"{source_url}?cursor=abc"}, "meta": {}})
+    db.commit()
+
+    assert resume_position(run) == CrawlPosition(next_url=f"{source_url}?cursor=abc")
+
+    # Starting over abandons the interrupted run.
+    fresh = start_run(db, source_url, "copy")
+    db.commit()
+    db.refresh(run)
+    assert run.status == "abandoned"
+    assert find_resumable_run(db, source_url) == fresh
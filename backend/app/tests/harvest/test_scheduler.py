@@ -0,0 +1,56 @@
+import asyncio
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.harvest.lock import advisory_lock
+from app.harvest.runs import finish_run, start_run
+from app.harvest.scheduler import HarvestScheduler
+from app.tests.utils.utils import random_lower_string
+
+
+def test_advisory_lock_is_exclusive() -> None:
+    with advisory_lock(engine) as first:
+        with advisory_lock(engine) as second:
+            assert first
+            assert not second
+    with advisory_lock(engine) as again:
+        assert again
+
+
+def test_scheduler_runs_only_as_leader_and_when_due() -> None:
+    source_url = f"https://upstream.test/{random_lower_string()}"
+    runs: list[str] = []
+
+    def harvest() -> None:
+        with Session(engine) as session:
+            run = start_run(session, source_url, "upsert")
+            finish_run(session, run, "completed")
+            session.commit()
+        runs.append(source_url)
+
+    completed: list[bool] = []
+
+    async def on_complete() -> None:
+        completed.append(True)
+
+    scheduler = HarvestScheduler(
+        engine, source_url, harvest, interval=3600, on_complete=on_complete
+    )
+
+    # Another worker is leader: nothing happens here.
+    with advisory_lock(engine):
+        assert not asyncio.run(scheduler.tick())
+    assert runs == []
+
+    assert asyncio.run(scheduler.tick())
+    assert runs == [source_url]
+    assert completed == [True]
+
+    # The last run started less than an interval ago.
+    assert not asyncio.run(scheduler.tick())
+    assert runs == [source_url]
+
+    scheduler.interval = 0
+    assert asyncio.run(scheduler.tick())
+    assert len(runs) == 2
@@ -0,0 +1,58 @@
+import json
+from typing import Any
+
+import pytest
+
+from app.harvest.stream import PageParser
+
+PAGE: dict[str, Any] = {
+    "data": [
+        {"id": 1, "name": "Feast éè \U0001f37d", "price_per_person": 12.5},
+        {"id": 22, "cuisines": [{"id": 3, "slug": "thai"}], "status": None},
+        {"id": 333, "nested": {"list": [1, 2, {"deep": True}]}},
+    ],
+    "links": {"next": "https://upstream.test/set-menus?page=2"},
+    "meta": {"current_page": 1, "last_page": 12345},
+}
+
+
+def parse(body: bytes, chunk_size: int) -> tuple[list[Any], PageParser]:
+    parser = PageParser()
+    items = []
+    for start in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[start : start + chunk_size]))
+    items.extend(parser.close())
+    return items, parser
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 16])
+def test_page_parser_yields_items_across_chunk_boundaries(chunk_size: int) -> None:
+    body = json.dumps(PAGE, indent=1).encode()
+    items, parser = parse(body, chunk_size)
+    assert items == PAGE["data"]
+    assert parser.envelope == {"links": PAGE["links"], "meta": PAGE["meta"]}
+
+
+def test_page_parser_hands_out_items_before_the_page_ends() -> None:
+    body = json.dumps(PAGE).encode()
+    parser = PageParser()
+    first_item_end = body.index(b"}") + 2
+    assert parser.feed(body[:first_item_end]) == [PAGE["data"][0]]
+
+
+def test_page_parser_handles_empty_and_null_data() -> None:
+    items, parser = parse(b'{"meta": {"total": 0}, "data": []}', 3)
+    assert items == []
+    assert parser.envelope == {"meta": {"total": 0}}
+
+    items, parser = parse(b'{"data": null}', 3)
+    assert items == []
+    assert parser.envelope == {"data": None}
+
+
+def test_page_parser_rejects_truncated_pages() -> None:
+    body = json.dumps(PAGE).encode()
+    parser = PageParser()
+    parser.feed(body[:-10])
+    with pytest.raises(ValueError):
+        parser.close()
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, func, select
+
+from app.core.db import engine
+from app.harvest.catalog_version import catalog_version
+from app.harvest.swap import ShadowSwapLoader
+from app.models import CuisineStats, SetMenu, SetMenuCuisineLink
+from app.tests.utils.set_menu import random_cuisine_payload, random_set_menu_payload
+
+INDEXES = text(
+    "SELECT indexname FROM pg_indexes WHERE tablename = 'set_menu' ORDER BY indexname"
+)
+TRIGGERS = text(
+    "SELECT tgname FROM pg_trigger"
+    " WHERE tgrelid = 'set_menu_cuisine_link'::regclass AND NOT tgisinternal"
+    " ORDER BY tgname"
+)
+
+
+def test_swap_replaces_the_catalog_and_keeps_its_schema(db: Session) -> None:
+    before = db.exec(INDEXES).scalars().all()  # type: ignore[call-overload]
+    triggers = db.exec(TRIGGERS).scalars().all()  # type: ignore[call-overload]
+    assert triggers
+    stale = random_set_menu_payload()
+    loader = ShadowSwapLoader()
+    loader.write_page(db, [stale])
+    loader.finish(db)
+    db.commit()
+
+    cuisines = [random_cuisine_payload() for _ in range(2)]
+    page = [random_set_menu_payload(cuisines=cuisines) for _ in range(5)]
+    loader = ShadowSwapLoader()
+    # A set menu listed twice upstream is loaded once.
+    loader.write_page(db, page + [page[0]])
+    db.commit()
+    version = catalog_version(db)
+    loader.finish(db)
+    db.commit()
+    assert catalog_version(db) == version + 1
+
+    ids = {item["id"] for item in page}
+    assert set(db.exec(select(SetMenu.id)).all()) == ids
+    links = db.exec(select(func.count()).select_from(SetMenuCuisineLink)).one()
+    assert links == 10
+    assert db.exec(INDEXES).scalars().all() == before  # type: ignore[call-overload]
+    assert loader.swap_seconds > 0
+
+    # The triggers came along and cuisine_stats was rebuilt from the shadows.
+    assert db.exec(TRIGGERS).scalars().all() == triggers  # type: ignore[call-overload]
+    stats = db.get(CuisineStats, cuisines[0]["id"])
+    assert stats
+    assert stats.set_menu_count == 5
+    assert stats.total_orders == sum(item["number_of_orders"] for item in page)
+    assert db.get(CuisineStats, stale["cuisines"][0]["id"]) is None
+
+    # The id sequence survived the swap along with the keys.
+    sequence = db.exec(  # type: ignore[call-overload]
+        text("SELECT pg_get_serial_sequence('set_menu', 'id')")
+    ).scalar()
+    assert sequence == "public.set_menu_id_seq"
+
+
+def test_swap_gives_up_when_readers_hold_the_catalog(db: Session) -> None:
+    item = random_set_menu_payload()
+    loader = ShadowSwapLoader(lock_timeout="50ms", swap_attempts=1)
+    loader.write_page(db, [item])
+    db.commit()
+
+    with engine.connect() as reader:
+        reader.execute(select(func.count()).select_from(SetMenu))
+        with pytest.raises(OperationalError):
+            loader.finish(db)
+        db.rollback()
+        reader.rollback()
+
+    # The live catalog is untouched and the load can be retried.
+    assert db.get(SetMenu, item["id"]) is None
+    loader = ShadowSwapLoader(keep_staging=True)
+    loader.finish(db)
+    db.commit()
+    assert db.get(SetMenu, item["id"])
@@ -0,0 +1,46 @@
+import random
+from typing import Any
+
+from app.tests.utils.utils import random_lower_string
+
+
+def random_id() -> int:
+    return random.randint(1, 2**31 - 1)
+
+
+def random_cuisine_payload() -> dict[str, Any]:
+    slug = random_lower_string()
+    return {"id": random_id(), "name": slug.title(), "slug": slug}
+
+
+def random_set_menu_payload(
+    *, cuisines: list[dict[str, Any]] | None = None, **overrides: Any
+) -> dict[str, Any]:
+    """A set menu shaped like the upstream API, nullable fields included."""
+    payload: dict[str, Any] = {
+        "id": random_id(),
+        "created_at": "2024-01-01T12:00:00.000000Z",
+        "description": None,
+        "display_text": 1,
+        "image": f"https://images.test/{random_lower_string()}.jpg",
+        "thumbnail": None,
+        "is_vegan": random.choice([True, False]),
+        "is_vegetarian": None,
+        "name": random_lower_string(),
+        "status": 1,
+        "price_per_person": round(random.uniform(10, 100), 2),
+        "min_spend": 100,
+        "is_seated": True,
+        "is_standing": None,
+        "is_canape": False,
+        "is_mixed_dietary": False,
+        "is_meal_prep": False,
+        "is_halal": False,
+        "is_kosher": False,
+        "available": True,
+        "number_of_orders": random.randint(0, 500),
+        "groups": {"dishes_count": 3, "selectable_dishes_count": 3, "groups": {}},
+        "cuisines": cuisines if cuisines is not None else [random_cuisine_payload()],
+    }
+    payload.update(overrides)
+    return payload